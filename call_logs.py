@@ -1,131 +1,137 @@
 #!/usr/bin/env python3
 
+import os
 import logging
 import argparse
 import csv
 import datetime
+import tempfile
+import contextlib
 
 from simple_zoomphone import ZoomAPIClient
+from simple_zoomphone.ratelimit import shared_rate_limiter
+from simple_zoomphone.quota import QuotaLedger
+from simple_zoomphone.exceptions import QuotaExhausted
+from simple_zoomphone.schema import CALL_LOG_FIELDS, CALL_LOG_ENRICHMENT_FIELDS
+from simple_zoomphone.parquet_writer import ParquetDatasetWriter
+from simple_zoomphone.sqlite_store import CallLogStore
+from simple_zoomphone.sharding import (
+    shard_by_hash,
+    time_windows,
+    run_shards,
+    merge_csv_parts,
+    SortedCSVWriter,
+)
 
 logger = logging.getLogger("zp")
 logger.setLevel(logging.INFO)
 
 
-def get_call_logs(
-    API_KEY: str,
-    API_SECRET: str,
-    from_date: datetime.datetime,
-    number_of_days: int = 1,
-    department: str = "",
-    job_title: str = "",
-    call_direction: str = "all",
-):
-    """Script to access Zoom Phone Call Log via marketplace.zoom.us API
-
-    A new CSV file is written each time this script is run, timestamp is included in filename.
-
-    Args:
-        API_KEY (str): API key from marketplace.zoom.us
-        API_SECRET (str): API secret from marketplace.zoom.us
-        from_date (datetime.datetime): Start date for Call Log Export (e.g. yyyy-mm-dd )
-        number_of_days (int, optional): Number of days to export.  Max 30. Defaults to 1.
-        department (str, optional): Name of department to use to filter exported records.  Only users in this dept will be included in export. Defaults to "".
-        job_title (str, optional): Name of job title to use to filter exported records.  Only users with this job title will be included in export. Defaults to "".
-        call_direction (str, optional): Call direction, can be 'all', 'inbound', or 'outbound'. Defaults to "all".
-    """
-
-    zoomapi = ZoomAPIClient(API_KEY, API_SECRET)
+# Set headers for CSV file
+CSV_HEADERS = [
+    "email",
+    "dept",
+    "job_title",
+    "caller_number",
+    "caller_number_type",
+    "caller_name",
+    "callee_number",
+    "callee_number_type",
+    "callee_name",
+    "direction",
+    "duration",
+    "result",
+    "date_time",
+]
+
+
+def csv_sort_key(row: dict) -> tuple:
+    """Order of rows in a sharded CSV export, part files are sorted by this key and merged"""
+    return (row["date_time"], row["email"])
+
+
+def select_users(phone_user_list: list, user_list: list, department: str = "") -> list:
+    """Return (phone user, ZM user profile) of every active phone user, filtered by department"""
+    selected = []
+
+    # iterate phone users
+    for this_user in phone_user_list:
+
+        if this_user["status"] == "deactivate":
+            # skip users who are deactivated, they will not appear in the user > list users.  If we need to include deactivated users, need to address how to get these users from users.list_users
+            continue
+
+        # find the ZP users ZM user profile - this is used to merge data from overall ZM users into ZP call log
+        this_user_zm_info = ""
+        this_user_zm_info = next(
+            item
+            for item in user_list
+            if item["email"].lower() == this_user["email"].lower()
+        )
 
-    # Get all Zoom Users
-    user_list = zoomapi.users.list_users()
+        # Handle users that don't have a department specified. ( Set 'dept' to '' to prevent future error)
+        if "dept" not in this_user_zm_info:
+            this_user_zm_info["dept"] = ""
 
-    # Get all ZP Users
-    phone_user_list = zoomapi.phone.list_users()
+        # check whether optional department parameter was included in filter
+        if department != "":
+            # we only want users from a specific department in CSV output
+            if department.lower() != this_user_zm_info["dept"].lower():
+                # this user is not in the correct department, so skip to next users
+                continue
 
-    # Set Call Log Query Parameters
-    page_size = 300
+        selected.append((this_user, this_user_zm_info))
 
-    # Set end date based on from_date + number of days ( zoom Call log API is limited to max 30 days in a single query)
-    to_date = from_date + datetime.timedelta(days=number_of_days)
+    return selected
 
-    # Set headers for CSV file
-    headers = [
-        "email",
-        "dept",
-        "job_title",
-        "caller_number",
-        "caller_number_type",
-        "caller_name",
-        "callee_number",
-        "callee_number_type",
-        "callee_name",
-        "direction",
-        "duration",
-        "result",
-        "date_time",
-    ]
 
+def export_users(
+    zoomapi: ZoomAPIClient,
+    users: list,
+    from_date: datetime.datetime,
+    to_date: datetime.datetime,
+    job_title: str,
+    call_direction: str,
+    write_call_logs,
+) -> tuple:
+    """Query the Call Log API for each (phone user, ZM user profile) and pass each page of enriched call logs to write_call_logs
+
+    Returns:
+        tuple: users downloaded, errors encountered
+    """
     download_count = 0
     error_count = 0
 
-    # Create CSV file, query Call Log API, and write data
-    filename = datetime.datetime.now().strftime("call-logs-%Y-%m-%d-%H-%M.csv")
-    with open(filename, "w", newline="") as output_file:
-        dict_writer = csv.DictWriter(
-            output_file, extrasaction="ignore", fieldnames=headers
-        )
-        dict_writer.writeheader()
+    for this_user, this_user_zm_info in users:
 
-        # iterate phone users
-        for this_user in phone_user_list:
+        # Get Title from user profile ( title is not provided in the list ZM users API call, so need to query each ZM user to get this. )
+        this_user_get = zoomapi.users.get_user(userId=this_user["email"])
 
-            if this_user["status"] == "deactivate":
-                # skip users who are deactivated, they will not appear in the user > list users.  If we need to include deactivated users, need to address how to get these users from users.list_users
-                continue
+        if "job_title" in this_user_get:
 
-            # find the ZP users ZM user profile - this is used to merge data from overall ZM users into ZP call log
-            this_user_zm_info = ""
-            this_user_zm_info = next(
-                item
-                for item in user_list
-                if item["email"].lower() == this_user["email"].lower()
-            )
-
-            # Handle users that don't have a department specified. ( Set 'dept' to '' to prevent future error)
-            if "dept" not in this_user_zm_info:
-                this_user_zm_info["dept"] = ""
-
-            # check whether optional department parameter was included in filter
-            if department != "":
-                # we only want users from a specific department in CSV output
-                if department.lower() != this_user_zm_info["dept"].lower():
-                    # this user is not in the correct department, so skip to next users
-                    continue
-
-            # Get Title from user profile ( title is not provided in the list ZM users API call, so need to query each ZM user to get this. )
-            this_user_get = zoomapi.users.get_user(userId=this_user["email"])
-
-            if "job_title" in this_user_get:
+            this_user_title_temp = this_user_get["job_title"]
+        else:
+            this_user_title_temp = ""
 
-                this_user_title_temp = this_user_get["job_title"]
-            else:
-                this_user_title_temp = ""
-
-            # check whether optional job_title parameter was included in filter
-            if job_title != "":
-                # we only want users with a specific job_title in CSV output
-                if job_title.lower() != this_user_title_temp.lower():
-                    # this user does not have the correct job title, so skip to next users
-                    continue
+        # check whether optional job_title parameter was included in filter
+        if job_title != "":
+            # we only want users with a specific job_title in CSV output
+            if job_title.lower() != this_user_title_temp.lower():
+                # this user does not have the correct job title, so skip to next users
+                continue
 
-            logger.info(f"Getting Call Logs for user {this_user['email']}")
-            try:
-                # get this user's call logs
-                this_user_call_logs = []
+        logger.info(f"Getting Call Logs for user {this_user['email']}")
+        try:
+            # get this user's call logs, the next page is fetched while the current page is filtered and written
+            call_log_count = 0
 
-                this_user_call_logs = zoomapi.phone.get_user_call_logs(
-                    userId=this_user["email"], from_date=from_date, to_date=to_date
-                )
+            for this_user_call_logs in zoomapi.phone.get_user_call_logs(
+                userId=this_user["email"],
+                from_date=from_date,
+                to_date=to_date,
+                paged=True,
+                prefetch=2,
+            ):
 
                 # filter call logs as needed
                 if len(this_user_call_logs) > 0:
@@ -154,19 +160,282 @@ def get_call_logs(
                             }
                         )
 
-                    dict_writer.writerows(this_user_call_logs)
-                logger.info(f" - {len(this_user_call_logs)} call logs retrieved.")
-                download_count += 1
+                    write_call_logs(this_user_call_logs)
+                call_log_count += len(this_user_call_logs)
+
+            logger.info(f" - {call_log_count} call logs retrieved.")
+            download_count += 1
 
-            except Exception as e:
-                logger.info(f" - Warning: {e}")
-                error_count += 1
+        except QuotaExhausted as e:
+            # keep what was exported, the remaining users can be exported after the quota resets
+            logger.info(f" - Stopping export: {e}")
+            error_count += 1
+            break
+
+        except Exception as e:
+            logger.info(f" - Warning: {e}")
+            error_count += 1
+
+    return download_count, error_count
+
+
+def export_shard(
+    API_KEY: str,
+    API_SECRET: str,
+    users: list,
+    from_date: datetime.datetime,
+    to_date: datetime.datetime,
+    job_title: str,
+    call_direction: str,
+    part_path: str,
+    rate_limit_store: str,
+    requests_per_second: float,
+    quota_ledger: str,
+) -> tuple:
+    """Export the call logs of one shard into a CSV part file sorted by csv_sort_key, run in its own process
+
+    Each shard has its own API client and HTTP session, the request budget is shared with the other shards through 'rate_limit_store'.
+
+    Returns:
+        tuple: users downloaded, errors encountered
+    """
+    if not logger.handlers:
+        # spawned processes do not run the __main__ block
+        ch = logging.StreamHandler()
+        ch.setLevel(logging.INFO)
+        logger.addHandler(ch)
+
+    zoomapi = ZoomAPIClient(
+        API_KEY,
+        API_SECRET,
+        rate_limiter=shared_rate_limiter(rate_limit_store, requests_per_second),
+        priority="bulk",
+        quota_ledger=QuotaLedger(quota_ledger) if quota_ledger else None,
+    )
+
+    # call logs are sorted in bounded runs and merged, the shard's call logs are never all in memory
+    with SortedCSVWriter(part_path, CSV_HEADERS, csv_sort_key) as part_writer:
+        counts = export_users(
+            zoomapi,
+            users,
+            from_date,
+            to_date,
+            job_title,
+            call_direction,
+            part_writer.writerows,
+        )
+
+    return counts
+
+
+def get_call_logs(
+    API_KEY: str,
+    API_SECRET: str,
+    from_date: datetime.datetime,
+    number_of_days: int = 1,
+    department: str = "",
+    job_title: str = "",
+    call_direction: str = "all",
+    output_format: str = "csv",
+    rate_limit_store: str = "",
+    requests_per_second: float = 10,
+    quota_ledger: str = "",
+    processes: int = 1,
+    shard_by: str = "users",
+    keep_parts: bool = False,
+):
+    """Script to access Zoom Phone Call Log via marketplace.zoom.us API
+
+    A new CSV file (or Parquet dataset directory) is written each time this script is run, timestamp is included in filename.
+
+    Args:
+        API_KEY (str): API key from marketplace.zoom.us
+        API_SECRET (str): API secret from marketplace.zoom.us
+        from_date (datetime.datetime): Start date for Call Log Export (e.g. yyyy-mm-dd )
+        number_of_days (int, optional): Number of days to export.  Max 30. Defaults to 1.
+        department (str, optional): Name of department to use to filter exported records.  Only users in this dept will be included in export. Defaults to "".
+        job_title (str, optional): Name of job title to use to filter exported records.  Only users with this job title will be included in export. Defaults to "".
+        call_direction (str, optional): Call direction, can be 'all', 'inbound', or 'outbound'. Defaults to "all".
+        output_format (str, optional): 'csv' to write a single CSV file, 'parquet' to write a Parquet dataset partitioned by date and site (requires pyarrow) or 'sqlite' to upsert into the local call-logs.sqlite database. Defaults to "csv".
+        rate_limit_store (str, optional): SQLite file or BucketServer url holding a request budget shared with other processes. Defaults to "" (not shared).
+        requests_per_second (float, optional): requests per second shared by all processes using 'rate_limit_store'. Defaults to 10.
+        quota_ledger (str, optional): SQLite file counting requests per day.  The export is checked against the daily quota of heavy requests before it starts and stops cleanly, keeping what was exported, if the quota runs out. Defaults to "" (not counted).
+        processes (int, optional): number of processes exporting shards in parallel, CSV output only.  With more than one process the rate budget is always shared, in a temporary SQLite file if 'rate_limit_store' is not set. Defaults to 1.
+        shard_by (str, optional): 'users' to split users between processes by a hash of their email, or 'time' to split the date range into one window per process. Defaults to "users".
+        keep_parts (bool, optional): keep one sorted CSV part file per shard instead of merging them into a single file. Defaults to False.
+
+    Raises:
+        ValueError: If processes > 1 is combined with an output_format other than 'csv', or shard_by is not 'users' or 'time'
+    """
+    if processes > 1 and output_format != "csv":
+        raise ValueError("'processes' greater than 1 requires output_format 'csv'")
+    if shard_by not in ("users", "time"):
+        raise ValueError("'shard_by' must be 'users' or 'time'")
+
+    zoomapi = ZoomAPIClient(
+        API_KEY,
+        API_SECRET,
+        rate_limiter=shared_rate_limiter(rate_limit_store, requests_per_second),
+        priority="bulk",
+        quota_ledger=QuotaLedger(quota_ledger) if quota_ledger else None,
+    )
+
+    # Get all Zoom Users
+    user_list = zoomapi.users.list_users()
+
+    # Get all ZP Users
+    phone_user_list = zoomapi.phone.list_users()
+
+    if zoomapi._transport.quota_ledger is not None:
+        # each user's call logs are at least one heavy request
+        forecast = zoomapi._transport.quota_ledger.forecast(
+            "heavy", planned_requests=len(phone_user_list)
+        )
+        if not forecast["fits"]:
+            logger.info(
+                f"Warning: about {len(phone_user_list)} heavy requests are needed but only {forecast['remaining']} remain today. "
+                f"The export will stop when the quota is used up, it resets at {forecast['resets_at']:%Y-%m-%d %H:%M} UTC."
+            )
+
+    # Set end date based on from_date + number of days ( zoom Call log API is limited to max 30 days in a single query)
+    to_date = from_date + datetime.timedelta(days=number_of_days)
+
+    users = select_users(phone_user_list, user_list, department)
+
+    if processes > 1:
+        download_count, error_count = _get_call_logs_sharded(
+            API_KEY,
+            API_SECRET,
+            users,
+            from_date,
+            to_date,
+            job_title,
+            call_direction,
+            rate_limit_store,
+            requests_per_second,
+            quota_ledger,
+            processes,
+            shard_by,
+            keep_parts,
+        )
+
+    else:
+        # Create output file, query Call Log API, and write data
+        if output_format == "parquet":
+            # write a Parquet dataset directory partitioned by date and site
+            output_path = datetime.datetime.now().strftime("call-logs-%Y-%m-%d-%H-%M")
+            output_writer = ParquetDatasetWriter(
+                output_path, fields=CALL_LOG_FIELDS + CALL_LOG_ENRICHMENT_FIELDS
+            )
+            write_call_logs = output_writer.write_page
+        elif output_format == "sqlite":
+            # upsert into a local SQLite database, re-running over the same dates will not create duplicates
+            output_writer = CallLogStore("call-logs.sqlite")
+            write_call_logs = output_writer.insert_records
+        else:
+            filename = datetime.datetime.now().strftime("call-logs-%Y-%m-%d-%H-%M.csv")
+            output_writer = open(filename, "w", newline="")
+            dict_writer = csv.DictWriter(
+                output_writer, extrasaction="ignore", fieldnames=CSV_HEADERS
+            )
+            dict_writer.writeheader()
+            write_call_logs = dict_writer.writerows
+
+        with output_writer:
+            download_count, error_count = export_users(
+                zoomapi,
+                users,
+                from_date,
+                to_date,
+                job_title,
+                call_direction,
+                write_call_logs,
+            )
 
     # Print error count
     logger.info(f"Users downloaded: {download_count}")
     logger.info(f"Errors encountered: {error_count}")
 
 
+def _get_call_logs_sharded(
+    API_KEY,
+    API_SECRET,
+    users,
+    from_date,
+    to_date,
+    job_title,
+    call_direction,
+    rate_limit_store,
+    requests_per_second,
+    quota_ledger,
+    processes,
+    shard_by,
+    keep_parts,
+) -> tuple:
+    filename = datetime.datetime.now().strftime("call-logs-%Y-%m-%d-%H-%M")
+
+    if shard_by == "time":
+        # every shard exports all users over its own window of days
+        shards = [
+            (users, start, end)
+            for start, end in time_windows(from_date, to_date, processes)
+        ]
+    else:
+        # users are assigned to shards by a hash of their email, the same user always lands in the same part
+        shards = [
+            (shard_users, from_date, to_date)
+            for shard_users in shard_by_hash(
+                users, processes, key=lambda user: user[0]["email"]
+            )
+        ]
+
+    part_paths = [f"{filename}-part-{index:05d}.csv" for index in range(len(shards))]
+
+    with contextlib.ExitStack() as stack:
+        if not rate_limit_store:
+            # the shards must share one request budget, otherwise each would send 'requests_per_second'
+            directory = stack.enter_context(tempfile.TemporaryDirectory())
+            rate_limit_store = os.path.join(directory, "rate-limit.sqlite")
+
+        logger.info(
+            f"Exporting {len(users)} users in {len(shards)} shards by {shard_by}"
+        )
+        results = run_shards(
+            export_shard,
+            [
+                (
+                    API_KEY,
+                    API_SECRET,
+                    shard_users,
+                    start,
+                    end,
+                    job_title,
+                    call_direction,
+                    part_path,
+                    rate_limit_store,
+                    requests_per_second,
+                    quota_ledger,
+                )
+                for (shard_users, start, end), part_path in zip(shards, part_paths)
+            ],
+            processes=processes,
+        )
+
+    if keep_parts:
+        logger.info(
+            f"Call logs written to {len(part_paths)} part files {filename}-part-*.csv"
+        )
+    else:
+        rows = merge_csv_parts(part_paths, f"{filename}.csv", sort_key=csv_sort_key)
+        logger.info(f"{rows} call logs merged into {filename}.csv")
+
+    # with shard_by 'time' a user is counted once per window
+    download_count = sum(result[0] for result in results)
+    error_count = sum(result[1] for result in results)
+
+    return download_count, error_count
+
+
 # Run this script using argparse
 
 if __name__ == "__main__":
@@ -216,6 +485,50 @@ if __name__ == "__main__":
         default="all",
         help="Specify 'all', 'inbound', or 'outbound'",
     )
+    parser.add_argument(
+        "-output_format",
+        type=str,
+        default="csv",
+        choices=["csv", "parquet", "sqlite"],
+        help="Specify 'csv', 'parquet' or 'sqlite'. Parquet output is partitioned by date and site and requires pyarrow. SQLite output is upserted into call-logs.sqlite.",
+    )
+    parser.add_argument(
+        "-rate_limit_store",
+        type=str,
+        default="",
+        help="SQLite file (or http:// url of a BucketServer) holding a request budget shared with other scripts running against the same Zoom account.",
+    )
+    parser.add_argument(
+        "-requests_per_second",
+        type=float,
+        default=10,
+        help="Requests per second shared by all scripts using the same -rate_limit_store.",
+    )
+    parser.add_argument(
+        "-quota_ledger",
+        type=str,
+        default="",
+        help="SQLite file counting requests per day, the export stops cleanly when the daily quota of heavy requests is used up.",
+    )
+
+    parser.add_argument(
+        "-processes",
+        type=int,
+        default=1,
+        help="Number of processes exporting in parallel (CSV output only). Each process exports one shard into a sorted part file, the parts are merged into one file ordered by date_time.",
+    )
+    parser.add_argument(
+        "-shard_by",
+        type=str,
+        default="users",
+        choices=["users", "time"],
+        help="Split the export between processes by user ('users', hash of email) or by window of days ('time').",
+    )
+    parser.add_argument(
+        "-parts",
+        action="store_true",
+        help="Keep one CSV part file per process instead of merging them.",
+    )
 
     args = parser.parse_args()
 
@@ -227,6 +540,13 @@ if __name__ == "__main__":
         department=args.department,
         job_title=args.job_title,
         call_direction=args.call_direction,
+        output_format=args.output_format,
+        rate_limit_store=args.rate_limit_store,
+        requests_per_second=args.requests_per_second,
+        quota_ledger=args.quota_ledger,
+        processes=args.processes,
+        shard_by=args.shard_by,
+        keep_parts=args.parts,
     )
 
     # This script can run using the below configuration and removing the above argparse
@@ -1,5 +1,6 @@
 #!/usr/bin/env python3
 
+import sys
 import logging
 import argparse
 import os
@@ -7,97 +8,110 @@ import datetime
 import requests
 
 from simple_zoomphone import ZoomAPIClient
+from simple_zoomphone.ratelimit import shared_rate_limiter
+from simple_zoomphone.schema import RECORDING_FIELDS
+from simple_zoomphone.parquet_writer import ParquetDatasetWriter
+from simple_zoomphone.media import MediaDownloader
+from simple_zoomphone.pipeline import RecordingPipeline
+from simple_zoomphone.manifest import RecordingManifest, verify_manifest
+from simple_zoomphone.storage import open_storage
 
 logger = logging.getLogger("zp")
 logger.setLevel(logging.INFO)
 
+# manifest of downloaded recordings, used with -manifest and -verify
+MANIFEST_PATH = os.path.join("recordings", "manifest.sqlite")
 
-def download_call_recordings(user_2_recording: list, session: requests.session):
-    """Download MP3 files from Zoom API and store files to disk.
 
-    Files are stored in the 'recordings' top-level directory.  A subdirectory is created for each year, month, and user.
-    Filenames include timestamp and phone numbers of involved parties and are written in format: yyyymmdd-hhmm-ani-dnis.mp3
+def download_call_recordings(
+    user_2_recording: dict, session: requests.session, chunk_size: int = 1024 * 1024
+):
+    """Download MP3 files from Zoom API and store files to disk, one after the other.
 
-    Example directory structure and filenaming:
-
-        recordings/
-            2020/
-                8/
-                    john.doe@domain.com/
-                        20200821-2217-16505551212-104.mp3
+    Kept for existing callers, get_call_recordings downloads concurrently with RecordingPipeline.  Files are stored
+    like get_call_recordings stores them: recordings/<year>/<month>/<user>/yyyymmdd-hhmm-ani-dnis-<recording id>.mp3.
+    Recordings already saved under the older yyyymmdd-hhmm-ani-dnis.mp3 name are not downloaded again.
 
     Args:
-        user_2_recording (list): List of Call Recording Metadata dicts, including download URL
-        token (str): JWT token to use to authenticate to Zoom API for downloading MP3 files
+        user_2_recording (dict): user -> list of Call Recording Metadata dicts, including download URL
+        session (requests.session): authenticated session to use to download MP3 files
+        chunk_size (int, optional): bytes read from the network per write, MP3 files are streamed to disk and never held in memory. Defaults to 1MB.
     """
-
-    # top level directory to save recordings
-    dirName = "recordings"
+    downloader = MediaDownloader(session, chunk_size=chunk_size)
+    storage_backend = open_storage("directory", "recordings")
 
     for this_user in user_2_recording:
         logger.info(f"Downloading MP3 files for user {this_user}")
 
         download_count = 0
 
-        # loop through each call recording for this user
         for this_recording in user_2_recording[this_user]:
-
-            # Get date for this recording
-            this_recording_date = datetime.datetime.strptime(
-                this_recording["date_time"], "%Y-%m-%dT%H:%M:%SZ"
-            )
-
-            # Create Directory based on year, month, and user
-
-            this_directory_name = os.path.join(
-                dirName,
-                str(this_recording_date.year),
-                str(this_recording_date.month),
-                this_user,
-            )
-            if not os.path.exists(this_directory_name):
-                os.makedirs(this_directory_name)
-
-            # Get Filename based on hour minute and caller ID numbers
-
-            this_filename_is = (
-                str(this_recording_date.year)
-                + str(this_recording_date.month).zfill(2)
-                + str(this_recording_date.day).zfill(2)
-                + "-"
-                + str(this_recording_date.hour).zfill(2)
-                + str(this_recording_date.minute).zfill(2)
-                + "-"
-                + this_recording["caller_number"]
-                + "-"
-                + this_recording["callee_number"]
-                + ".mp3"
-            )
-
-            # Check whether we have previously downloaded and saved the MP3 file
-            if not os.path.exists(os.path.join(this_directory_name, this_filename_is)):
-                # MP3 file doesn't exist on disk, download and save file
-                recording_request_response = session.get(this_recording["download_url"])
-
-                open(os.path.join(this_directory_name, this_filename_is), "wb").write(
-                    recording_request_response.content
-                )
-
+            if not storage_backend.exists(this_user, this_recording):
+                # interrupted downloads are resumed on the next run
+                storage_backend.store(downloader, this_user, this_recording)
                 download_count += 1
 
         logger.info(f" - {download_count} new mp3 file(s) downloaded.")
 
 
-def get_call_recordings(API_KEY: str, API_SECRET: str, USER_ID: str = ""):
-    """Access call recordings metadata from Zoom API
+def verify_call_recordings(storage: str = "directory", workers: int = 8):
+    """Re-hash all MP3 files in the recordings manifest and report missing or corrupt files
+
+    Corrupt files are removed from the manifest so they are downloaded again on the next run.
+
+    Args:
+        storage (str, optional): storage backend the recordings were downloaded with, 'directory', 'shards' or 'cas'. Defaults to "directory".
+        workers (int, optional): number of files hashed concurrently. Defaults to 8.
+    """
+    storage_backend = open_storage(storage, "recordings")
+
+    logger.info(f"Verifying recordings in {MANIFEST_PATH}")
+
+    problems = verify_manifest(MANIFEST_PATH, storage_backend, workers)
+
+    for recording_id, path, problem in problems:
+        logger.info(f" - {path}: {problem}")
+
+    storage_backend.close()
+
+    logger.info(f"{len(problems)} recording(s) failed verification.")
+
+
+def get_call_recordings(
+    API_KEY: str,
+    API_SECRET: str,
+    USER_ID: str = "",
+    metadata_parquet: str = "",
+    crawler_workers: int = 4,
+    download_workers: int = 8,
+    use_manifest: bool = False,
+    storage: str = "directory",
+    from_date: datetime.datetime = None,
+    rate_limit_store: str = "",
+    requests_per_second: float = 10,
+):
+    """Access call recordings metadata from Zoom API and download MP3 files to the 'recordings' directory
 
     Args:
         API_KEY (str): API key from marketplace.zoom.us
         API_SECRET (str): API secret from marketplace.zoom.us
         USER_ID (str, optional): userid or email address to download call recordings for a single user.  Omit this parameter to access recordings from all users. Defaults to "".
+        metadata_parquet (str, optional): directory to write recording metadata as a Parquet dataset partitioned by date and site (requires pyarrow).  Omit to skip. Defaults to "".
+        crawler_workers (int, optional): number of users whose recordings are listed concurrently. Defaults to 4.
+        download_workers (int, optional): number of MP3 files downloaded concurrently. Defaults to 8.
+        use_manifest (bool, optional): track downloads in recordings/manifest.sqlite keyed by recording id. Defaults to False.
+        storage (str, optional): 'directory' for one MP3 file per recording, 'shards' for one tar file per user per day or 'cas' to store files by checksum, de-duplicating identical media. Defaults to "directory".
+        from_date (datetime.datetime, optional): only download recordings on or after this date, listing stops at the first older recording. Defaults to None (all recordings).
+        rate_limit_store (str, optional): SQLite file or BucketServer url holding a request budget shared with other processes. Defaults to "" (not shared).
+        requests_per_second (float, optional): requests per second shared by all processes using 'rate_limit_store'. Defaults to 10.
     """
 
-    zoomapi = ZoomAPIClient(API_KEY, API_SECRET)
+    zoomapi = ZoomAPIClient(
+        API_KEY,
+        API_SECRET,
+        rate_limiter=shared_rate_limiter(rate_limit_store, requests_per_second),
+        priority="bulk",
+    )
 
     # Determine whether we are getting call recordings for one user or all users
     if USER_ID == "":
@@ -106,29 +120,50 @@ def get_call_recordings(API_KEY: str, API_SECRET: str, USER_ID: str = ""):
     else:
         phone_user_list = [{"email": USER_ID}]
 
-    # Access User Call Recordings objects
-    user_2_recording = {}
-    for this_user in phone_user_list:
-        try:
-            logger.info(
-                f"Getting list of call recordings for user {this_user['email']}"
-            )
+    # Write recording metadata as each page is listed
+    metadata_writer = None
+    if metadata_parquet != "":
+        metadata_writer = ParquetDatasetWriter(
+            metadata_parquet, fields=RECORDING_FIELDS
+        )
+
+    def log_progress(stats: dict):
+        logger.info(
+            f"{stats['users_listed']} users listed, {stats['recordings_listed']} recordings listed, "
+            f"{stats['recordings_downloaded']} downloaded, {stats['recordings_skipped']} skipped, "
+            f"{stats['bytes_per_second'] / 1024 / 1024:.1f} MB/s"
+        )
+
+    manifest = RecordingManifest(MANIFEST_PATH) if use_manifest else None
+    storage_backend = open_storage(storage, "recordings")
+
+    # List recordings and download MP3 files concurrently, downloads start as soon as the first recordings are listed
+    pipeline = RecordingPipeline(
+        zoomapi,
+        crawler_workers=crawler_workers,
+        download_workers=download_workers,
+        storage=storage_backend,
+        manifest=manifest,
+        on_recordings=(
+            (lambda user, recordings: metadata_writer.write_page(recordings))
+            if metadata_writer
+            else None
+        ),
+        progress_callback=log_progress,
+        from_date=from_date,
+    )
+    stats = pipeline.run([this_user["email"] for this_user in phone_user_list])
 
-            this_user_recording = zoomapi.phone.get_user_call_recordings(
-                userId=this_user["email"]
-            )
+    if metadata_writer:
+        metadata_writer.close()
 
-            if len(this_user_recording) > 0:
-                user_2_recording[this_user["email"]] = this_user_recording
+    if manifest:
+        manifest.close()
 
-            logger.info(f" - {len(this_user_recording)} recordings stored in ZP.")
-        except Exception as e:
-            logger.info(f" - Warning: {e}")
+    storage_backend.close()
 
-    # Pass to function to write to disk
-    download_call_recordings(
-        user_2_recording=user_2_recording, session=zoomapi._session
-    )
+    for item, error in stats.errors:
+        logger.info(f" - Warning: {item}: {error}")
 
 
 # Run this script using argparse
@@ -162,11 +197,76 @@ if __name__ == "__main__":
         default="",
         help="Specify the email address to download recordings for a single user, otherwise will download all user recordings",
     )
+    parser.add_argument(
+        "-metadata_parquet",
+        type=str,
+        default="",
+        help="Specify a directory to also write recording metadata as a Parquet dataset partitioned by date and site.",
+    )
+    parser.add_argument(
+        "-crawler_workers",
+        type=int,
+        default=4,
+        help="Number of users whose recordings are listed concurrently.",
+    )
+    parser.add_argument(
+        "-download_workers",
+        type=int,
+        default=8,
+        help="Number of MP3 files downloaded concurrently.",
+    )
+    parser.add_argument(
+        "-storage",
+        type=str,
+        default="directory",
+        choices=["directory", "shards", "cas"],
+        help="Specify 'directory' for one MP3 file per recording, 'shards' for one tar file per user per day, or 'cas' to store files by checksum (de-duplicates identical media).",
+    )
+    parser.add_argument(
+        "-manifest",
+        action="store_true",
+        help="Track downloads in recordings/manifest.sqlite by recording id instead of checking for files on disk.",
+    )
+    parser.add_argument(
+        "-from_date",
+        type=lambda s: datetime.datetime.strptime(s, "%Y-%m-%d"),
+        default=None,
+        help="Only download recordings on or after this date, format: yyyy-mm-dd.  Listing stops at the first older recording.",
+    )
+    parser.add_argument(
+        "-verify",
+        action="store_true",
+        help="Re-hash all files in recordings/manifest.sqlite and report missing or corrupt files, no recordings are downloaded.",
+    )
+    parser.add_argument(
+        "-rate_limit_store",
+        type=str,
+        default="",
+        help="SQLite file (or http:// url of a BucketServer) holding a request budget shared with other scripts running against the same Zoom account.",
+    )
+    parser.add_argument(
+        "-requests_per_second",
+        type=float,
+        default=10,
+        help="Requests per second shared by all scripts using the same -rate_limit_store.",
+    )
 
     args = parser.parse_args()
 
+    if args.verify:
+        verify_call_recordings(storage=args.storage)
+        sys.exit(0)
+
     get_call_recordings(
         API_KEY=args.API_KEY,
         API_SECRET=args.API_SECRET,
         USER_ID=args.email,
+        metadata_parquet=args.metadata_parquet,
+        crawler_workers=args.crawler_workers,
+        download_workers=args.download_workers,
+        use_manifest=args.manifest,
+        storage=args.storage,
+        from_date=args.from_date,
+        rate_limit_store=args.rate_limit_store,
+        requests_per_second=args.requests_per_second,
     )
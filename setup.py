@@ -9,11 +9,18 @@ setuptools.setup(
     author="Justin Steinberg",
     author_email="jsteinberg@gmail.com",
     install_requires=["requests", "PyJWT", "requests_oauthlib"],
+    extras_require={"parquet": ["pyarrow>=7"], "analytics": ["numpy"]},
     description="Opinionated REST api client for Zoom Phone.",
     long_description=long_description,
     long_description_content_type="text/markdown",
     url="https://github.com/jsteinberg1/simple_zoomphone",
     packages=["simple_zoomphone"],
+    entry_points={
+        "console_scripts": [
+            "zoomphone-sync=simple_zoomphone.daemon:main",
+            "zoomphone-webhooks=simple_zoomphone.webhooks:main",
+        ]
+    },
     include_package_data=True,
     platforms="any",
     classifiers=[
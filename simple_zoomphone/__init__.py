@@ -1 +1,2 @@
-from .base import ZoomAPIClient
\ No newline at end of file
+from .base import ZoomAPIClient
+from .pool import ZoomClientPool
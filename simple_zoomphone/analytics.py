@@ -0,0 +1,354 @@
+"""Vectorized reports over Zoom Phone call logs.
+
+Call logs are converted once into NumPy arrays (one array per column, with categorical columns such as
+direction, result, user and site stored as integer codes).  Every report is then computed with
+vectorized NumPy operations over the whole data set instead of looping over call log dicts.
+
+Example:
+    pages = zoomapi.phone.get_account_call_logs(from_date, to_date, paged=True)
+    call_logs = CallLogArrays.from_pages(pages)
+    call_logs.missed_call_ratio(by="site")
+    call_logs.top_talkers(10)
+"""
+
+import array
+
+from .schema import MISSED_CALL_RESULTS, lookup
+from .util import parse_zoom_datetime
+
+DIRECTIONS = ["inbound", "outbound"]
+
+# paths tried in order to find the user a call log belongs to
+DEFAULT_USER_PATHS = [("email",), ("user_id",), ("owner", "id")]
+
+
+def _import_numpy():
+    try:
+        import numpy
+    except ImportError:
+        raise RuntimeError(
+            "numpy is required for call log analytics, install with 'pip install simple_zoomphone[analytics]'"
+        )
+    return numpy
+
+
+class _Categories:
+    """Maps category labels (e.g. user emails) to dense integer codes"""
+
+    def __init__(self, labels: list = None):
+        self.labels = []
+        self._codes = {}
+        for label in labels or []:
+            self.code(label)
+
+    def code(self, label) -> int:
+        code = self._codes.get(label)
+        if code is None:
+            code = len(self.labels)
+            self._codes[label] = code
+            self.labels.append(label)
+        return code
+
+
+class CallLogArrays:
+    def __init__(self, columns: dict, users: list, sites: list, results: list):
+        """Columnar, NumPy backed call logs.  Use CallLogArrays.from_records or CallLogArrays.from_pages to build.
+
+        Args:
+            columns (dict): column name -> numpy array, columns are 'duration', 'timestamp', 'direction', 'result', 'user' and 'site', plus the optional boolean masks 'duration_valid' and 'timestamp_valid' (False where the call log had no value, the value is then 0)
+            users (list): user labels, indexed by the 'user' column
+            sites (list): site names, indexed by the 'site' column
+            results (list): call result labels, indexed by the 'result' column
+        """
+        self._np = _import_numpy()
+
+        self.duration = columns["duration"]
+        self.timestamp = columns["timestamp"]
+        self.direction = columns["direction"]
+        self.result = columns["result"]
+        self.user = columns["user"]
+        self.site = columns["site"]
+        self.duration_valid = columns.get("duration_valid")
+        if self.duration_valid is None:
+            self.duration_valid = self._np.ones(len(self.duration), dtype=bool)
+        self.timestamp_valid = columns.get("timestamp_valid")
+        if self.timestamp_valid is None:
+            self.timestamp_valid = self._np.ones(len(self.timestamp), dtype=bool)
+
+        self.users = users
+        self.sites = sites
+        self.results = results
+
+        # boolean masks shared by several reports
+        missed_result_codes = [
+            code for code, label in enumerate(results) if label in MISSED_CALL_RESULTS
+        ]
+        self.inbound = self.direction == DIRECTIONS.index("inbound")
+        self.missed = self.inbound & self._np.isin(self.result, missed_result_codes)
+        self.handled = ~self.missed & self.duration_valid & (self.duration > 0)
+
+    def __len__(self):
+        return len(self.duration)
+
+    @classmethod
+    def from_pages(cls, pages, user_paths: list = DEFAULT_USER_PATHS):
+        """Build arrays from the pages yielded by a paged Phone method (e.g. get_account_call_logs(paged=True))"""
+        return cls.from_records(
+            (record for page in pages for record in page), user_paths=user_paths
+        )
+
+    @classmethod
+    def from_batches(cls, batches, user_columns: tuple = ("email", "user_id")):
+        """Build arrays from ColumnBatch pages (e.g. get_account_call_logs(paged=True, columnar=True))
+
+        Numeric columns are appended buffer to buffer, only the categorical columns are encoded value by value.
+
+        Args:
+            batches (iterable): ColumnBatch objects with call log fields
+            user_columns (tuple, optional): columns tried in order to find the user of a call log. Defaults to ("email", "user_id").
+        """
+        np = _import_numpy()
+
+        duration = array.array("i")
+        duration_valid = array.array("b")
+        timestamp = array.array("q")
+        timestamp_valid = array.array("b")
+        direction = array.array("b")
+        result = array.array("h")
+        user = array.array("i")
+        site = array.array("i")
+
+        users = _Categories()
+        sites = _Categories()
+        results = _Categories()
+        directions = _Categories(DIRECTIONS)
+
+        for batch in batches:
+            duration.extend(batch["duration"])
+            duration_valid.extend(batch.is_valid("duration"))
+            timestamp.extend(batch["date_time"])
+            timestamp_valid.extend(batch.is_valid("date_time"))
+            direction.extend(map(directions.code, batch["direction"]))
+            result.extend(map(results.code, batch["result"]))
+            site.extend(map(sites.code, batch["site_name"]))
+
+            # first non empty user column of each row
+            user_labels = [None] * len(batch)
+            for name in reversed(user_columns):
+                if name in batch.columns:
+                    user_labels = [
+                        label or previous
+                        for label, previous in zip(batch[name], user_labels)
+                    ]
+            user.extend(map(users.code, user_labels))
+
+        columns = {
+            "duration": np.frombuffer(duration, dtype=np.int32),
+            "duration_valid": np.frombuffer(duration_valid, dtype=np.int8).astype(bool),
+            "timestamp": np.frombuffer(timestamp, dtype=np.int64),
+            "timestamp_valid": np.frombuffer(timestamp_valid, dtype=np.int8).astype(
+                bool
+            ),
+            "direction": np.frombuffer(direction, dtype=np.int8),
+            "result": np.frombuffer(result, dtype=np.int16),
+            "user": np.frombuffer(user, dtype=np.int32),
+            "site": np.frombuffer(site, dtype=np.int32),
+        }
+
+        return cls(columns, users.labels, sites.labels, results.labels)
+
+    @classmethod
+    def from_records(cls, records, user_paths: list = DEFAULT_USER_PATHS):
+        """Build arrays from an iterable of call log dicts
+
+        Args:
+            records (iterable): call log dicts as returned from the Zoom API
+            user_paths (list, optional): key paths tried in order to find the user of a call log. Defaults to DEFAULT_USER_PATHS.
+        """
+        np = _import_numpy()
+
+        # compact typed buffers, converted to numpy arrays without copying once all records are read
+        duration = array.array("i")
+        duration_valid = array.array("b")
+        timestamp = array.array("q")
+        timestamp_valid = array.array("b")
+        direction = array.array("b")
+        result = array.array("h")
+        user = array.array("i")
+        site = array.array("i")
+
+        users = _Categories()
+        sites = _Categories()
+        results = _Categories()
+        directions = _Categories(DIRECTIONS)
+
+        for record in records:
+            date_time = parse_zoom_datetime(record.get("date_time"))
+
+            user_label = None
+            for user_path in user_paths:
+                user_label = lookup(record, user_path)
+                if user_label:
+                    break
+
+            record_duration = record.get("duration")
+            duration_valid.append(record_duration not in (None, ""))
+            duration.append(int(record_duration or 0))
+            timestamp_valid.append(date_time is not None)
+            timestamp.append(int(date_time.timestamp()) if date_time else 0)
+            direction.append(directions.code(record.get("direction")))
+            result.append(results.code(record.get("result")))
+            user.append(users.code(user_label))
+            site.append(sites.code(lookup(record, ("site", "name"))))
+
+        columns = {
+            "duration": np.frombuffer(duration, dtype=np.int32),
+            "duration_valid": np.frombuffer(duration_valid, dtype=np.int8).astype(bool),
+            "timestamp": np.frombuffer(timestamp, dtype=np.int64),
+            "timestamp_valid": np.frombuffer(timestamp_valid, dtype=np.int8).astype(
+                bool
+            ),
+            "direction": np.frombuffer(direction, dtype=np.int8),
+            "result": np.frombuffer(result, dtype=np.int16),
+            "user": np.frombuffer(user, dtype=np.int32),
+            "site": np.frombuffer(site, dtype=np.int32),
+        }
+
+        return cls(columns, users.labels, sites.labels, results.labels)
+
+    def _group(self, by: str):
+        if by == "user":
+            return self.user, self.users
+        elif by == "site":
+            return self.site, self.sites
+        else:
+            raise ValueError("'by' must be either 'user' or 'site'")
+
+    def _counts(self, codes, labels, mask=None, weights=None):
+        np = self._np
+        if mask is not None:
+            codes = codes[mask]
+            weights = weights[mask] if weights is not None else None
+        return np.bincount(codes, weights=weights, minlength=len(labels))
+
+    def call_volume(self, by: str = "user") -> dict:
+        """Number of calls per user or site
+
+        Args:
+            by (str, optional): 'user' or 'site'. Defaults to "user".
+
+        Returns:
+            dict: user/site -> {'total', 'inbound', 'outbound'}
+        """
+        codes, labels = self._group(by)
+
+        total = self._counts(codes, labels)
+        inbound = self._counts(codes, labels, mask=self.inbound)
+
+        return {
+            label: {
+                "total": int(total[code]),
+                "inbound": int(inbound[code]),
+                "outbound": int(total[code] - inbound[code]),
+            }
+            for code, label in enumerate(labels)
+        }
+
+    def average_handle_time(self, by: str = "user") -> dict:
+        """Average duration in seconds of handled (connected, non missed) calls per user or site
+
+        Args:
+            by (str, optional): 'user' or 'site'. Defaults to "user".
+
+        Returns:
+            dict: user/site -> average duration in seconds, None when the user/site had no handled calls
+        """
+        codes, labels = self._group(by)
+
+        calls = self._counts(codes, labels, mask=self.handled)
+        seconds = self._counts(
+            codes, labels, mask=self.handled, weights=self.duration.astype("float64")
+        )
+
+        return {
+            label: (float(seconds[code] / calls[code]) if calls[code] else None)
+            for code, label in enumerate(labels)
+        }
+
+    def missed_call_ratio(self, by: str = None):
+        """Ratio of missed inbound calls to all inbound calls
+
+        Args:
+            by (str, optional): 'user' or 'site', omit for the overall ratio. Defaults to None.
+
+        Returns:
+            float or dict: overall ratio, or user/site -> ratio (None when there were no inbound calls)
+        """
+        if by is None:
+            inbound = int(self.inbound.sum())
+            return float(self.missed.sum() / inbound) if inbound else None
+
+        codes, labels = self._group(by)
+
+        inbound = self._counts(codes, labels, mask=self.inbound)
+        missed = self._counts(codes, labels, mask=self.missed)
+
+        return {
+            label: (float(missed[code] / inbound[code]) if inbound[code] else None)
+            for code, label in enumerate(labels)
+        }
+
+    def hourly_heatmap(self, utc_offset_hours: int = 0):
+        """Call counts by day of week and hour of day
+
+        Args:
+            utc_offset_hours (int, optional): offset applied to the UTC call timestamps, e.g. -8 for PST. Defaults to 0.
+
+        Returns:
+            numpy.ndarray: 7 x 24 array of call counts, row 0 is Monday and column 0 is midnight.  Call logs without a timestamp are not counted.
+        """
+        np = self._np
+
+        local_timestamp = self.timestamp[self.timestamp_valid] + utc_offset_hours * 3600
+        hour = (local_timestamp // 3600) % 24
+        # 1970-01-01 was a Thursday (weekday 3)
+        weekday = (local_timestamp // 86400 + 3) % 7
+
+        return np.bincount(weekday * 24 + hour, minlength=7 * 24).reshape(7, 24)
+
+    def top_talkers(self, limit: int = 10) -> list:
+        """Users with the most total talk time
+
+        Args:
+            limit (int, optional): number of users to return. Defaults to 10.
+
+        Returns:
+            list: (user, total duration in seconds, number of calls) tuples, highest talk time first
+        """
+        np = self._np
+
+        seconds = self._counts(
+            self.user, self.users, weights=self.duration.astype("float64")
+        )
+        calls = self._counts(self.user, self.users)
+
+        top = np.argsort(-seconds, kind="stable")[:limit]
+
+        return [
+            (self.users[code], int(seconds[code]), int(calls[code])) for code in top
+        ]
+
+    def report(self, by: str = "user") -> dict:
+        """Call volume, average handle time and missed call ratio per user or site in a single dict"""
+        volume = self.call_volume(by)
+        handle_time = self.average_handle_time(by)
+        missed_ratio = self.missed_call_ratio(by)
+
+        return {
+            label: dict(
+                volume[label],
+                average_handle_time=handle_time[label],
+                missed_call_ratio=missed_ratio[label],
+            )
+            for label in volume
+        }
@@ -4,6 +4,7 @@ from requests_oauthlib import OAuth2Session
 from .util import JWT_AUTH
 
 from .phone import Phone
+from .transport import Transport, DEFAULT_TIMEOUT
 from .users import Users
 
 
@@ -13,6 +14,14 @@ class ZoomAPIClient(object):
         API_KEY: str = None,
         API_SECRET: str = None,
         OAuth2Session: OAuth2Session = None,
+        retry_policy=None,
+        circuit_breaker=None,
+        timeout=DEFAULT_TIMEOUT,
+        concurrency=None,
+        rate_limiter=None,
+        priority: str = "normal",
+        quota_ledger=None,
+        hedging=None,
     ):
         """Zoom Phone API Client
 
@@ -22,6 +31,14 @@ class ZoomAPIClient(object):
             API_KEY (str, optional): JWT API key from Zoom Marketplace.
             API_SECRET (str, optional): JWT API Secret from Zoom Marketplace.
             OAuth2Session (OAuth2Session, optional): oAuth2 Session to be used by oAuth application
+            retry_policy (RetryPolicy, optional): rules for retrying failed requests, see simple_zoomphone.retry. Defaults to RetryPolicy().
+            circuit_breaker (CircuitBreaker, optional): circuit breaker shared by all requests of this client, pass False to disable. Defaults to CircuitBreaker().
+            timeout (float or tuple, optional): timeout of each request in seconds, or a (connect, read) tuple. Defaults to DEFAULT_TIMEOUT (10, 60).
+            concurrency (AdaptiveConcurrency, optional): adaptive limits of requests in flight per rate limit category, see simple_zoomphone.concurrency. Pass False to disable. Defaults to AdaptiveConcurrency().
+            rate_limiter (optional): request budget, e.g. SharedTokenBucket to share one budget between processes, see simple_zoomphone.ratelimit. Defaults to None (no budget).
+            priority (str, optional): priority of this client's requests for the rate budget, 'interactive', 'normal' or 'bulk'. Defaults to "normal".
+            quota_ledger (QuotaLedger, optional): persisted count of requests per rate limit category per UTC day, see simple_zoomphone.quota. Defaults to None (not counted).
+            hedging (HedgingPolicy, optional): send a second copy of GET requests slower than a recent latency percentile and use the first response, see simple_zoomphone.hedging. Defaults to None (no hedging).
 
         Raises:
             RuntimeError: If authentication parameters are not passed properly
@@ -49,6 +66,28 @@ class ZoomAPIClient(object):
 
         self._session = s
 
+        # all requests go through one transport, which retries failures and tracks API health
+        self._transport = Transport(
+            self._session,
+            retry_policy,
+            circuit_breaker,
+            timeout,
+            concurrency,
+            rate_limiter,
+            priority,
+            quota_ledger,
+            hedging,
+        )
+
         # Define child classes
-        self.phone = Phone(self._session, self._server)
-        self.users = Users(self._session, self._server)
+        self.phone = Phone(self._session, self._server, self._transport)
+        self.users = Users(self._session, self._server, self._transport)
+
+    def priority(self, priority: str):
+        """Context manager sending the requests of the current thread with this priority, see Transport.priority
+
+        Example:
+            with zoomapi.priority("interactive"):
+                zoomapi.phone.update_user_profile(userId, extension_number=extension)
+        """
+        return self._transport.priority(priority)
@@ -0,0 +1,220 @@
+"""Columnar page batches for bulk processing of Zoom Phone records.
+
+A ColumnBatch holds one page of records as one column per field instead of one dict per record.  Each column is
+converted in a single pass over the page:
+
+    timestamp columns   array('q') of epoch seconds (UTC)
+    int32 columns       array('i')
+    bool columns        array('b') of 0 / 1
+    string columns      list of str, None when missing
+
+Numeric columns are typed buffers, so they convert to NumPy or Arrow arrays without copying.  A missing numeric value is
+stored as 0, the 'valid' array('b') of the column is 0 for it, so a missing value is not mistaken for 0 or False.
+
+Example:
+    for batch in zoomapi.phone.get_account_call_logs(from_date, to_date, paged=True, columnar=True):
+        total_seconds += sum(batch["duration"])
+"""
+
+import array
+import calendar
+import datetime
+
+from .schema import CALL_LOG_FIELDS, lookup
+from .util import parse_zoom_datetime
+from .analytics import _import_numpy
+from .parquet_writer import _import_pyarrow
+
+_ARRAY_TYPECODES = {"timestamp": "q", "int32": "i", "bool": "b"}
+
+
+def _is_missing(value) -> bool:
+    # same rule as schema.convert
+    return value is None or value == ""
+
+
+def _epoch_seconds(values: list) -> array.array:
+    # Zoom timestamps are 'yyyy-mm-ddThh:mm:ssZ', the epoch of each day is calculated once per batch and the time of day added to it
+    epochs = array.array("q")
+    days = {}
+
+    for value in values:
+        if _is_missing(value):
+            epochs.append(0)
+        elif len(value) == 20 and value[10] == "T" and value[19] == "Z":
+            day = value[:10]
+            day_epoch = days.get(day)
+            if day_epoch is None:
+                day_epoch = days[day] = calendar.timegm(
+                    datetime.date.fromisoformat(day).timetuple()
+                )
+            epochs.append(
+                day_epoch
+                + int(value[11:13]) * 3600
+                + int(value[14:16]) * 60
+                + int(value[17:19])
+            )
+        else:
+            epochs.append(int(parse_zoom_datetime(value).timestamp()))
+
+    return epochs
+
+
+class ColumnBatch:
+    def __init__(
+        self, columns: dict, fields: list = CALL_LOG_FIELDS, valid: dict = None
+    ):
+        """One page of records stored column by column.  Use ColumnBatch.from_page to build.
+
+        Args:
+            columns (dict): column name -> array.array or list
+            fields (list, optional): field definitions from simple_zoomphone.schema. Defaults to CALL_LOG_FIELDS.
+            valid (dict, optional): numeric column name -> array('b'), 1 where the value is present. Defaults to None (all values present).
+        """
+        self.columns = columns
+        self.fields = fields
+        self.valid = valid or {}
+
+    @classmethod
+    def from_page(cls, page: list, fields: list = CALL_LOG_FIELDS):
+        """Convert one page of JSON records into columns
+
+        Args:
+            page (list): records as returned from the Zoom API
+            fields (list, optional): field definitions from simple_zoomphone.schema. Defaults to CALL_LOG_FIELDS.
+        """
+        columns = {}
+        valid = {}
+
+        for name, column_type, source_path in fields:
+            if len(source_path) == 1:
+                key = source_path[0]
+                values = [record.get(key) for record in page]
+            else:
+                values = [lookup(record, source_path) for record in page]
+
+            if column_type == "string":
+                columns[name] = [
+                    None if value is None or value == "" else str(value)
+                    for value in values
+                ]
+            elif column_type in _ARRAY_TYPECODES:
+                present = array.array("b", [not _is_missing(value) for value in values])
+                if column_type == "timestamp":
+                    columns[name] = _epoch_seconds(values)
+                elif column_type == "bool":
+                    columns[name] = array.array(
+                        "b", [bool(value) and ok for value, ok in zip(values, present)]
+                    )
+                else:
+                    columns[name] = array.array(
+                        _ARRAY_TYPECODES[column_type],
+                        [int(value) if ok else 0 for value, ok in zip(values, present)],
+                    )
+                valid[name] = present
+            else:
+                raise ValueError(f"Unknown column type '{column_type}'")
+
+        return cls(columns, fields, valid)
+
+    def __len__(self):
+        if not self.columns:
+            return 0
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name: str):
+        return self.columns[name]
+
+    @property
+    def names(self) -> list:
+        return [name for name, column_type, source_path in self.fields]
+
+    def is_valid(self, name: str) -> array.array:
+        """Return array('b') of the column, 1 where the value is present and 0 where it was missing from the record"""
+        if name in self.valid:
+            return self.valid[name]
+        return array.array("b", [value is not None for value in self.columns[name]])
+
+    def rows(self):
+        """Generator of row dicts with the same values as schema.flatten_record, missing values are None"""
+        converted = []
+        for name, column_type, source_path in self.fields:
+            column = self.columns[name]
+            if column_type == "timestamp":
+                column = [
+                    (
+                        datetime.datetime.fromtimestamp(value, datetime.timezone.utc)
+                        if ok
+                        else None
+                    )
+                    for value, ok in zip(column, self.is_valid(name))
+                ]
+            elif column_type == "bool":
+                column = [
+                    bool(value) if ok else None
+                    for value, ok in zip(column, self.is_valid(name))
+                ]
+            elif column_type == "int32":
+                column = [
+                    value if ok else None
+                    for value, ok in zip(column, self.is_valid(name))
+                ]
+            converted.append(column)
+
+        names = self.names
+        for values in zip(*converted):
+            yield dict(zip(names, values))
+
+    def to_numpy(self) -> dict:
+        """Return numeric columns as NumPy arrays (sharing memory with the batch) and string columns as lists
+
+        Missing numeric values are 0 in the arrays, use is_valid(name) to tell them apart.
+        """
+        numpy = _import_numpy()
+
+        return {
+            name: (
+                numpy.frombuffer(column, dtype=column.typecode)
+                if isinstance(column, array.array)
+                else column
+            )
+            for name, column in self.columns.items()
+        }
+
+    def to_arrow(self, schema=None):
+        """Return the batch as a pyarrow Table, missing values become nulls
+
+        Args:
+            schema (pyarrow.Schema, optional): schema of the table, e.g. the schema of a ParquetDatasetWriter. Defaults to one derived from the field types.
+        """
+        pyarrow = _import_pyarrow()
+        import pyarrow.compute
+
+        arrays = []
+        for name, column_type, source_path in self.fields:
+            column = self.columns[name]
+            if column_type == "string":
+                arrays.append(pyarrow.array(column, type=pyarrow.string()))
+                continue
+
+            if column_type == "timestamp":
+                values = pyarrow.array(column, type=pyarrow.int64()).cast(
+                    pyarrow.timestamp("s", tz="UTC")
+                )
+            elif column_type == "int32":
+                values = pyarrow.array(column, type=pyarrow.int32())
+            else:
+                values = pyarrow.array(column, type=pyarrow.int8()).cast(
+                    pyarrow.bool_()
+                )
+
+            if name in self.valid:
+                present = pyarrow.array(self.valid[name], type=pyarrow.int8()).cast(
+                    pyarrow.bool_()
+                )
+                values = pyarrow.compute.if_else(present, values, None)
+            arrays.append(values)
+
+        if schema is not None:
+            return pyarrow.Table.from_arrays(arrays, schema=schema)
+        return pyarrow.Table.from_arrays(arrays, names=self.names)
@@ -0,0 +1,274 @@
+"""Adaptive concurrency limits for Zoom API requests.
+
+Zoom rate limits requests per category (Light, Medium, Heavy, Resource-intensive) and the sustainable request rate
+depends on the account plan and on other applications using the same account.  Instead of a fixed number of worker
+threads, AIMDLimiter adjusts the number of requests in flight the way TCP adjusts its congestion window:
+
+    every successful response           limit += increase / limit   (about +increase per round trip)
+    429 or latency above tolerance      limit *= decrease            (at most once per round trip)
+
+The limit converges on the highest concurrency the API sustains without throttling.  AdaptiveConcurrency keeps one
+limiter per rate limit category, so a throttled Heavy endpoint (call logs) does not slow down Light requests.
+
+Transport acquires a slot around every request.  Other code can use a limiter directly, from threads:
+
+    started = limiter.acquire()
+    response = session.get(url)
+    limiter.release(started, throttled=response.status_code == 429)
+
+or from asyncio:
+
+    started = await limiter.acquire_async()
+"""
+
+import re
+import time
+import asyncio
+import threading
+
+from .exceptions import DeadlineExceeded
+
+# successful responses averaged before latency spikes are detected
+_LATENCY_WARMUP = 5
+
+# (method, path pattern, category) checked in order, see the rate limit label of each endpoint in the Zoom API reference
+RATE_LIMIT_CATEGORIES = [
+    ("GET", re.compile(r"/phone/call_logs$"), "heavy"),
+    ("GET", re.compile(r"/phone/users/[^/]+/call_logs$"), "heavy"),
+    ("GET", re.compile(r"/phone/users/[^/]+/(recordings|voice_mails)$"), "medium"),
+    ("GET", re.compile(r"/phone/(users|numbers|sites|call_queues)$"), "medium"),
+    ("GET", re.compile(r"/users$"), "medium"),
+    ("GET", re.compile(r"/phone/calling_plans$"), "medium"),
+]
+
+
+def rate_limit_category(method: str, url: str) -> str:
+    """Return the Zoom rate limit category of a request: 'light', 'medium', 'heavy' or 'download'
+
+    Args:
+        method (str): HTTP method
+        url (str): request url
+    """
+    if "/v2/" not in url:
+        # recording and voicemail files are served outside the REST API
+        return "download"
+
+    path = url.split("/v2", 1)[1].split("?", 1)[0]
+    method = method.upper()
+
+    for category_method, pattern, category in RATE_LIMIT_CATEGORIES:
+        if method == category_method and pattern.search(path):
+            return category
+
+    # single object GETs and updates
+    return "light"
+
+
+class AIMDLimiter:
+    def __init__(
+        self,
+        initial_limit: float = 8,
+        min_limit: float = 1,
+        max_limit: float = 64,
+        increase: float = 1,
+        decrease: float = 0.5,
+        latency_tolerance: float = 2.0,
+        smoothing: float = 0.1,
+    ):
+        """Thread and asyncio safe concurrency limiter with additive increase / multiplicative decrease
+
+        Args:
+            initial_limit (float, optional): requests in flight allowed at the start. Defaults to 8.
+            min_limit (float, optional): lowest limit. Defaults to 1.
+            max_limit (float, optional): highest limit. Defaults to 64.
+            increase (float, optional): limit added per round trip without throttling. Defaults to 1.
+            decrease (float, optional): factor the limit is multiplied by on throttling. Defaults to 0.5.
+            latency_tolerance (float, optional): a response slower than this multiple of the average latency counts as throttling. Defaults to 2.0.
+            smoothing (float, optional): weight of each new sample in the average latency. Defaults to 0.1.
+        """
+        if not 0 < decrease < 1:
+            raise ValueError("'decrease' must be between 0 and 1")
+        if not 1 <= min_limit <= initial_limit <= max_limit:
+            raise ValueError(
+                "limits must satisfy 1 <= min_limit <= initial_limit <= max_limit"
+            )
+
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase = increase
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+        self.smoothing = smoothing
+
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._latency = None
+        self._samples = 0
+        self._last_decrease = 0.0
+        self.throttled = 0
+
+        self._condition = threading.Condition()
+        self._async_waiters = []
+
+    @property
+    def limit(self) -> int:
+        """Requests allowed in flight"""
+        return max(1, int(self._limit))
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @property
+    def latency(self) -> float:
+        """Average latency of successful requests in seconds, None before the first response"""
+        return self._latency
+
+    def try_acquire(self):
+        """Take a slot if one is free without blocking
+
+        Returns:
+            float: start time to pass to release(), or None if no slot is free
+        """
+        with self._condition:
+            if self._in_flight < self.limit:
+                self._in_flight += 1
+                return time.monotonic()
+            return None
+
+    def acquire(self, timeout: float = None) -> float:
+        """Block until a slot is free and take it
+
+        Args:
+            timeout (float, optional): maximum seconds to wait. Defaults to None (wait forever).
+
+        Raises:
+            DeadlineExceeded: If no slot became free within 'timeout'
+
+        Returns:
+            float: start time to pass to release()
+        """
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._in_flight < self.limit, timeout
+            ):
+                raise DeadlineExceeded(
+                    f"No request slot became free within {timeout:.1f} seconds"
+                )
+            self._in_flight += 1
+            return time.monotonic()
+
+    async def acquire_async(self) -> float:
+        """Wait for a free slot without blocking the event loop and take it
+
+        Returns:
+            float: start time to pass to release()
+        """
+        loop = asyncio.get_running_loop()
+
+        while True:
+            with self._condition:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    return time.monotonic()
+                future = loop.create_future()
+                self._async_waiters.append((loop, future))
+
+            await future
+
+    def release(self, started: float, throttled: bool = False, failed: bool = False):
+        """Give back a slot and adjust the limit from the outcome of the request
+
+        Args:
+            started (float): value returned by acquire()
+            throttled (bool, optional): the request was rate limited (429). Defaults to False.
+            failed (bool, optional): the request failed for another reason, the limit is not changed. Defaults to False.
+        """
+        now = time.monotonic()
+        latency = now - started
+
+        with self._condition:
+            self._in_flight -= 1
+
+            spike = (
+                not throttled
+                and not failed
+                and self._samples >= _LATENCY_WARMUP
+                and latency > self._latency * self.latency_tolerance
+            )
+
+            if throttled or spike:
+                # requests sent before the last decrease report congestion that decrease already handled
+                if started >= self._last_decrease:
+                    self._limit = max(self.min_limit, self._limit * self.decrease)
+                    self._last_decrease = now
+                    self.throttled += 1
+            elif not failed:
+                self._samples += 1
+                if self._latency is None:
+                    self._latency = latency
+                else:
+                    self._latency += self.smoothing * (latency - self._latency)
+
+                # only grow while the limit is actually used, an idle limiter keeps its limit
+                if self._in_flight + 1 >= self.limit:
+                    self._limit = min(
+                        self.max_limit, self._limit + self.increase / self._limit
+                    )
+
+            self._notify()
+
+    def _notify(self):
+        # called with the lock held, wakes threads and coroutines waiting for a slot
+        self._condition.notify_all()
+
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdaptiveConcurrency:
+    def __init__(self, **limiter_options):
+        """One AIMDLimiter per Zoom rate limit category, created on first use
+
+        Example:
+            zoomapi = ZoomAPIClient(API_KEY, API_SECRET, concurrency=AdaptiveConcurrency(initial_limit=4, max_limit=32))
+
+        Args:
+            **limiter_options: options of each AIMDLimiter, e.g. initial_limit or max_limit
+        """
+        self._limiter_options = limiter_options
+        self._limiters = {}
+        self._lock = threading.Lock()
+
+    def limiter(self, category: str) -> AIMDLimiter:
+        with self._lock:
+            limiter = self._limiters.get(category)
+            if limiter is None:
+                limiter = self._limiters[category] = AIMDLimiter(
+                    **self._limiter_options
+                )
+            return limiter
+
+    def for_request(self, method: str, url: str) -> AIMDLimiter:
+        return self.limiter(rate_limit_category(method, url))
+
+    def as_dict(self) -> dict:
+        """Current limit, requests in flight, average latency and throttling count per category"""
+        with self._lock:
+            limiters = dict(self._limiters)
+
+        return {
+            category: {
+                "limit": limiter.limit,
+                "in_flight": limiter.in_flight,
+                "latency": limiter.latency,
+                "throttled": limiter.throttled,
+            }
+            for category, limiter in limiters.items()
+        }
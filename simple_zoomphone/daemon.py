@@ -0,0 +1,632 @@
+"""Long running sync daemon, installed as the 'zoomphone-sync' command.
+
+The one-shot export scripts create a client, authenticate, list every user and open new TLS connections on every
+cron tick.  The daemon keeps one client (and so one authentication token, HTTP connection pool, adaptive
+concurrency limits and rate budget) for its lifetime, caches the user directory and runs each job on its own
+jittered interval.  Every job keeps a cursor in a SQLite state file, so each run only fetches what is new since the
+previous successful run, also across restarts.
+
+    zoomphone-sync -API_KEY ... -API_SECRET ... -jobs call_logs recordings inventory -health_port 8751
+
+A local HTTP endpoint reports health and metrics:
+
+    GET /health     200 {"status": "ok"} or 503 when the API circuit is open or a job keeps failing
+    GET /metrics    runs, failures and last result of every job, concurrency limits, hedging and quota counters
+
+Example:
+    zoomapi = ZoomAPIClient(API_KEY, API_SECRET)
+    daemon = SyncDaemon(zoomapi, [CallLogJob(interval=900), RecordingJob(interval=3600)])
+    daemon.run()
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import random
+import signal
+import sqlite3
+import logging
+import argparse
+import datetime
+import tempfile
+import threading
+import http.server
+
+import requests
+
+from .base import ZoomAPIClient
+from .deadline import Deadline
+from .quota import QuotaLedger
+from .ratelimit import shared_rate_limiter
+from .pipeline import RecordingPipeline, VoicemailPipeline
+from .manifest import RecordingManifest
+from .sqlite_store import CallLogStore
+
+logger = logging.getLogger("zp")
+
+# consecutive failures of a job after which /health reports the daemon as failing
+UNHEALTHY_FAILURES = 3
+
+
+def _utc_now() -> datetime.datetime:
+    # naive UTC, the form used by the date filters of simple_zoomphone.phone
+    return datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+
+
+class SyncState:
+    def __init__(self, path: str = "zoomphone-sync.sqlite"):
+        """SQLite file holding the cursor of every sync job
+
+        Args:
+            path (str, optional): path to SQLite database file, created if it does not exist. Defaults to "zoomphone-sync.sqlite".
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS sync_state ("
+            "job TEXT PRIMARY KEY, cursor TEXT NOT NULL, updated TEXT NOT NULL)"
+        )
+
+    def cursor(self, job: str) -> datetime.datetime:
+        """Return the time up to which a job has synced, None if it never completed a run"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT cursor FROM sync_state WHERE job = ?", (job,)
+            ).fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row else None
+
+    def set_cursor(self, job: str, cursor: datetime.datetime):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO sync_state (job, cursor, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT (job) DO UPDATE SET cursor = excluded.cursor, updated = excluded.updated",
+                (job, cursor.isoformat(), _utc_now().isoformat()),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class SyncJob:
+
+    # name of the job, used for its cursor, in metrics and on the command line
+    name = None
+
+    def __init__(
+        self,
+        interval: float,
+        jitter: float = 0.1,
+        overlap: float = 3600,
+        initial_lookback: float = 86400,
+    ):
+        """Base class of the daemon's jobs
+
+        Subclasses implement sync(daemon, since, until, deadline) and return a dict of counters.  A sync that works
+        through 'since' - 'until' in order can set 'progress' to the time up to which it is complete, so a run that
+        reaches its deadline still advances the cursor that far.
+
+        Args:
+            interval (float): seconds between runs.
+            jitter (float, optional): each interval is randomly lengthened or shortened by up to this fraction, so jobs of many daemons do not run in lockstep. Defaults to 0.1.
+            overlap (float, optional): seconds before the cursor each run starts from, to pick up records Zoom publishes late.  Outputs are deduplicated. Defaults to 3600.
+            initial_lookback (float, optional): seconds before now the first run starts from. Defaults to 86400.
+        """
+        if not 0 <= jitter < 1:
+            raise ValueError("'jitter' must be between 0 and 1")
+
+        self.interval = interval
+        self.jitter = jitter
+        self.overlap = overlap
+        self.initial_lookback = initial_lookback
+
+        self.runs = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_started = None
+        self.last_success = None
+        self.last_duration = None
+        self.last_result = None
+        self.last_error = None
+        self.next_run = None
+        self.progress = None
+
+    def next_interval(self) -> float:
+        return self.interval * (1 + random.uniform(-self.jitter, self.jitter))
+
+    def sync(
+        self,
+        daemon,
+        since: datetime.datetime,
+        until: datetime.datetime,
+        deadline: Deadline,
+    ) -> dict:
+        raise NotImplementedError
+
+    def as_dict(self) -> dict:
+        return {
+            "interval": self.interval,
+            "runs": self.runs,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures,
+            "last_started": self.last_started,
+            "last_success": self.last_success,
+            "last_duration": self.last_duration,
+            "last_result": self.last_result,
+            "last_error": self.last_error,
+            "next_run": self.next_run,
+        }
+
+
+class CallLogJob(SyncJob):
+
+    name = "call_logs"
+
+    def __init__(self, interval: float = 900, path: str = "call-logs.sqlite", **kwargs):
+        """Upsert new account call logs into a CallLogStore
+
+        Args:
+            interval (float, optional): seconds between runs. Defaults to 900.
+            path (str, optional): SQLite call log database. Defaults to "call-logs.sqlite".
+            **kwargs: other SyncJob options
+        """
+        super().__init__(interval, **kwargs)
+        self.path = path
+
+    def sync(self, daemon, since, until, deadline) -> dict:
+        with CallLogStore(self.path) as store:
+            # the call log API takes whole UTC days (yyyy-mm-dd), at most 30 per query, so a cursor older than
+            # that (e.g. after an outage) is caught up one window at a time
+            from_date = since.date()
+            while from_date <= until.date() and not deadline.expired:
+                to_date = min(from_date + datetime.timedelta(days=30), until.date())
+                store.insert_pages(
+                    daemon.zoomapi.phone.get_account_call_logs(
+                        from_date=from_date,
+                        to_date=to_date,
+                        paged=True,
+                        prefetch=2,
+                        deadline=deadline,
+                    )
+                )
+                if not deadline.expired:
+                    # the last day of the window may still get calls, the next run starts from its midnight
+                    self.progress = datetime.datetime.combine(to_date, datetime.time())
+                from_date = to_date + datetime.timedelta(days=1)
+
+            return {"call_logs": store.records_written}
+
+
+class RecordingJob(SyncJob):
+
+    name = "recordings"
+    pipeline_class = RecordingPipeline
+
+    def __init__(
+        self,
+        interval: float = 3600,
+        directory: str = "recordings",
+        **kwargs,
+    ):
+        """Download new call recordings of every user in the cached directory, tracked in a manifest
+
+        Args:
+            interval (float, optional): seconds between runs. Defaults to 3600.
+            directory (str, optional): top level directory to save files, the manifest is kept in it. Defaults to "recordings".
+            **kwargs: other SyncJob options
+        """
+        super().__init__(interval, **kwargs)
+        self.directory = directory
+
+    def sync(self, daemon, since, until, deadline) -> dict:
+        os.makedirs(self.directory, exist_ok=True)
+
+        with RecordingManifest(
+            os.path.join(self.directory, "manifest.sqlite")
+        ) as manifest:
+            pipeline = self.pipeline_class(
+                daemon.zoomapi,
+                directory=self.directory,
+                manifest=manifest,
+                from_date=since,
+                requests_per_second=daemon.requests_per_second,
+            )
+            stats = pipeline.run(
+                [user["email"] for user in daemon.directory()], deadline=deadline
+            )
+
+        result = stats.as_dict()
+        if stats.errors:
+            # the cursor is not advanced, failed users are retried by the next run
+            raise RuntimeError(
+                f"{len(stats.errors)} errors, first: {stats.errors[0][1]}"
+            )
+        return result
+
+
+class VoicemailJob(RecordingJob):
+
+    name = "voicemails"
+    pipeline_class = VoicemailPipeline
+
+    def __init__(self, interval: float = 3600, directory: str = "voicemails", **kwargs):
+        """Download new voicemails of every user in the cached directory, tracked in a manifest
+
+        Args:
+            interval (float, optional): seconds between runs. Defaults to 3600.
+            directory (str, optional): top level directory to save files, the manifest is kept in it. Defaults to "voicemails".
+            **kwargs: other SyncJob options
+        """
+        super().__init__(interval, directory=directory, **kwargs)
+
+
+class InventoryJob(SyncJob):
+
+    name = "inventory"
+
+    def __init__(self, interval: float = 86400, path: str = "inventory.json", **kwargs):
+        """Snapshot phone users, numbers, sites and call queues to a JSON file, and refresh the cached directory
+
+        Args:
+            interval (float, optional): seconds between runs. Defaults to 86400.
+            path (str, optional): JSON file, replaced atomically by every run. Defaults to "inventory.json".
+            **kwargs: other SyncJob options
+        """
+        super().__init__(interval, **kwargs)
+        self.path = path
+
+    def sync(self, daemon, since, until, deadline) -> dict:
+        phone = daemon.zoomapi.phone
+        inventory = {
+            "updated": until.isoformat(),
+            "users": daemon.directory(refresh=True),
+            "phone_numbers": phone.list_phone_numbers(deadline=deadline),
+            "sites": phone.list_phone_sites(),
+            "call_queues": phone.list_call_queues(),
+        }
+
+        directory = os.path.dirname(os.path.abspath(self.path))
+        with tempfile.NamedTemporaryFile(
+            "w", dir=directory, suffix=".tmp", delete=False
+        ) as temp_file:
+            json.dump(inventory, temp_file, default=str)
+        os.replace(temp_file.name, self.path)
+
+        return {
+            name: len(records)
+            for name, records in inventory.items()
+            if isinstance(records, list)
+        }
+
+
+JOBS = {job.name: job for job in (CallLogJob, RecordingJob, VoicemailJob, InventoryJob)}
+
+
+class SyncDaemon:
+    def __init__(
+        self,
+        zoomapi: ZoomAPIClient,
+        jobs: list,
+        state: str = "zoomphone-sync.sqlite",
+        directory_ttl: float = 3600,
+        health_host: str = "127.0.0.1",
+        health_port: int = None,
+        requests_per_second: float = 10,
+    ):
+        """Run sync jobs on jittered schedules with one long lived API client
+
+        Jobs run one at a time, each with a deadline of its interval so a slow run cannot starve the other jobs.  A
+        job's cursor only advances when a run completes without errors before its deadline.  stop() ends the deadline of
+        the running job, so a shutdown does not wait for a long run.
+
+        Args:
+            zoomapi (ZoomAPIClient): API client kept for the lifetime of the daemon
+            jobs (list): SyncJob instances
+            state (str, optional): SQLite file holding the job cursors. Defaults to "zoomphone-sync.sqlite".
+            directory_ttl (float, optional): seconds the list of phone users is cached. Defaults to 3600.
+            health_host (str, optional): address of the health endpoint. Defaults to "127.0.0.1".
+            health_port (int, optional): port of the health endpoint, 0 for any free port. Defaults to None (no endpoint).
+            requests_per_second (float, optional): request rate of the download pipelines. Defaults to 10.
+        """
+        if len({job.name for job in jobs}) != len(jobs):
+            raise ValueError("each job may only be scheduled once")
+
+        self.zoomapi = zoomapi
+        self.jobs = list(jobs)
+        self.state = SyncState(state)
+        self.directory_ttl = directory_ttl
+        self.requests_per_second = requests_per_second
+        self.started = time.time()
+
+        self._directory = None
+        self._directory_expires = 0
+        self._directory_lock = threading.Lock()
+        self._stop = threading.Event()
+        # deadline of the running job, expired by stop()
+        self._deadline = None
+
+        # keep enough connections open for the download pipelines, they are reused by every run
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=32)
+        zoomapi._session.mount("https://", adapter)
+
+        self.health_server = None
+        if health_port is not None:
+            self.health_server = HealthServer(self, health_host, health_port)
+
+    def directory(self, refresh: bool = False) -> list:
+        """Return the active phone users, listed at most once every 'directory_ttl' seconds"""
+        with self._directory_lock:
+            if (
+                refresh
+                or self._directory is None
+                or time.monotonic() >= self._directory_expires
+            ):
+                self._directory = [
+                    user
+                    for user in self.zoomapi.phone.list_users()
+                    if user.get("status") != "deactivate"
+                ]
+                self._directory_expires = time.monotonic() + self.directory_ttl
+            return self._directory
+
+    def run_job(self, job: SyncJob):
+        """Run a job once from its cursor up to now, and advance the cursor if the run is complete"""
+        until = _utc_now()
+        cursor = self.state.cursor(job.name)
+        if cursor is None:
+            since = until - datetime.timedelta(seconds=job.initial_lookback)
+        else:
+            since = cursor - datetime.timedelta(seconds=job.overlap)
+
+        deadline = self._deadline = Deadline(job.interval)
+        if self._stop.is_set():
+            deadline.expire()
+        job.progress = None
+        started = time.monotonic()
+        job.runs += 1
+        job.last_started = time.time()
+        logger.info(f"Running {job.name} from {since:%Y-%m-%d %H:%M:%S} UTC")
+
+        try:
+            result = job.sync(self, since, until, deadline)
+        except Exception as e:
+            job.failures += 1
+            job.consecutive_failures += 1
+            job.last_error = str(e)
+            logger.info(f" - {job.name} failed: {e}")
+            return
+        finally:
+            job.last_duration = time.monotonic() - started
+            self._deadline = None
+
+        job.last_result = result
+        job.last_error = None
+        job.consecutive_failures = 0
+
+        if deadline.expired:
+            # incomplete, the next run starts from the same cursor or from as far as the job got
+            if job.progress is not None and (cursor is None or job.progress > cursor):
+                self.state.set_cursor(job.name, job.progress)
+            logger.info(f" - {job.name} reached its deadline: {result}")
+            return
+
+        job.last_success = time.time()
+        self.state.set_cursor(job.name, until)
+        logger.info(f" - {job.name} completed: {result}")
+
+    def run(self):
+        """Run the jobs until stop() is called, e.g. from a SIGTERM handler"""
+        if self.health_server is not None:
+            threading.Thread(
+                target=self.health_server.serve_forever, daemon=True
+            ).start()
+            logger.info(f"Health endpoint listening on {self.health_server.url}")
+
+        # first runs are spread over the first second so a restart does not send every job's requests at once
+        now = time.time()
+        schedule = []
+        for index, job in enumerate(self.jobs):
+            job.next_run = now + random.uniform(0, 1)
+            heapq.heappush(schedule, (job.next_run, index))
+
+        try:
+            while not self._stop.is_set():
+                next_run, index = schedule[0]
+                if self._stop.wait(max(0, next_run - time.time())):
+                    break
+
+                heapq.heappop(schedule)
+                job = self.jobs[index]
+                self.run_job(job)
+
+                job.next_run = time.time() + job.next_interval()
+                heapq.heappush(schedule, (job.next_run, index))
+        finally:
+            if self.health_server is not None:
+                self.health_server.shutdown()
+                self.health_server.server_close()
+            self.state.close()
+
+    def stop(self):
+        """Stop the daemon, the running job's deadline is ended so it only finishes the requests and downloads in progress"""
+        self._stop.set()
+        deadline = self._deadline
+        if deadline is not None:
+            deadline.expire()
+
+    def healthy(self) -> bool:
+        breaker = self.zoomapi._transport.circuit_breaker
+        if breaker and breaker.state == "open":
+            return False
+        return all(job.consecutive_failures < UNHEALTHY_FAILURES for job in self.jobs)
+
+    def metrics(self) -> dict:
+        transport = self.zoomapi._transport
+        metrics = {
+            "uptime_seconds": time.time() - self.started,
+            "jobs": {job.name: job.as_dict() for job in self.jobs},
+            "directory_users": len(self._directory or []),
+            "circuit_breaker": (
+                transport.circuit_breaker.state if transport.circuit_breaker else None
+            ),
+        }
+
+        if transport.concurrency:
+            metrics["concurrency"] = transport.concurrency.as_dict()
+        if transport.hedging is not None:
+            metrics["hedging"] = transport.hedging.as_dict()
+        if transport.quota_ledger is not None:
+            metrics["quota_remaining"] = {
+                category: transport.quota_ledger.remaining(category)
+                for category in transport.quota_ledger.daily_limits
+            }
+
+        return metrics
+
+
+class HealthServer(http.server.ThreadingHTTPServer):
+    def __init__(self, daemon: SyncDaemon, host: str = "127.0.0.1", port: int = 8751):
+        """Serve GET /health and GET /metrics of a SyncDaemon
+
+        Args:
+            daemon (SyncDaemon): daemon to report on
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): port to listen on, 0 for any free port. Defaults to 8751.
+        """
+        self.daemon = daemon
+        super().__init__((host, port), _HealthRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _HealthRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/health":
+            healthy = self.server.daemon.healthy()
+            status = 200 if healthy else 503
+            body = {"status": "ok" if healthy else "failing"}
+        elif self.path == "/metrics":
+            status = 200
+            body = self.server.daemon.metrics()
+        else:
+            self.send_error(404)
+            return
+
+        body = json.dumps(body, default=str).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main(argv: list = None):
+    """Entry point of the 'zoomphone-sync' command"""
+    parser = argparse.ArgumentParser(
+        prog="zoomphone-sync",
+        description="Keep call logs, recordings, voicemails and inventory in sync with a Zoom Phone account.",
+    )
+    parser.add_argument(
+        "-API_KEY", type=str, help="API key for Zoom account.", required=True
+    )
+    parser.add_argument(
+        "-API_SECRET", type=str, help="API secret for Zoom account.", required=True
+    )
+    parser.add_argument(
+        "-jobs",
+        nargs="+",
+        default=["call_logs", "recordings", "inventory"],
+        choices=sorted(JOBS),
+        help="Jobs to run.",
+    )
+    for name, job in JOBS.items():
+        parser.add_argument(
+            f"-{name}_interval",
+            type=float,
+            default=None,
+            help=f"Seconds between {name} runs. Defaults to the job's own interval.",
+        )
+    parser.add_argument(
+        "-state",
+        type=str,
+        default="zoomphone-sync.sqlite",
+        help="SQLite file holding the position of every job, runs continue from it after a restart.",
+    )
+    parser.add_argument(
+        "-health_port",
+        type=int,
+        default=8751,
+        help="Port of the local /health and /metrics endpoint, -1 to disable.",
+    )
+    parser.add_argument(
+        "-rate_limit_store",
+        type=str,
+        default="",
+        help="SQLite file (or http:// url of a BucketServer) holding a request budget shared with other scripts running against the same Zoom account.",
+    )
+    parser.add_argument(
+        "-requests_per_second",
+        type=float,
+        default=10,
+        help="Requests per second shared by all scripts using the same -rate_limit_store.",
+    )
+    parser.add_argument(
+        "-quota_ledger",
+        type=str,
+        default="",
+        help="SQLite file counting requests per day against the daily quota of heavy requests.",
+    )
+    args = parser.parse_args(argv)
+
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        ch = logging.StreamHandler()
+        ch.setLevel(logging.INFO)
+        logger.addHandler(ch)
+
+    zoomapi = ZoomAPIClient(
+        args.API_KEY,
+        args.API_SECRET,
+        rate_limiter=shared_rate_limiter(
+            args.rate_limit_store, args.requests_per_second
+        ),
+        priority="bulk",
+        quota_ledger=QuotaLedger(args.quota_ledger) if args.quota_ledger else None,
+    )
+
+    intervals = {
+        name: {"interval": getattr(args, f"{name}_interval")}
+        for name in JOBS
+        if getattr(args, f"{name}_interval") is not None
+    }
+
+    daemon = SyncDaemon(
+        zoomapi,
+        [
+            JOBS[name](**intervals[name]) if name in intervals else JOBS[name]()
+            for name in args.jobs
+        ],
+        state=args.state,
+        health_port=args.health_port if args.health_port >= 0 else None,
+        requests_per_second=args.requests_per_second,
+    )
+
+    # finish the running job and exit on SIGTERM (e.g. systemctl stop) or Ctrl-C
+    signal.signal(signal.SIGTERM, lambda signum, frame: daemon.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: daemon.stop())
+
+    daemon.run()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import time
+import datetime
+
+
+class Deadline:
+    def __init__(self, seconds: float):
+        """A point in time by which work must be finished, shared by every request, retry and page of an operation
+
+        Methods with a 'deadline' option accept a Deadline, a number of seconds from now or a datetime.  Paginated
+        methods stop at the deadline and return the records received so far, check 'expired' to know whether the
+        result is complete.
+
+        Example:
+            deadline = Deadline(15 * 60)
+            call_logs = zoomapi.phone.get_account_call_logs(from_date, to_date, deadline=deadline)
+            if deadline.expired:
+                logger.info("call log export is incomplete")
+
+        Args:
+            seconds (float): seconds from now
+        """
+        self.expires_at = time.monotonic() + seconds
+
+    @classmethod
+    def coerce(cls, value):
+        """Return a Deadline for a Deadline, seconds from now (int / float) or datetime.datetime, or None for None"""
+        if value is None or isinstance(value, Deadline):
+            return value
+
+        if isinstance(value, datetime.datetime):
+            now = datetime.datetime.now(value.tzinfo)
+            return cls((value - now).total_seconds())
+
+        return cls(float(value))
+
+    def remaining(self) -> float:
+        """Seconds left, 0 once the deadline has passed"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def expire(self):
+        """End the deadline now, e.g. on shutdown.  Work sharing it stops as if it had run out of time"""
+        self.expires_at = min(self.expires_at, time.monotonic())
+
+    def cap_timeout(self, timeout):
+        """Limit a requests timeout (seconds or a (connect, read) tuple) to the time remaining"""
+        remaining = self.remaining()
+
+        if timeout is None:
+            return remaining
+        if isinstance(timeout, tuple):
+            return tuple(
+                remaining if part is None else min(part, remaining) for part in timeout
+            )
+        return min(timeout, remaining)
@@ -1,4 +1,25 @@
 class ZoomAPIError(Exception):
     """Base class for exceptions in this module."""
 
-    pass
\ No newline at end of file
+    pass
+
+
+class CircuitOpenError(ZoomAPIError):
+    """Raised without sending a request while the circuit breaker is open because the Zoom API is failing."""
+
+    pass
+
+
+class DeadlineExceeded(ZoomAPIError):
+    """Raised when a request cannot complete before its deadline."""
+
+    pass
+
+
+class QuotaExhausted(ZoomAPIError):
+    """Raised without sending a request when the daily quota of its rate limit category is used up."""
+
+    def __init__(self, message: str, category: str = None, resets_at=None):
+        super().__init__(message)
+        self.category = category
+        self.resets_at = resets_at
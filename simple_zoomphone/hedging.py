@@ -0,0 +1,114 @@
+"""Request hedging for the latency tail of idempotent GET requests.
+
+In a large crawl a few requests take many times the median latency, and because pages and users are fetched one
+after another those stragglers set the total run time.  With hedging, a GET that has not completed after the
+recent 'percentile' latency of its rate limit category is sent a second time and whichever response arrives first
+is used, the other is discarded.
+
+Hedges are budgeted: each request earns 'max_fraction' of a hedge, so at most that fraction of requests is sent
+twice, and a hedge is only sent if the rate budget has a token available right away and fits the daily quota.
+
+Example:
+    zoomapi = ZoomAPIClient(API_KEY, API_SECRET, hedging=HedgingPolicy(percentile=95, max_fraction=0.05))
+"""
+
+import threading
+import collections
+
+
+class HedgingPolicy:
+    def __init__(
+        self,
+        percentile: float = 95,
+        min_delay: float = 0.05,
+        max_fraction: float = 0.05,
+        window: int = 200,
+        min_samples: int = 20,
+        max_workers: int = 16,
+    ):
+        """When idempotent GET requests are sent a second time, and how many may be
+
+        Args:
+            percentile (float, optional): latency percentile of recent requests in the same rate limit category after which a hedge is sent. Defaults to 95.
+            min_delay (float, optional): minimum seconds before a hedge is sent. Defaults to 0.05.
+            max_fraction (float, optional): maximum fraction of requests that are hedged. Defaults to 0.05.
+            window (int, optional): number of recent latencies per category the percentile is taken from. Defaults to 200.
+            min_samples (int, optional): latencies needed in a category before its requests are hedged. Defaults to 20.
+            max_workers (int, optional): threads sending hedged requests. Defaults to 16.
+        """
+        if not 0 < percentile < 100:
+            raise ValueError("'percentile' must be between 0 and 100")
+        if not 0 <= max_fraction <= 1:
+            raise ValueError("'max_fraction' must be between 0 and 1")
+
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_fraction = max_fraction
+        self.window = window
+        self.min_samples = min_samples
+        self.max_workers = max_workers
+
+        self._lock = threading.Lock()
+        self._latencies = collections.defaultdict(
+            lambda: collections.deque(maxlen=window)
+        )
+        # hedge credit, earned by every request and spent by every hedge.  Capped at the hedges allowed in one window, so
+        # no 'window' consecutive requests include more than 'max_fraction' hedges
+        self._credit = 0.0
+        self._max_credit = max(1.0, max_fraction * window)
+        self.requests = 0
+        self.hedges = 0
+        self.hedges_won = 0
+
+    def record(self, category: str, latency: float):
+        """Add the latency of a completed request"""
+        with self._lock:
+            self._latencies[category].append(latency)
+
+    def delay(self, category: str) -> float:
+        """Seconds after which a request in this category is hedged, None while there are too few samples"""
+        with self._lock:
+            latencies = sorted(self._latencies[category])
+
+        if len(latencies) < self.min_samples:
+            return None
+
+        index = min(len(latencies) - 1, int(len(latencies) * self.percentile / 100))
+        return max(self.min_delay, latencies[index])
+
+    def request_started(self):
+        with self._lock:
+            self.requests += 1
+            self._credit = min(self._max_credit, self._credit + self.max_fraction)
+
+    def try_spend(self) -> bool:
+        """Take the budget for one hedge, returns False if the hedge budget is used up"""
+        with self._lock:
+            if self._credit < 1:
+                return False
+            self._credit -= 1
+            self.hedges += 1
+            return True
+
+    def refund(self):
+        """Give back the budget taken by try_spend() for a hedge that was not sent"""
+        with self._lock:
+            self._credit = min(self._max_credit, self._credit + 1)
+            self.hedges -= 1
+
+    def hedge_won(self):
+        with self._lock:
+            self.hedges_won += 1
+
+    def as_dict(self) -> dict:
+        """Requests, hedges sent, hedges that completed first and the current hedge delay per category"""
+        with self._lock:
+            categories = list(self._latencies)
+            counters = {
+                "requests": self.requests,
+                "hedges": self.hedges,
+                "hedges_won": self.hedges_won,
+            }
+
+        counters["delays"] = {category: self.delay(category) for category in categories}
+        return counters
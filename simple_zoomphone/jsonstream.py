@@ -0,0 +1,145 @@
+"""Incremental parser for paginated Zoom Phone API responses.
+
+response.json() holds the complete response body as a string and then the complete object tree of every record
+in memory.  parse_page instead decodes the body as chunks arrive from the network: records in the paginated list
+are decoded one at a time, projected to the requested fields and the consumed part of the body is discarded.  Peak
+memory per page is the projected records plus one network chunk, instead of the body plus every full record.
+
+Example:
+    response = session.get(url, params=params, stream=True)
+    page = parse_page(response.iter_content(chunk_size=65536), "call_logs", fields=["id", "date_time", "duration"])
+    page["call_logs"], page["next_page_token"]
+"""
+
+import json
+import codecs
+
+_WHITESPACE = " \t\n\r"
+
+_decoder = json.JSONDecoder()
+
+
+class _StreamBuffer:
+    """Text buffer over an iterable of UTF-8 byte chunks, read with a cursor"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self.text = ""
+        self.position = 0
+        self.eof = False
+
+    def fill(self) -> bool:
+        """Read the next chunk, dropping text before the cursor.  Returns False once the stream is exhausted"""
+        if self.eof:
+            return False
+
+        chunk = next(self._chunks, None)
+        if chunk is None:
+            self.eof = True
+            decoded = self._utf8.decode(b"", final=True)
+        else:
+            decoded = self._utf8.decode(chunk)
+
+        self.text = self.text[self.position :] + decoded
+        self.position = 0
+        return True
+
+    def peek(self) -> str:
+        """Return the next non whitespace character without consuming it"""
+        while True:
+            while (
+                self.position < len(self.text)
+                and self.text[self.position] in _WHITESPACE
+            ):
+                self.position += 1
+
+            if self.position < len(self.text):
+                return self.text[self.position]
+
+            if not self.fill():
+                raise json.JSONDecodeError(
+                    "Unexpected end of JSON response", self.text, self.position
+                )
+
+    def expect(self, character: str):
+        found = self.peek()
+        if found != character:
+            raise json.JSONDecodeError(
+                f"Expected '{character}' but found '{found}'", self.text, self.position
+            )
+        self.position += 1
+
+    def value(self):
+        """Decode one complete JSON value at the cursor, reading more chunks until it is complete"""
+        self.peek()
+
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.position)
+
+                # a number at the end of the buffer may continue in the next chunk
+                if end < len(self.text) or self.eof:
+                    self.position = end
+                    return value
+
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+
+            self.fill()
+
+
+def parse_page(chunks, key: str, fields: list = None) -> dict:
+    """Incrementally parse one page of a paginated Zoom Phone API response
+
+    Args:
+        chunks (iterable): bytes chunks of the response body, e.g. response.iter_content(chunk_size=65536)
+        key (str): key of the list of records in the response, e.g. 'call_logs'
+        fields (list, optional): top level record keys to keep, all other keys are dropped as each record is decoded. Defaults to None (keep all keys).
+
+    Raises:
+        json.JSONDecodeError: If the response is not valid JSON
+
+    Returns:
+        dict: the response with the same keys as response.json(), the 'key' list only holds the projected records
+    """
+    buffer = _StreamBuffer(chunks)
+    page = {}
+
+    buffer.expect("{")
+    if buffer.peek() == "}":
+        return page
+
+    while True:
+        name = buffer.value()
+        buffer.expect(":")
+
+        if name == key and buffer.peek() == "[":
+            records = page[key] = []
+            buffer.expect("[")
+
+            if buffer.peek() == "]":
+                buffer.expect("]")
+            else:
+                while True:
+                    record = buffer.value()
+                    if fields is not None and isinstance(record, dict):
+                        record = {
+                            field: record[field] for field in fields if field in record
+                        }
+                    records.append(record)
+
+                    if buffer.peek() == ",":
+                        buffer.expect(",")
+                    else:
+                        buffer.expect("]")
+                        break
+        else:
+            page[name] = buffer.value()
+
+        if buffer.peek() == ",":
+            buffer.expect(",")
+        else:
+            buffer.expect("}")
+            return page
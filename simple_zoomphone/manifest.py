@@ -0,0 +1,163 @@
+import os
+import sqlite3
+import datetime
+import threading
+import concurrent.futures
+
+from .media import file_checksum
+
+
+class RecordingManifest:
+    def __init__(self, path: str):
+        """SQLite index of downloaded media keyed by recording (or voicemail) id
+
+        Stores the path, size, SHA-256 checksum and download time of every downloaded file.  All ids are loaded into
+        memory when the manifest is opened, so deciding whether a recording has already been downloaded is a set
+        lookup instead of a stat() of the file on disk.  The manifest can be shared by download threads.
+
+        Example:
+            manifest = RecordingManifest("recordings/manifest.sqlite")
+            if not manifest.contains(recording["id"]):
+                bytes_received, size, sha256 = downloader.download_with_checksum(recording["download_url"], path)
+                manifest.add(recording["id"], path, size, sha256)
+
+        Args:
+            path (str): path to SQLite database file, created if it does not exist.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS media ("
+                "id TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER, sha256 TEXT, downloaded_at TEXT)"
+            )
+
+        self._ids = set(
+            row[0] for row in self._connection.execute("SELECT id FROM media")
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def contains(self, media_id: str) -> bool:
+        """Return True if this recording id has been downloaded"""
+        return media_id in self._ids
+
+    def add(self, media_id: str, path: str, size: int, sha256: str):
+        """Record a completed download"""
+        downloaded_at = datetime.datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
+
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO media (id, path, size, sha256, downloaded_at) VALUES (?, ?, ?, ?, ?)",
+                    (media_id, path, size, sha256, downloaded_at),
+                )
+            self._ids.add(media_id)
+
+    def remove(self, media_id: str):
+        """Forget a download, e.g. after verify() reported it as corrupt, so it is downloaded again"""
+        with self._lock:
+            with self._connection:
+                self._connection.execute("DELETE FROM media WHERE id = ?", (media_id,))
+            self._ids.discard(media_id)
+
+    def get(self, media_id: str) -> dict:
+        """Return the manifest entry of a recording id, or None"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT id, path, size, sha256, downloaded_at FROM media WHERE id = ?",
+                (media_id,),
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return dict(zip(["id", "path", "size", "sha256", "downloaded_at"], row))
+
+    def entries(self) -> list:
+        """Return all manifest entries as (id, path, size, sha256) tuples"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT id, path, size, sha256 FROM media"
+            ).fetchall()
+
+    def verify(self, workers: int = 8, storage=None) -> list:
+        """Re-hash every file in the manifest in parallel and compare with the stored size and checksum
+
+        Args:
+            workers (int, optional): number of files hashed concurrently. Defaults to 8.
+            storage (optional): storage backend the media was stored with, needed for backends other than plain files (e.g. ShardedStorage). Defaults to None.
+
+        Returns:
+            list: (id, path, problem) tuples for every file that failed verification, problem is 'missing', 'size mismatch' or 'checksum mismatch'
+        """
+
+        def verify_entry(entry):
+            media_id, path, size, sha256 = entry
+
+            if storage is not None:
+                result = storage.checksum(path)
+            elif os.path.exists(path):
+                result = (os.path.getsize(path), None)
+            else:
+                result = None
+
+            if result is None:
+                return (media_id, path, "missing")
+
+            actual_size, actual_sha256 = result
+
+            if size is not None and actual_size != size:
+                return (media_id, path, "size mismatch")
+
+            if actual_sha256 is None and sha256 is not None:
+                actual_sha256 = file_checksum(path)
+
+            if sha256 is not None and actual_sha256 != sha256:
+                return (media_id, path, "checksum mismatch")
+
+            return None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as executor:
+            results = executor.map(verify_entry, self.entries())
+            return [result for result in results if result is not None]
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def verify_manifest(path: str, storage=None, workers: int = 8) -> list:
+    """Re-hash every file in the manifest at 'path' and remove the entries that failed verification
+
+    Removed entries are downloaded again on the next run of the download script.
+
+    Args:
+        path (str): path to the manifest SQLite file.
+        storage (optional): storage backend the media was stored with, see RecordingManifest.verify. Defaults to None.
+        workers (int, optional): number of files hashed concurrently. Defaults to 8.
+
+    Returns:
+        list: (id, path, problem) tuples for every file that failed verification, see RecordingManifest.verify
+    """
+    with RecordingManifest(path) as manifest:
+        problems = manifest.verify(workers=workers, storage=storage)
+
+        for media_id, media_path, problem in problems:
+            manifest.remove(media_id)
+
+    return problems
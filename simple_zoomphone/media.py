@@ -0,0 +1,200 @@
+import os
+import hashlib
+
+from .exceptions import ZoomAPIError
+from .transport import Transport
+
+
+def _hash_file(path: str, hasher, block_size: int = 1024 * 1024):
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            hasher.update(block)
+    return hasher
+
+
+def file_checksum(path: str) -> str:
+    """Return the SHA-256 hex digest of a file"""
+    return _hash_file(path, hashlib.sha256()).hexdigest()
+
+
+def _resumes_at(response, offset: int) -> bool:
+    """Return whether the response to a 'Range: bytes=<offset>-' request continues a partial file of 'offset' bytes"""
+    content_range = response.headers.get("Content-Range", "")
+
+    if response.status_code == 206:
+        # bytes <offset>-<last>/<total>
+        return content_range.startswith(f"bytes {offset}-")
+
+    if response.status_code == 416:
+        # bytes */<total>, the partial file already holds every byte
+        return content_range == f"bytes */{offset}"
+
+    return False
+
+
+class MediaDownloader:
+    def __init__(
+        self,
+        session,
+        chunk_size: int = 1024 * 1024,
+        bandwidth_limiter=None,
+        transport: Transport = None,
+    ):
+        """Stream Zoom Phone media (call recordings, voicemails) to disk
+
+        Downloads are streamed in 'chunk_size' pieces to a '<path>.part' file, so memory use does not depend on the
+        length of the recording.  Once complete the file is fsynced and atomically renamed to its final path, so a
+        file at the final path is always complete.  If a '.part' file is left behind by an interrupted download, the
+        next download of the same file resumes from where it stopped with an HTTP Range request.
+
+        Args:
+            session (requests.Session): authenticated session, e.g. ZoomAPIClient._session
+            chunk_size (int, optional): bytes read from the network per write. Defaults to 1MB.
+            bandwidth_limiter (TokenBucket, optional): token bucket in bytes per second shared by all downloads, e.g. TokenBucket(5 * 1024 * 1024) for 5MB/s. Defaults to None (unlimited).
+            transport (Transport, optional): transport used to send requests and retry failures, e.g. ZoomAPIClient._transport. Defaults to Transport(session).
+        """
+        self._session = session
+        self._transport = transport or Transport(session)
+        self.chunk_size = chunk_size
+        self._bandwidth_limiter = bandwidth_limiter
+        self._created_directories = set()
+
+    def _get(self, url: str, headers: dict):
+        # partial content (206) and range not satisfiable (416) are only answers to a Range request
+        ok_statuses = (200, 206, 416) if "Range" in headers else (200,)
+
+        # failed requests and rate limits are retried by the transport according to its retry policy
+        response = self._transport.request(
+            "GET", url, ok_statuses=ok_statuses, headers=headers, stream=True
+        )
+
+        if response.status_code in ok_statuses:
+            return response
+
+        response.close()
+
+        if response.status_code == 429:
+            raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
+        else:
+            raise ZoomAPIError(
+                f"Received status code {response.status_code} on request {url}"
+            )
+
+    def stream(self, url: str):
+        """Generator yielding the content of a media file in 'chunk_size' pieces, for storage backends that write somewhere other than a plain file
+
+        Raises:
+            ZoomAPIError: If the download fails
+        """
+        response = self._get(url, {})
+
+        try:
+            for chunk in response.iter_content(chunk_size=self.chunk_size):
+                if self._bandwidth_limiter:
+                    self._bandwidth_limiter.acquire(len(chunk))
+                yield chunk
+        finally:
+            response.close()
+
+    def _make_directory(self, path: str):
+        # directories are cached so that each directory is only created (stat'ed) once per downloader
+        directory = os.path.dirname(path)
+        if directory and directory not in self._created_directories:
+            os.makedirs(directory, exist_ok=True)
+            self._created_directories.add(directory)
+
+    def _download(self, url: str, path: str, skip_existing: bool, checksum: bool):
+        if skip_existing and os.path.exists(path):
+            if checksum:
+                return 0, os.path.getsize(path), file_checksum(path)
+            return 0, None, None
+
+        self._make_directory(path)
+
+        temporary_path = path + ".part"
+
+        offset = 0
+        if os.path.exists(temporary_path):
+            # resume a previously interrupted download
+            offset = os.path.getsize(temporary_path)
+
+        response = self._get(url, {"Range": f"bytes={offset}-"} if offset else {})
+
+        if offset and not _resumes_at(response, offset):
+            # the server ignored the Range header or answered for a different range, start from the beginning
+            if response.status_code != 200:
+                response.close()
+                response = self._get(url, {})
+            offset = 0
+
+        bytes_received = 0
+        hasher = hashlib.sha256() if checksum else None
+
+        try:
+            if offset:
+                # append to the partial download, 416 means the partial download is already complete
+                mode = "ab"
+                if hasher:
+                    _hash_file(temporary_path, hasher)
+            else:
+                mode = "wb"
+
+            with open(temporary_path, mode) as f:
+                if response.status_code != 416:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if self._bandwidth_limiter:
+                            self._bandwidth_limiter.acquire(len(chunk))
+                        f.write(chunk)
+                        if hasher:
+                            hasher.update(chunk)
+                        bytes_received += len(chunk)
+
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            response.close()
+
+        os.replace(temporary_path, path)
+
+        return (
+            bytes_received,
+            offset + bytes_received,
+            hasher.hexdigest() if hasher else None,
+        )
+
+    def download(self, url: str, path: str, skip_existing: bool = True) -> int:
+        """Download a media file to 'path'
+
+        Args:
+            url (str): download url, e.g. the 'download_url' of a call recording
+            path (str): final path of the downloaded file, parent directories are created as needed
+            skip_existing (bool, optional): If set to 'True' a file already at 'path' is considered complete and not downloaded again. Defaults to True.
+
+        Raises:
+            ZoomAPIError: If the download fails
+
+        Returns:
+            int: number of bytes received from the network (0 if the file was skipped)
+        """
+        bytes_received, size, sha256 = self._download(
+            url, path, skip_existing, checksum=False
+        )
+        return bytes_received
+
+    def download_with_checksum(
+        self, url: str, path: str, skip_existing: bool = True
+    ) -> tuple:
+        """Download a media file to 'path' and calculate its SHA-256 checksum while it is streamed
+
+        Args:
+            url (str): download url, e.g. the 'download_url' of a call recording
+            path (str): final path of the downloaded file, parent directories are created as needed
+            skip_existing (bool, optional): If set to 'True' a file already at 'path' is considered complete, it is hashed but not downloaded again. Defaults to True.
+
+        Raises:
+            ZoomAPIError: If the download fails
+
+        Returns:
+            tuple: (bytes received from the network, file size, SHA-256 hex digest)
+        """
+        return self._download(url, path, skip_existing, checksum=True)
@@ -0,0 +1,257 @@
+import os
+import time
+import uuid
+import urllib.parse
+
+from .schema import CALL_LOG_FIELDS, flatten_record
+
+# Hive convention for partitions with a null value
+HIVE_DEFAULT_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise RuntimeError(
+            "pyarrow is required for Parquet export, install with 'pip install simple_zoomphone[parquet]'"
+        )
+    return pyarrow
+
+
+def _arrow_type(pa, column_type: str):
+    if column_type == "string":
+        return pa.string()
+    elif column_type == "int32":
+        return pa.int32()
+    elif column_type == "bool":
+        return pa.bool_()
+    elif column_type == "timestamp":
+        return pa.timestamp("s", tz="UTC")
+    else:
+        raise ValueError(f"Unknown column type '{column_type}'")
+
+
+class ParquetDatasetWriter:
+    def __init__(
+        self,
+        root_path: str,
+        fields: list = CALL_LOG_FIELDS,
+        partition_by: tuple = ("date", "site"),
+        row_group_size: int = 50000,
+        compression: str = "snappy",
+    ):
+        """Write Zoom Phone records (call logs, recording metadata) as a Hive partitioned Parquet dataset.
+
+        Files are written as root_path/date=yyyy-mm-dd/site=<site name>/part-<uuid>.parquet.
+        Records are buffered per partition and flushed as a Parquet row group every 'row_group_size' records, so memory use is bounded by row_group_size x open partitions.
+        Each file is written to a hidden temporary file and renamed into place on close(), readers will never see a partially written file.
+
+        Example:
+            with ParquetDatasetWriter("call_logs_parquet") as writer:
+                for page in zoomapi.phone.get_account_call_logs(from_date, to_date, paged=True):
+                    writer.write_page(page)
+
+        Args:
+            root_path (str): top level directory of the dataset
+            fields (list, optional): field definitions from simple_zoomphone.schema. Defaults to CALL_LOG_FIELDS.
+            partition_by (tuple, optional): partition columns, any of 'date' and 'site'. Defaults to ("date", "site").
+            row_group_size (int, optional): number of records per Parquet row group. Defaults to 50000.
+            compression (str, optional): Parquet compression codec. Defaults to "snappy".
+
+        Raises:
+            RuntimeError: If pyarrow is not installed
+            ValueError: If partition_by contains an unsupported column
+        """
+        self._pa = _import_pyarrow()
+
+        for partition in partition_by:
+            if partition not in ["date", "site"]:
+                raise ValueError("'partition_by' may only contain 'date' and 'site'")
+
+        self._root_path = root_path
+        self._fields = fields
+        self._partition_by = tuple(partition_by)
+        self._row_group_size = row_group_size
+        self._compression = compression
+
+        self._schema = self._pa.schema(
+            [
+                (name, _arrow_type(self._pa, column_type))
+                for name, column_type, source_path in fields
+            ]
+        )
+
+        # partition directory -> list of buffered chunks, each a list of rows (write_record) or a pyarrow Table (write_batch)
+        self._buffers = {}
+        # partition directory -> number of buffered rows
+        self._buffered_rows = {}
+        # partition directory -> (pyarrow ParquetWriter, temporary path, final path)
+        self._writers = {}
+        self._files_written = []
+        self.records_written = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def _partition_directory(self, date: str, site: str) -> str:
+        parts = []
+        for partition in self._partition_by:
+            value = date if partition == "date" else site
+
+            if value is None:
+                value = HIVE_DEFAULT_PARTITION
+            else:
+                value = urllib.parse.quote(value, safe=" ")
+
+            parts.append(f"{partition}={value}")
+
+        return os.path.join(self._root_path, *parts)
+
+    def _buffer(self, partition_directory: str, rows: int, chunk=None, row=None):
+        buffer = self._buffers.setdefault(partition_directory, [])
+
+        if row is not None:
+            # consecutive rows are collected in one list chunk
+            if not buffer or not isinstance(buffer[-1], list):
+                buffer.append([])
+            buffer[-1].append(row)
+        else:
+            buffer.append(chunk)
+
+        self._buffered_rows[partition_directory] = (
+            self._buffered_rows.get(partition_directory, 0) + rows
+        )
+
+        if self._buffered_rows[partition_directory] >= self._row_group_size:
+            self._flush_partition(partition_directory)
+
+    def write_record(self, record: dict):
+        """Add a single Zoom API record to the dataset"""
+        row = flatten_record(record, self._fields)
+        partition_directory = self._partition_directory(
+            row["date_time"].strftime("%Y-%m-%d") if row.get("date_time") else None,
+            row.get("site_name"),
+        )
+
+        self._buffer(partition_directory, 1, row=row)
+
+    def write_batch(self, batch):
+        """Add one ColumnBatch (e.g. from get_account_call_logs(paged=True, columnar=True)) to the dataset
+
+        The batch is converted to Arrow once and split by partition, no per record dicts are created.  The batch must have the same fields as the writer.
+        """
+        table = batch.to_arrow(self._schema)
+
+        # dates are formatted once per day rather than once per record
+        days = {}
+        dates = []
+        for epoch, valid in zip(batch["date_time"], batch.is_valid("date_time")):
+            day = epoch // 86400 if valid else None
+            if day not in days:
+                days[day] = (
+                    time.strftime("%Y-%m-%d", time.gmtime(epoch)) if valid else None
+                )
+            dates.append(days[day])
+
+        partitions = {}
+        for index, (date, site) in enumerate(zip(dates, batch["site_name"])):
+            partitions.setdefault(self._partition_directory(date, site), []).append(
+                index
+            )
+
+        for partition_directory, indices in partitions.items():
+            self._buffer(
+                partition_directory,
+                len(indices),
+                chunk=(table if len(indices) == len(table) else table.take(indices)),
+            )
+
+    def write_batches(self, batches):
+        """Add every ColumnBatch yielded by a columnar paged Phone method"""
+        for batch in batches:
+            self.write_batch(batch)
+
+    def write_page(self, records: list):
+        """Add one page of Zoom API records to the dataset"""
+        for record in records:
+            self.write_record(record)
+
+    def write_pages(self, pages):
+        """Add every page yielded by a paged Phone method (e.g. get_account_call_logs(paged=True))"""
+        for page in pages:
+            self.write_page(page)
+
+    def _flush_partition(self, partition_directory: str):
+        chunks = self._buffers.pop(partition_directory, [])
+        rows = self._buffered_rows.pop(partition_directory, 0)
+        if not rows:
+            return
+
+        if partition_directory not in self._writers:
+            os.makedirs(partition_directory, exist_ok=True)
+            filename = f"part-{uuid.uuid4().hex}.parquet"
+            final_path = os.path.join(partition_directory, filename)
+            temporary_path = os.path.join(partition_directory, f".{filename}.tmp")
+
+            writer = self._pa.parquet.ParquetWriter(
+                temporary_path, self._schema, compression=self._compression
+            )
+            self._writers[partition_directory] = (writer, temporary_path, final_path)
+
+        writer = self._writers[partition_directory][0]
+
+        table = self._pa.concat_tables(
+            [
+                (
+                    self._pa.Table.from_pylist(chunk, schema=self._schema)
+                    if isinstance(chunk, list)
+                    else chunk
+                )
+                for chunk in chunks
+            ]
+        )
+        writer.write_table(table, row_group_size=self._row_group_size)
+        self.records_written += rows
+
+    def close(self) -> list:
+        """Flush all buffered records and atomically move every file into place
+
+        Returns:
+            list: paths of the Parquet files written
+        """
+        for partition_directory in list(self._buffers):
+            self._flush_partition(partition_directory)
+
+        for writer, temporary_path, final_path in self._writers.values():
+            writer.close()
+
+            # make sure the data is on disk before the rename makes it visible to readers
+            with open(temporary_path, "rb") as f:
+                os.fsync(f.fileno())
+            os.replace(temporary_path, final_path)
+
+            self._files_written.append(final_path)
+
+        self._writers = {}
+
+        return self._files_written
+
+    def abort(self):
+        """Discard buffered records and remove any partially written files"""
+        self._buffers = {}
+        self._buffered_rows = {}
+
+        for writer, temporary_path, final_path in self._writers.values():
+            writer.close()
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+
+        self._writers = {}
@@ -2,13 +2,44 @@ import time
 import json
 import datetime
 
-from .util import validateparam
+from .util import validateparam, prefetch as prefetch_iterator
 from .exceptions import ZoomAPIError
+from .transport import Transport
+from .deadline import Deadline
+from .batches import ColumnBatch
+from .jsonstream import parse_page
+
+
+def _truncate_page(records: list, stop_when) -> tuple:
+    """Apply a 'stop_when' predicate to one page of records.
+
+    Returns:
+        tuple: (records before the first record matching 'stop_when', True if pagination should stop)
+    """
+    if stop_when is None:
+        return records, False
+
+    for index, record in enumerate(records):
+        if stop_when(record):
+            return records[:index], True
+
+    return records, False
+
+
+def _deadline_expired(deadline) -> bool:
+    return deadline is not None and deadline.expired
+
+
+def _newer_than(from_date: datetime.datetime):
+    """Return a 'stop_when' predicate for newest-first endpoints that stops at the first record older than from_date"""
+    cutoff = from_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+    return lambda record: record.get("date_time", cutoff) < cutoff
 
 
 class Phone:
-    def __init__(self, session, server):
+    def __init__(self, session, server, transport: Transport = None):
         self._session = session
+        self._transport = transport or Transport(session)
         self._server = server
 
     def _phone_get(
@@ -17,6 +48,10 @@ class Phone:
         params: dict = None,
         raw: bool = False,
         key_in_response_to_return: str = None,
+        stop_when=None,
+        record_type=None,
+        fields: list = None,
+        deadline=None,
     ):
         """Generic HTTP GET method for Zoom Phone API.
 
@@ -27,6 +62,10 @@ class Phone:
             params (dict, optional): parameters used in HTTP query parameters. Defaults to None.
             raw (bool, optional): If set to 'True' will return raw JSON response as returned from Zoom API.  IF set to 'False', this function will complete pagination and return a list of all data returned on key 'key_in_response_to_return'. Defaults to False.
             key_in_response_to_return (str, optional): Used to determine the key in the Zoom API response with interesting data to use for pagination. Defaults to None.
+            stop_when (callable, optional): predicate called with each record, pagination stops at the first record for which it returns True (that record and all later records are not returned). Defaults to None.
+            record_type (optional): record class from simple_zoomphone.records, e.g. CallLog.  If set, each page is converted to compact records as it is received. Defaults to None (dicts).
+            fields (list, optional): top level record keys to keep.  If set, each page is parsed incrementally as it is received and all other keys are dropped (see jsonstream.parse_page).  Pages without a 'key_in_response_to_return' key are treated as empty. Defaults to None (keep all keys).
+            deadline (Deadline, optional): Deadline, seconds or datetime by which pagination must finish.  Retries and timeouts are limited to the time remaining, once it passes the records received so far are returned. Defaults to None.
 
         Raises:
             ValueError: [description]
@@ -40,30 +79,30 @@ class Phone:
                 "You must specify a key_in_response_to_return if 'raw' = False"
             )
 
-        url = "https://" + self._server + endpoint_url
-
-        # use while loop to handle Zoom Phone API rate limits
-        rate_limit_counter = 0
-        while True:
-            response = self._session.get(url, params=params)
-
-            if response.status_code == 200:
-                break
-
-            elif response.status_code == 429:
-                # API returned that we are rate limited, wait one second and try again
+        deadline = Deadline.coerce(deadline)
+
+        if fields is not None and not raw:
+            # projected records are parsed page by page while streaming
+            pages = self._phone_get_pages(
+                endpoint_url,
+                params,
+                key_in_response_to_return,
+                stop_when=stop_when,
+                record_type=record_type,
+                fields=fields,
+                deadline=deadline,
+            )
+            return [record for page in pages for record in page]
 
-                if rate_limit_counter > 5:
-                    # we shouldn't get rate limited more than 5 times on a single query, but if we do error with exception
-                    raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
-                else:
-                    rate_limit_counter += 1  # increase rate limit counter
-                    time.sleep(1)  # sleep for a second, then try again
+        url = "https://" + self._server + endpoint_url
 
-            else:
-                raise ZoomAPIError(
-                    f"Received status code {response.status_code} on request {url}"
-                )
+        try:
+            response = self._get_response(url, params, deadline=deadline)
+        except Exception:
+            if not raw and _deadline_expired(deadline):
+                # nothing was received before the deadline
+                return []
+            raise
 
         raw_json = response.json()
 
@@ -73,20 +112,43 @@ class Phone:
         else:
             # we will handle paging within the class method.  page through all data and return a list of all responses
             if key_in_response_to_return in raw_json:
-                list_of_paged_data_to_return = raw_json[key_in_response_to_return]
+                list_of_paged_data_to_return, stopped = _truncate_page(
+                    raw_json[key_in_response_to_return], stop_when
+                )
+                if record_type:
+                    list_of_paged_data_to_return = record_type.from_page(
+                        list_of_paged_data_to_return
+                    )
+
+                # complete pagination to retrive all data, unless stop_when ended it early
+                while not stopped and raw_json["next_page_token"] != "":
+                    if _deadline_expired(deadline):
+                        # return the pages received before the deadline
+                        break
 
-                # complete pagination to retrive all data
-                while raw_json["next_page_token"] != "":
                     params["next_page_token"] = raw_json["next_page_token"]
 
-                    raw_json = self._phone_get(
-                        endpoint_url, params, True, key_in_response_to_return
-                    )
+                    try:
+                        raw_json = self._phone_get(
+                            endpoint_url,
+                            params,
+                            True,
+                            key_in_response_to_return,
+                            deadline=deadline,
+                        )
+                    except Exception:
+                        if _deadline_expired(deadline):
+                            break
+                        raise
 
                     if key_in_response_to_return in raw_json:
+                        page, stopped = _truncate_page(
+                            raw_json[key_in_response_to_return], stop_when
+                        )
+                        if record_type:
+                            page = record_type.from_page(page)
                         list_of_paged_data_to_return = (
-                            list_of_paged_data_to_return
-                            + raw_json[key_in_response_to_return]
+                            list_of_paged_data_to_return + page
                         )
 
                 return list_of_paged_data_to_return
@@ -96,6 +158,164 @@ class Phone:
                     f"No {key_in_response_to_return} records in API response."
                 )
 
+    def _phone_get_pages(
+        self,
+        endpoint_url: str,
+        params: dict,
+        key_in_response_to_return: str,
+        stop_when=None,
+        record_type=None,
+        fields: list = None,
+        prefetch: int = 0,
+        deadline=None,
+    ):
+        """Generator that pages through a Zoom Phone API endpoint and yields the records of each page as a list.
+
+        Unlike '_phone_get' with raw=False, pages are yielded as soon as they are received so the caller can process them without holding the entire result set in memory.
+        Pages without a 'key_in_response_to_return' key (e.g. a user without recordings) are skipped.
+
+        Args:
+            endpoint_url (str): endpoint url
+            params (dict): parameters used in HTTP query parameters.
+            key_in_response_to_return (str): key in the Zoom API response containing the records of each page.
+            stop_when (callable, optional): predicate called with each record, pagination stops at the first record for which it returns True. Defaults to None.
+            record_type (optional): record class from simple_zoomphone.records, e.g. CallLog.  If set, pages are yielded as lists of compact records. Defaults to None (dicts).
+            fields (list, optional): top level record keys to keep.  If set, each page is parsed incrementally as it is received and all other keys are dropped. Defaults to None (keep all keys).
+            prefetch (int, optional): number of pages fetched ahead in a background thread while the caller processes the current page. Defaults to 0 (fetch each page when it is requested).
+            deadline (Deadline, optional): Deadline, seconds or datetime by which pagination must finish.  Once it passes no more pages are yielded. Defaults to None.
+
+        Yields:
+            list: records of a single page
+        """
+
+        deadline = Deadline.coerce(deadline)
+
+        if prefetch:
+            yield from prefetch_iterator(
+                self._phone_get_pages(
+                    endpoint_url,
+                    params,
+                    key_in_response_to_return,
+                    stop_when=stop_when,
+                    record_type=record_type,
+                    fields=fields,
+                    deadline=deadline,
+                ),
+                prefetch,
+            )
+            return
+
+        params = dict(params or {})
+
+        while True:
+            if _deadline_expired(deadline):
+                return
+
+            try:
+                if fields is not None:
+                    raw_json = self._phone_get_streaming(
+                        endpoint_url,
+                        params,
+                        key_in_response_to_return,
+                        fields,
+                        deadline=deadline,
+                    )
+                else:
+                    raw_json = self._phone_get(
+                        endpoint_url,
+                        params,
+                        True,
+                        key_in_response_to_return,
+                        deadline=deadline,
+                    )
+            except Exception:
+                if _deadline_expired(deadline):
+                    # stop cleanly, the pages already yielded are complete
+                    return
+                raise
+
+            stopped = False
+            if key_in_response_to_return in raw_json:
+                page, stopped = _truncate_page(
+                    raw_json[key_in_response_to_return], stop_when
+                )
+                if page:
+                    yield record_type.from_page(page) if record_type else page
+
+            if stopped or raw_json.get("next_page_token", "") == "":
+                return
+
+            params["next_page_token"] = raw_json["next_page_token"]
+
+    def _get_response(
+        self, url: str, params: dict = None, stream: bool = False, deadline=None
+    ):
+        # failed requests and rate limits are retried by the transport according to its retry policy
+        response = self._transport.request(
+            "GET", url, params=params, stream=stream, deadline=deadline
+        )
+
+        if response.status_code == 200:
+            return response
+
+        response.close()
+
+        if response.status_code == 429:
+            # we were still rate limited after all retries
+            raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
+        else:
+            raise ZoomAPIError(
+                f"Received status code {response.status_code} on request {url}"
+            )
+
+    def _phone_get_streaming(
+        self,
+        endpoint_url: str,
+        params: dict,
+        key_in_response_to_return: str,
+        fields: list,
+        deadline=None,
+    ) -> dict:
+        """Get one page and parse the response incrementally as it is received, keeping only 'fields' of each record"""
+        url = "https://" + self._server + endpoint_url
+
+        response = self._get_response(url, params, stream=True, deadline=deadline)
+
+        try:
+            return parse_page(
+                response.iter_content(chunk_size=64 * 1024),
+                key_in_response_to_return,
+                fields,
+            )
+        finally:
+            response.close()
+
+    def _date_filter(
+        self,
+        params: dict,
+        from_date: datetime.datetime,
+        to_date: datetime.datetime,
+        stop_when=None,
+    ):
+        """Add 'from' / 'to' query parameters for newest-first endpoints (recordings, voicemails) and return the stop_when predicate to use.
+
+        The server side filter is combined with a client side cutoff, so pagination ends at the first record older than from_date.
+        """
+        if from_date:
+            params["from"] = from_date.strftime("%Y-%m-%d")
+
+            cutoff = _newer_than(from_date)
+            if stop_when:
+                user_stop_when = stop_when
+                stop_when = lambda record: cutoff(record) or user_stop_when(record)
+            else:
+                stop_when = cutoff
+
+        if to_date:
+            params["to"] = to_date.strftime("%Y-%m-%d")
+
+        return stop_when
+
     def _phone_post(self, endpoint_url: str, data: dict):
         """Generic HTTP Post method for Zoom Phone API.
 
@@ -112,35 +332,28 @@ class Phone:
 
         url = "https://" + self._server + endpoint_url
 
-        # use while loop to handle Zoom Phone API rate limits
-        rate_limit_counter = 0
-        while True:
-            response = self._session.post(url, data=json.dumps(data))
-
-            if response.status_code in [200, 201, 204]:
-                # pass requests response to calling method for further request validation
-                if response.content in [b""]:
-                    return response.status_code
-                else:
-                    return response.content
+        # failed requests and rate limits are retried by the transport, a POST is only sent again if the API did not process it
+        response = self._transport.request(
+            "POST", url, ok_statuses=(200, 201, 204), data=json.dumps(data)
+        )
 
-            elif response.status_code == 429:
-                # API returned that we are rate limited, wait one second and try again
+        if response.status_code in [200, 201, 204]:
+            # pass requests response to calling method for further request validation
+            if response.content in [b""]:
+                return response.status_code
+            else:
+                return response.content
 
-                if rate_limit_counter > 5:
-                    # we shouldn't get rate limited more than 5 times on a single query, but if we do error with exception
-                    raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
-                else:
-                    rate_limit_counter += 1  # increase rate limit counter
-                    time.sleep(1)  # sleep for a second, then try again
+        elif response.status_code == 429:
+            raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
 
+        else:
+            if "message" in response.json():
+                raise ZoomAPIError(response.json()["message"])
             else:
-                if "message" in response.json():
-                    raise ZoomAPIError(response.json()["message"])
-                else:
-                    raise ZoomAPIError(
-                        f"Received status code {response.status_code} on request {url}"
-                    )
+                raise ZoomAPIError(
+                    f"Received status code {response.status_code} on request {url}"
+                )
 
     def _phone_patch(self, endpoint_url: str, params: dict = None, data: dict = None):
         """Generic HTTP Patch method for Zoom Phone API.
@@ -159,34 +372,34 @@ class Phone:
 
         url = "https://" + self._server + endpoint_url
 
-        # use while loop to handle Zoom Phone API rate limits
-        rate_limit_counter = 0
-        while True:
-            response = self._session.patch(url, params=params, data=json.dumps(data))
-
-            if response.status_code in [200, 204]:
-                # pass requests response to calling method for further request validation
-                return response
+        # failed requests and rate limits are retried by the transport
+        response = self._transport.request(
+            "PATCH", url, ok_statuses=(200, 204), params=params, data=json.dumps(data)
+        )
 
-            elif response.status_code == 429:
-                # API returned that we are rate limited, wait one second and try again
+        if response.status_code in [200, 204]:
+            # pass requests response to calling method for further request validation
+            return response
 
-                if rate_limit_counter > 5:
-                    # we shouldn't get rate limited more than 5 times on a single query, but if we do error with exception
-                    raise RuntimeError(f"Exceeded rate limit requests on request {url}")
-                else:
-                    rate_limit_counter += 1  # increase rate limit counter
-                    time.sleep(1)  # sleep for a second, then try again
+        elif response.status_code == 429:
+            raise RuntimeError(f"Exceeded rate limit requests on request {url}")
 
+        else:
+            if "message" in response.json():
+                raise ZoomAPIError(response.json()["message"])
             else:
-                if "message" in response.json():
-                    raise ZoomAPIError(response.json()["message"])
-                else:
-                    raise ZoomAPIError(
-                        f"Received status code {response.status_code} on request {url}"
-                    )
+                raise ZoomAPIError(
+                    f"Received status code {response.status_code} on request {url}"
+                )
 
-    def list_users(self, site_id: str = None, page_size: int = 100, raw: bool = False):
+    def list_users(
+        self,
+        site_id: str = None,
+        page_size: int = 100,
+        raw: bool = False,
+        record_type=None,
+        deadline=None,
+    ):
         validateparam(page_size, range(1, 101), "'page_size' must be between 1 - 100")
 
         params = {}
@@ -200,6 +413,8 @@ class Phone:
             raw=raw,
             params=params,
             key_in_response_to_return="users",
+            record_type=record_type,
+            deadline=deadline,
         )
         return response
 
@@ -221,6 +436,12 @@ class Phone:
         type_: str = "all",
         page_size: int = 300,
         raw: bool = False,
+        paged: bool = False,
+        record_type=None,
+        columnar: bool = False,
+        fields: list = None,
+        prefetch: int = 0,
+        deadline=None,
     ):
 
         if (to_date - from_date).days > 30:
@@ -228,16 +449,36 @@ class Phone:
 
         validateparam(page_size, range(1, 301), "'page_size' must be between 1 - 300")
 
+        params = {
+            "from": from_date,
+            "to": to_date,
+            "type": type_,
+            "page_size": page_size,
+        }
+
+        if columnar and not paged:
+            raise ValueError("'columnar' requires 'paged' to be True")
+
+        if paged:
+            # return a generator yielding one list of call logs (or one ColumnBatch) per page
+            return self._phone_get_pages(
+                endpoint_url=f"/phone/users/{userId}/call_logs",
+                params=params,
+                key_in_response_to_return="call_logs",
+                record_type=ColumnBatch if columnar else record_type,
+                fields=fields,
+                prefetch=prefetch,
+                deadline=deadline,
+            )
+
         response = self._phone_get(
             endpoint_url=f"/phone/users/{userId}/call_logs",
-            params={
-                "from": from_date,
-                "to": to_date,
-                "type": type_,
-                "page_size": page_size,
-            },
+            params=params,
             raw=raw,
             key_in_response_to_return="call_logs",
+            record_type=record_type,
+            fields=fields,
+            deadline=deadline,
         )
 
         return response
@@ -247,17 +488,55 @@ class Phone:
         userId: str,
         page_size: int = 300,
         raw: bool = False,
+        paged: bool = False,
+        from_date: datetime.datetime = None,
+        to_date: datetime.datetime = None,
+        stop_when=None,
+        record_type=None,
+        prefetch: int = 0,
+        deadline=None,
     ):
+        """List a user's call recordings, newest first
+
+        Args:
+            userId (str): userId or email address
+            page_size (int, optional): Page size 1 - 300. Defaults to 300.
+            raw (bool, optional): Set to true to receive raw JSON response from API. False to page through all data. Defaults to False.
+            paged (bool, optional): Set to true to return a generator yielding one list of recordings per page. Defaults to False.
+            prefetch (int, optional): with paged=True, number of pages fetched ahead in a background thread while the caller processes the current page. Defaults to 0.
+            from_date (datetime.datetime, optional): only return recordings on or after this date (UTC).  Pagination stops at the first page older than from_date. Defaults to None.
+            to_date (datetime.datetime, optional): only return recordings up to this date (UTC). Defaults to None.
+            stop_when (callable, optional): predicate called with each recording, pagination stops at the first recording for which it returns True. Defaults to None.
+            record_type (optional): record class from simple_zoomphone.records (e.g. Recording) to return compact records instead of dicts. Ignored if raw is True. Defaults to None.
+            deadline (Deadline, optional): Deadline, seconds or datetime by which listing must finish, the records received before it passes are returned. Defaults to None.
+        """
 
         validateparam(page_size, range(1, 301), "'page_size' must be between 1 - 300")
+
+        params = {"page_size": page_size}
+        stop_when = self._date_filter(params, from_date, to_date, stop_when)
+
+        if paged:
+            # return a generator yielding one list of recordings per page
+            return self._phone_get_pages(
+                endpoint_url=f"/phone/users/{userId}/recordings",
+                params=params,
+                key_in_response_to_return="recordings",
+                record_type=record_type,
+                stop_when=stop_when,
+                prefetch=prefetch,
+                deadline=deadline,
+            )
+
         try:
             response = self._phone_get(
                 endpoint_url=f"/phone/users/{userId}/recordings",
-                params={
-                    "page_size": page_size,
-                },
+                params=params,
                 raw=raw,
                 key_in_response_to_return="recordings",
+                record_type=record_type,
+                stop_when=stop_when,
+                deadline=deadline,
             )
         except ZoomAPIError as e:
             if str(e) == "No recordings records in API response.":
@@ -276,7 +555,29 @@ class Phone:
         status: str = "all",
         page_size: int = 300,
         raw: bool = False,
+        paged: bool = False,
+        from_date: datetime.datetime = None,
+        to_date: datetime.datetime = None,
+        stop_when=None,
+        record_type=None,
+        prefetch: int = 0,
+        deadline=None,
     ):
+        """List a user's voicemails, newest first
+
+        Args:
+            userId (str): userId or email address
+            status (str, optional): 'all', 'read' or 'unread'. Defaults to "all".
+            page_size (int, optional): Page size 1 - 300. Defaults to 300.
+            raw (bool, optional): Set to true to receive raw JSON response from API. False to page through all data. Defaults to False.
+            paged (bool, optional): Set to true to return a generator yielding one list of voicemails per page. Defaults to False.
+            prefetch (int, optional): with paged=True, number of pages fetched ahead in a background thread while the caller processes the current page. Defaults to 0.
+            from_date (datetime.datetime, optional): only return voicemails on or after this date (UTC).  Pagination stops at the first page older than from_date. Defaults to None.
+            to_date (datetime.datetime, optional): only return voicemails up to this date (UTC). Defaults to None.
+            stop_when (callable, optional): predicate called with each voicemail, pagination stops at the first voicemail for which it returns True. Defaults to None.
+            record_type (optional): record class from simple_zoomphone.records (e.g. Voicemail) to return compact records instead of dicts. Ignored if raw is True. Defaults to None.
+            deadline (Deadline, optional): Deadline, seconds or datetime by which listing must finish, the records received before it passes are returned. Defaults to None.
+        """
 
         validateparam(page_size, range(1, 301), "'page_size' must be between 1 - 300")
 
@@ -286,11 +587,29 @@ class Phone:
             "'status' must be one of 'all', 'read', 'unread'",
         )
 
+        params = {"page_size": page_size, "status": status}
+        stop_when = self._date_filter(params, from_date, to_date, stop_when)
+
+        if paged:
+            # return a generator yielding one list of voicemails per page
+            return self._phone_get_pages(
+                endpoint_url=f"/phone/users/{userId}/voice_mails",
+                params=params,
+                key_in_response_to_return="voice_mails",
+                record_type=record_type,
+                stop_when=stop_when,
+                prefetch=prefetch,
+                deadline=deadline,
+            )
+
         response = self._phone_get(
             endpoint_url=f"/phone/users/{userId}/voice_mails",
-            params={"page_size": page_size, "status": status},
+            params=params,
             raw=raw,
             key_in_response_to_return="voice_mails",
+            record_type=record_type,
+            stop_when=stop_when,
+            deadline=deadline,
         )
 
         return response
@@ -302,6 +621,12 @@ class Phone:
         type_: str = "all",
         page_size: int = 300,
         raw: bool = False,
+        paged: bool = False,
+        record_type=None,
+        columnar: bool = False,
+        fields: list = None,
+        prefetch: int = 0,
+        deadline=None,
     ):
 
         if (to_date - from_date).days > 30:
@@ -315,16 +640,36 @@ class Phone:
             "Invalid value for 'type' should be either 'all' or 'missed'.",
         )
 
+        params = {
+            "from": from_date,
+            "to": to_date,
+            "type": type_,
+            "page_size": page_size,
+        }
+
+        if columnar and not paged:
+            raise ValueError("'columnar' requires 'paged' to be True")
+
+        if paged:
+            # return a generator yielding one list of call logs (or one ColumnBatch) per page
+            return self._phone_get_pages(
+                endpoint_url=f"/phone/call_logs",
+                params=params,
+                key_in_response_to_return="call_logs",
+                record_type=ColumnBatch if columnar else record_type,
+                fields=fields,
+                prefetch=prefetch,
+                deadline=deadline,
+            )
+
         response = self._phone_get(
             endpoint_url=f"/phone/call_logs",
-            params={
-                "from": from_date,
-                "to": to_date,
-                "type": type_,
-                "page_size": page_size,
-            },
+            params=params,
             raw=raw,
             key_in_response_to_return="call_logs",
+            record_type=record_type,
+            fields=fields,
+            deadline=deadline,
         )
 
         return response
@@ -338,6 +683,9 @@ class Phone:
         site_id: str = None,
         page_size: int = 100,
         raw: bool = False,
+        record_type=None,
+        fields: list = None,
+        deadline=None,
     ):
         """List all phone numbers on Zoom Phone
 
@@ -349,6 +697,9 @@ class Phone:
             site_id (str, optional): Include site ID to filter by this site.  Note this is site ID not site NAME. Defaults to None.
             page_size (int, optional): Page size 1 - 100. Defaults to 100.
             raw (bool, optional): Set to true to receive raw JSON response from API. False to page through all data. Defaults to False.
+            record_type (optional): record class from simple_zoomphone.records (e.g. PhoneNumber) to return compact records instead of dicts. Ignored if raw is True. Defaults to None.
+            fields (list, optional): record keys to keep, e.g. ['id', 'number'].  Pages are then parsed incrementally as they are received and other keys are never kept in memory. Defaults to None (all keys).
+            deadline (Deadline, optional): Deadline, seconds or datetime by which listing must finish, the records received before it passes are returned. Defaults to None.
 
         Returns:
             [type]: [description]
@@ -399,6 +750,9 @@ class Phone:
             raw=raw,
             params=params,
             key_in_response_to_return="phone_numbers",
+            record_type=record_type,
+            fields=fields,
+            deadline=deadline,
         )
         return response
 
@@ -0,0 +1,360 @@
+"""Concurrent call recording and voicemail download pipelines.
+
+Recording metadata is crawled per user by a pool of crawler threads which feed a bounded queue.  A pool of
+download workers drains the queue concurrently, so downloads start as soon as the first user's first page of
+recordings is listed instead of after every user has been listed.
+
+    users -> [crawler threads] -> bounded queue -> [download threads] -> storage backend
+
+API requests (listing and downloads) and download bandwidth are limited by separate token buckets.
+
+VoicemailPipeline runs the same pipeline over voicemails.
+
+Example:
+    pipeline = RecordingPipeline(zoomapi, download_workers=8, requests_per_second=10)
+    stats = pipeline.run([user["email"] for user in zoomapi.phone.list_users()])
+"""
+
+import time
+import queue
+import threading
+
+from .util import validateparam
+from .deadline import Deadline
+from .exceptions import QuotaExhausted
+from .media import MediaDownloader
+from .ratelimit import TokenBucket
+from .storage import DirectoryStorage, unique_recording_path
+
+
+class PipelineStats:
+    def __init__(self):
+        """Thread safe counters describing the progress of a RecordingPipeline run"""
+        self._lock = threading.Lock()
+        self.started = time.monotonic()
+
+        self.users_listed = 0
+        self.recordings_listed = 0
+        self.recordings_downloaded = 0
+        self.recordings_skipped = 0
+        self.bytes_downloaded = 0
+        self.recordings_abandoned = 0
+        self.deadline_expired = False
+        self.errors = []
+
+    def increment(self, **counters):
+        with self._lock:
+            for name, value in counters.items():
+                setattr(self, name, getattr(self, name) + value)
+
+    def add_error(self, item, error: Exception):
+        with self._lock:
+            self.errors.append((item, error))
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                "elapsed_seconds": elapsed,
+                "users_listed": self.users_listed,
+                "recordings_listed": self.recordings_listed,
+                "recordings_downloaded": self.recordings_downloaded,
+                "recordings_skipped": self.recordings_skipped,
+                "bytes_downloaded": self.bytes_downloaded,
+                "recordings_abandoned": self.recordings_abandoned,
+                "deadline_expired": self.deadline_expired,
+                "errors": len(self.errors),
+                "recordings_per_second": (
+                    self.recordings_downloaded / elapsed if elapsed else 0
+                ),
+                "bytes_per_second": self.bytes_downloaded / elapsed if elapsed else 0,
+            }
+
+
+class RecordingPipeline:
+    def __init__(
+        self,
+        zoomapi,
+        directory: str = "recordings",
+        crawler_workers: int = 4,
+        download_workers: int = 8,
+        queue_size: int = 1000,
+        requests_per_second: float = 10,
+        bandwidth_bytes_per_second: float = None,
+        chunk_size: int = 1024 * 1024,
+        path_for_recording=None,
+        storage=None,
+        manifest=None,
+        on_recordings=None,
+        progress_callback=None,
+        progress_interval: float = 10,
+        from_date=None,
+    ):
+        """Producer / consumer pipeline that lists and downloads call recordings concurrently
+
+        Args:
+            zoomapi (ZoomAPIClient): API client
+            directory (str, optional): top level directory to save recordings. Defaults to "recordings".
+            crawler_workers (int, optional): threads listing recording metadata. Defaults to 4.
+            download_workers (int, optional): threads downloading recordings. Defaults to 8.
+            queue_size (int, optional): maximum recordings waiting to be downloaded, crawlers block when the queue is full. Defaults to 1000.
+            requests_per_second (float, optional): API requests per second shared by crawlers and downloads. Defaults to 10.
+            bandwidth_bytes_per_second (float, optional): download bandwidth limit. Defaults to None (unlimited).
+            chunk_size (int, optional): bytes read from the network per write. Defaults to 1MB.
+            path_for_recording (callable, optional): function(directory, user, recording) returning the path to store a recording. Defaults to unique_recording_path.
+            storage (optional): storage backend from simple_zoomphone.storage, e.g. ShardedStorage("recordings"). Defaults to DirectoryStorage(directory, path_for_recording).
+            manifest (RecordingManifest, optional): manifest used to skip recordings that were already downloaded and to record the size and checksum of new downloads. Defaults to None (skip files that exist on disk).
+            on_recordings (callable, optional): function(user, recordings) called with each page of recording metadata, e.g. to write metadata to Parquet. Calls are serialized. Defaults to None.
+            progress_callback (callable, optional): function(stats dict) called every 'progress_interval' seconds and once at the end. Defaults to None.
+            progress_interval (float, optional): seconds between progress callbacks. Defaults to 10.
+            from_date (datetime.datetime, optional): only list recordings on or after this date, listing of each user stops at the first older recording. Defaults to None (all recordings).
+        """
+        self._zoomapi = zoomapi
+        self._crawler_workers = crawler_workers
+        self._download_workers = download_workers
+        self._queue_size = queue_size
+        self._manifest = manifest
+        self._from_date = from_date
+
+        if storage is None:
+            # download workers run concurrently, so two recordings must never share a path: the recording id is part of the name
+            storage = DirectoryStorage(
+                directory, path_for_recording or unique_recording_path
+            )
+        self._storage = storage
+        self._on_recordings = on_recordings
+        self._on_recordings_lock = threading.Lock()
+        self._progress_callback = progress_callback
+        self._progress_interval = progress_interval
+
+        self._request_limiter = TokenBucket(requests_per_second)
+
+        self._downloader = MediaDownloader(
+            zoomapi._session,
+            chunk_size=chunk_size,
+            transport=getattr(zoomapi, "_transport", None),
+            bandwidth_limiter=(
+                TokenBucket(bandwidth_bytes_per_second)
+                if bandwidth_bytes_per_second
+                else None
+            ),
+        )
+
+    def _list_pages(self, user: str, deadline: Deadline = None):
+        # generator of pages of media metadata for one user
+        return self._zoomapi.phone.get_user_call_recordings(
+            userId=user, paged=True, from_date=self._from_date, deadline=deadline
+        )
+
+    def _expired(self, deadline: Deadline, stats: PipelineStats) -> bool:
+        if deadline is None or not deadline.expired:
+            return False
+        stats.deadline_expired = True
+        return True
+
+    def _crawl(
+        self,
+        users: queue.Queue,
+        recordings: queue.Queue,
+        stats: PipelineStats,
+        deadline: Deadline = None,
+    ):
+        while True:
+            if self._expired(deadline, stats):
+                # no new users are listed once the deadline has passed
+                return
+
+            try:
+                user = users.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                pages = self._list_pages(user, deadline)
+
+                while True:
+                    self._request_limiter.acquire()
+                    page = next(pages, None)
+                    if page is None:
+                        break
+
+                    stats.increment(recordings_listed=len(page))
+
+                    if self._on_recordings:
+                        with self._on_recordings_lock:
+                            self._on_recordings(user, page)
+
+                    for recording in page:
+                        # blocks while the queue is full, this keeps memory bounded
+                        recordings.put((user, recording))
+
+                if not self._expired(deadline, stats):
+                    # a user is only complete if listing was not cut short by the deadline
+                    stats.increment(users_listed=1)
+
+            except QuotaExhausted as e:
+                # every further listing request would fail too, recordings already queued are still downloaded
+                stats.add_error(user, e)
+                return
+
+            except Exception as e:
+                stats.add_error(user, e)
+
+    def _download(
+        self, recordings: queue.Queue, stats: PipelineStats, deadline: Deadline = None
+    ):
+        while True:
+            item = recordings.get()
+            if item is None:
+                # all crawlers are finished
+                return
+
+            user, recording = item
+
+            if self._expired(deadline, stats):
+                # keep draining the queue so crawlers blocked on a full queue can finish
+                stats.increment(recordings_abandoned=1)
+                continue
+
+            try:
+                if self._manifest is not None:
+                    # skip decision is a set lookup, no file system access
+                    skip = self._manifest.contains(recording["id"])
+                else:
+                    skip = self._storage.exists(user, recording)
+
+                if skip:
+                    stats.increment(recordings_skipped=1)
+                    continue
+
+                self._request_limiter.acquire()
+
+                bytes_received, location, size, sha256 = self._storage.store(
+                    self._downloader, user, recording
+                )
+
+                if self._manifest is not None:
+                    self._manifest.add(recording["id"], location, size, sha256)
+
+                stats.increment(
+                    recordings_downloaded=1, bytes_downloaded=bytes_received
+                )
+
+            except Exception as e:
+                stats.add_error(recording.get("id"), e)
+
+    def _wait(self, threads: list, stats: PipelineStats):
+        # wait for all threads to finish, reporting progress every progress_interval seconds
+        next_report = time.monotonic() + self._progress_interval
+
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=max(0, next_report - time.monotonic()))
+
+                if time.monotonic() >= next_report:
+                    if self._progress_callback:
+                        self._progress_callback(stats.as_dict())
+                    next_report += self._progress_interval
+
+    def run(self, users: list, deadline=None) -> PipelineStats:
+        """List and download the recordings of all users
+
+        Once the deadline passes no further users, pages or downloads are started, downloads in progress are completed
+        and the run returns with stats.deadline_expired set.  Recordings not downloaded are picked up by the next run
+        (they are not in the manifest or storage).
+
+        Args:
+            users (list): userIds or email addresses
+            deadline (Deadline, optional): Deadline, seconds or datetime by which the run must finish. Defaults to None (no limit).
+
+        Returns:
+            PipelineStats: counters and errors of this run
+        """
+        stats = PipelineStats()
+        deadline = Deadline.coerce(deadline)
+
+        user_queue = queue.Queue()
+        for user in users:
+            user_queue.put(user)
+
+        recordings = queue.Queue(maxsize=self._queue_size)
+
+        crawlers = [
+            threading.Thread(
+                target=self._crawl,
+                args=(user_queue, recordings, stats, deadline),
+                daemon=True,
+            )
+            for _ in range(self._crawler_workers)
+        ]
+        downloaders = [
+            threading.Thread(
+                target=self._download,
+                args=(recordings, stats, deadline),
+                daemon=True,
+            )
+            for _ in range(self._download_workers)
+        ]
+
+        for thread in crawlers + downloaders:
+            thread.start()
+
+        self._wait(crawlers, stats)
+
+        # tell the download workers that no more recordings are coming
+        for _ in downloaders:
+            recordings.put(None)
+
+        self._wait(downloaders, stats)
+
+        if self._progress_callback:
+            self._progress_callback(stats.as_dict())
+
+        return stats
+
+
+class VoicemailPipeline(RecordingPipeline):
+    def __init__(
+        self,
+        zoomapi,
+        directory: str = "voicemails",
+        status: str = "all",
+        to_date=None,
+        **kwargs,
+    ):
+        """Producer / consumer pipeline that lists and downloads voicemails concurrently
+
+        Voicemails have the same metadata used to name recordings (date_time, caller_number, callee_number,
+        download_url), so the storage backends, manifest and path functions of RecordingPipeline are used unchanged.
+        PipelineStats counters named 'recordings_*' count voicemails.
+
+        Example:
+            pipeline = VoicemailPipeline(zoomapi, status="unread", from_date=datetime.datetime(2021, 1, 1))
+            stats = pipeline.run([user["email"] for user in zoomapi.phone.list_users()])
+
+        Args:
+            zoomapi (ZoomAPIClient): API client
+            directory (str, optional): top level directory to save voicemails. Defaults to "voicemails".
+            status (str, optional): 'all', 'read' or 'unread'. Defaults to "all".
+            to_date (datetime.datetime, optional): only list voicemails up to this date. Defaults to None.
+            **kwargs: any other RecordingPipeline argument, e.g. download_workers, storage, manifest or from_date.
+        """
+        validateparam(
+            status,
+            ["all", "read", "unread"],
+            "'status' must be one of 'all', 'read', 'unread'",
+        )
+
+        super().__init__(zoomapi, directory=directory, **kwargs)
+        self._status = status
+        self._to_date = to_date
+
+    def _list_pages(self, user: str, deadline: Deadline = None):
+        return self._zoomapi.phone.get_user_voicemails(
+            userId=user,
+            status=self._status,
+            paged=True,
+            from_date=self._from_date,
+            to_date=self._to_date,
+            deadline=deadline,
+        )
@@ -0,0 +1,246 @@
+"""Run the same operation across many Zoom accounts concurrently.
+
+Each account gets its own ZoomAPIClient, so its own authentication token, HTTP connection pool, retry state,
+adaptive concurrency limits and (optionally) request budget.  Work is dispatched from one shared pool of threads in
+round robin order across accounts, with a cap on the tasks of a single account in flight, so one large account does
+not starve the others.
+
+Example:
+    pool = ZoomClientPool(
+        {
+            "acme": {"API_KEY": "...", "API_SECRET": "..."},
+            "globex": {"API_KEY": "...", "API_SECRET": "..."},
+        },
+        max_workers=16,
+        per_account_workers=4,
+    )
+
+    # one task per account
+    numbers = pool.run(lambda zoomapi: zoomapi.phone.list_phone_numbers())
+    for number in numbers.records():
+        print(number["account"], number["number"])
+
+    # one task per user of every account
+    call_logs = pool.run_each(
+        lambda zoomapi: zoomapi.phone.list_users(),
+        lambda zoomapi, user: zoomapi.phone.get_user_call_logs(user["id"], from_date, to_date),
+    )
+"""
+
+import threading
+import collections
+import concurrent.futures
+
+import requests
+
+from .base import ZoomAPIClient
+from .ratelimit import TokenBucket
+
+# first task of every account in run_each, lists the account's work items
+_LIST_ITEMS = object()
+
+
+class PoolRun:
+    def __init__(self):
+        """Results of a ZoomClientPool run
+
+        Attributes:
+            results (dict): account -> result of run(), or the concatenated results of every task of run_each()
+            errors (list): (account, item, exception) of every failed task, item is None for run() and for listing the items of run_each()
+        """
+        self.results = {}
+        self.errors = []
+
+    def records(self, tag: str = "account"):
+        """Generator of the records of every account, each a copy tagged with its account name under 'tag'
+
+        Results that are lists of dicts (or of records with to_dict(), see simple_zoomphone.records) are merged, e.g.
+        call logs or phone numbers.  Other results, and other items of a list such as ids, are yielded as
+        {tag: account, "result": result}.
+        """
+        for account, result in self.results.items():
+            if isinstance(result, list):
+                for record in result:
+                    if isinstance(record, dict):
+                        yield {tag: account, **record}
+                    elif hasattr(record, "to_dict"):
+                        yield {tag: account, **record.to_dict()}
+                    else:
+                        yield {tag: account, "result": record}
+            else:
+                yield {tag: account, "result": result}
+
+
+class ZoomClientPool:
+    def __init__(
+        self,
+        accounts: dict,
+        max_workers: int = 8,
+        per_account_workers: int = 2,
+        requests_per_second: float = None,
+        **client_options,
+    ):
+        """Pool of API clients for many Zoom accounts
+
+        Args:
+            accounts (dict): account name -> ZoomAPIClient keyword arguments (e.g. {"API_KEY": ..., "API_SECRET": ...}) or an existing ZoomAPIClient
+            max_workers (int, optional): tasks run concurrently across all accounts. Defaults to 8.
+            per_account_workers (int, optional): tasks of a single account run concurrently. Defaults to 2.
+            requests_per_second (float, optional): request budget of each account, a separate TokenBucket per account. Defaults to None (no budget).
+            **client_options: further ZoomAPIClient options used for every account, e.g. retry_policy or quota_ledger
+        """
+        if max_workers < 1 or per_account_workers < 1:
+            raise ValueError(
+                "'max_workers' and 'per_account_workers' must be at least 1"
+            )
+
+        self.max_workers = max_workers
+        self.per_account_workers = per_account_workers
+        self._requests_per_second = requests_per_second
+        self._client_options = client_options
+
+        self._accounts = dict(accounts)
+        self._clients = {}
+        self._clients_lock = threading.Lock()
+
+    @property
+    def accounts(self) -> list:
+        return list(self._accounts)
+
+    def client(self, account: str) -> ZoomAPIClient:
+        """Return the client of an account, created on first use"""
+        with self._clients_lock:
+            client = self._clients.get(account)
+            if client is None:
+                client = self._clients[account] = self._create_client(account)
+            return client
+
+    def _create_client(self, account: str) -> ZoomAPIClient:
+        credentials = self._accounts[account]
+        if isinstance(credentials, ZoomAPIClient):
+            client = credentials
+        else:
+            options = dict(self._client_options)
+            if self._requests_per_second and "rate_limiter" not in options:
+                options["rate_limiter"] = TokenBucket(self._requests_per_second)
+            options.update(credentials)
+            client = ZoomAPIClient(**options)
+
+            # keep a connection open for every concurrent task of this account
+            adapter = requests.adapters.HTTPAdapter(
+                pool_connections=2, pool_maxsize=max(10, self.per_account_workers * 2)
+            )
+            client._session.mount("https://", adapter)
+
+        return client
+
+    def run(self, operation, accounts: list = None) -> PoolRun:
+        """Call operation(client) once for every account concurrently
+
+        Args:
+            operation (callable): function(ZoomAPIClient) returning the result of one account
+            accounts (list, optional): account names to run. Defaults to None (all accounts).
+
+        Returns:
+            PoolRun: results by account and errors
+        """
+        return self._dispatch(
+            {account: [None] for account in accounts or self.accounts},
+            lambda client, item: operation(client),
+            merge=False,
+        )
+
+    def run_each(self, list_items, operation, accounts: list = None) -> PoolRun:
+        """List work items per account, then call operation(client, item) for every item
+
+        Tasks of all accounts are interleaved round robin, each account has at most 'per_account_workers' tasks in
+        flight, so every account progresses at a similar rate whatever its size.
+
+        Args:
+            list_items (callable): function(ZoomAPIClient) returning the items of one account, e.g. its users
+            operation (callable): function(ZoomAPIClient, item) returning a list of records (concatenated per account) or a single result
+            accounts (list, optional): account names to run. Defaults to None (all accounts).
+
+        Returns:
+            PoolRun: results by account and errors
+        """
+        return self._dispatch(
+            {account: [_LIST_ITEMS] for account in accounts or self.accounts},
+            operation,
+            merge=True,
+            list_items=list_items,
+        )
+
+    def _dispatch(
+        self, queues: dict, operation, merge: bool, list_items=None
+    ) -> PoolRun:
+        run = PoolRun()
+        queues = {
+            account: collections.deque(items) for account, items in queues.items()
+        }
+        rotation = collections.deque(queues)
+        in_flight = collections.Counter()
+        futures = {}
+
+        if merge:
+            for account in queues:
+                run.results[account] = []
+
+        def task(account, item):
+            client = self.client(account)
+            if item is _LIST_ITEMS:
+                return list(list_items(client))
+            return operation(client, item)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_workers, thread_name_prefix="zoom-pool"
+        ) as executor:
+            while True:
+                # one task per account per pass, skipping accounts at their cap or without queued items
+                progressed = True
+                while progressed and len(futures) < self.max_workers:
+                    progressed = False
+                    for _ in range(len(rotation)):
+                        account = rotation[0]
+                        rotation.rotate(-1)
+                        if (
+                            queues[account]
+                            and in_flight[account] < self.per_account_workers
+                            and len(futures) < self.max_workers
+                        ):
+                            item = queues[account].popleft()
+                            futures[executor.submit(task, account, item)] = (
+                                account,
+                                item,
+                            )
+                            in_flight[account] += 1
+                            progressed = True
+
+                if not futures:
+                    return run
+
+                done, _ = concurrent.futures.wait(
+                    futures, return_when=concurrent.futures.FIRST_COMPLETED
+                )
+
+                for future in done:
+                    account, item = futures.pop(future)
+                    in_flight[account] -= 1
+
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        run.errors.append(
+                            (account, None if item is _LIST_ITEMS else item, e)
+                        )
+                        continue
+
+                    if item is _LIST_ITEMS:
+                        # the account's items are listed, queue a task for each
+                        queues[account].extend(result)
+                    elif not merge:
+                        run.results[account] = result
+                    elif isinstance(result, list):
+                        run.results[account].extend(result)
+                    else:
+                        run.results[account].append(result)
@@ -0,0 +1,194 @@
+import os
+import math
+import sqlite3
+import datetime
+import threading
+
+from .exceptions import QuotaExhausted
+
+# requests per UTC day of each rate limit category.  Zoom caps heavy requests per day (30,000 on Pro accounts,
+# 60,000 on Business and higher plans), adjust to the plan of your account.  Categories not listed are unlimited.
+DAILY_LIMITS = {"heavy": 30000}
+
+
+def _utc_today() -> str:
+    return datetime.datetime.now(datetime.timezone.utc).strftime("%Y-%m-%d")
+
+
+def next_reset() -> datetime.datetime:
+    """Return the next UTC midnight, when Zoom daily limits reset"""
+    today = datetime.datetime.now(datetime.timezone.utc).replace(
+        hour=0, minute=0, second=0, microsecond=0
+    )
+    return today + datetime.timedelta(days=1)
+
+
+class QuotaLedger:
+    def __init__(
+        self,
+        path: str = "zoom-quota.sqlite",
+        daily_limits: dict = None,
+        safety_margin: int = 100,
+    ):
+        """SQLite ledger of requests sent per rate limit category per UTC day
+
+        Every request is counted before it is sent, in the same transaction that checks the remaining quota, so
+        processes sharing the ledger file never overrun the daily limit between them.  When the quota of a category is
+        used up, or Zoom answers with a daily rate limit, requests in that category fail immediately with
+        QuotaExhausted until the next UTC midnight instead of being sent.
+
+        Example:
+            ledger = QuotaLedger("zoom-quota.sqlite", daily_limits={"heavy": 60000})
+            zoomapi = ZoomAPIClient(API_KEY, API_SECRET, quota_ledger=ledger)
+            forecast = ledger.forecast("heavy", planned_requests=len(users))
+            if not forecast["fits"]:
+                users = users[: forecast["remaining"]]
+
+        Args:
+            path (str, optional): path to SQLite database file, created if it does not exist. Defaults to "zoom-quota.sqlite".
+            daily_limits (dict, optional): category -> requests per UTC day. Defaults to DAILY_LIMITS.
+            safety_margin (int, optional): requests per category per day left unused, e.g. for requests of other applications using the account. Defaults to 100.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.daily_limits = dict(DAILY_LIMITS if daily_limits is None else daily_limits)
+        self.safety_margin = safety_margin
+
+        self._lock = threading.Lock()
+
+        # autocommit mode, transactions are started explicitly with BEGIN IMMEDIATE
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS usage ("
+            "day TEXT NOT NULL, category TEXT NOT NULL, requests INTEGER NOT NULL DEFAULT 0, "
+            "exhausted INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (day, category))"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def limit(self, category: str) -> int:
+        """Usable requests per day of a category after the safety margin, None if the category is unlimited"""
+        limit = self.daily_limits.get(category)
+        if limit is None:
+            return None
+        return max(0, limit - self.safety_margin)
+
+    def _usage(self, category: str, day: str) -> tuple:
+        row = self._connection.execute(
+            "SELECT requests, exhausted FROM usage WHERE day = ? AND category = ?",
+            (day, category),
+        ).fetchone()
+        return row if row is not None else (0, 0)
+
+    def used(self, category: str, day: str = None) -> int:
+        """Requests counted for a category on a UTC day ('yyyy-mm-dd', defaults to today)"""
+        with self._lock:
+            return self._usage(category, day or _utc_today())[0]
+
+    def remaining(self, category: str) -> int:
+        """Requests left today in a category, None if the category is unlimited"""
+        with self._lock:
+            requests, exhausted = self._usage(category, _utc_today())
+
+        if exhausted:
+            return 0
+        limit = self.limit(category)
+        if limit is None:
+            return None
+        return max(0, limit - requests)
+
+    def take(self, category: str, count: int = 1):
+        """Count requests about to be sent
+
+        Raises:
+            QuotaExhausted: If the requests do not fit in today's quota of the category, nothing is counted
+        """
+        limit = self.limit(category)
+        day = _utc_today()
+
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                requests, exhausted = self._usage(category, day)
+
+                if exhausted or (limit is not None and requests + count > limit):
+                    raise QuotaExhausted(
+                        f"Daily quota of '{category}' requests is used up ({requests} sent today), it resets at {next_reset():%Y-%m-%d %H:%M} UTC",
+                        category=category,
+                        resets_at=next_reset(),
+                    )
+
+                self._connection.execute(
+                    "INSERT INTO usage (day, category, requests) VALUES (?, ?, ?) "
+                    "ON CONFLICT (day, category) DO UPDATE SET requests = requests + excluded.requests",
+                    (day, category, count),
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def mark_exhausted(self, category: str):
+        """Record that Zoom refused requests of a category for the rest of the UTC day (a daily rate limit response)"""
+        with self._lock:
+            self._connection.execute(
+                "INSERT INTO usage (day, category, exhausted) VALUES (?, ?, 1) "
+                "ON CONFLICT (day, category) DO UPDATE SET exhausted = 1",
+                (_utc_today(), category),
+            )
+
+    def forecast(self, category: str, planned_requests: int) -> dict:
+        """Forecast whether a planned crawl fits in the quota
+
+        Args:
+            category (str): rate limit category of the crawl's requests, e.g. 'heavy'
+            planned_requests (int): estimated requests, e.g. users * pages per user
+
+        Returns:
+            dict: 'fits' (bool), 'remaining' requests today (None if unlimited), 'days_needed' including today and 'resets_at' (datetime of the next reset)
+        """
+        remaining = self.remaining(category)
+        limit = self.limit(category)
+
+        if remaining is None:
+            days_needed = 1
+        elif planned_requests <= remaining:
+            days_needed = 1
+        elif not limit:
+            days_needed = None
+        else:
+            days_needed = 1 + math.ceil((planned_requests - remaining) / limit)
+
+        return {
+            "fits": remaining is None or planned_requests <= remaining,
+            "remaining": remaining,
+            "days_needed": days_needed,
+            "resets_at": next_reset(),
+        }
+
+    def history(self, days: int = 7) -> list:
+        """Return (day, category, requests, exhausted) rows of the last 'days' UTC days, newest first"""
+        first_day = (
+            datetime.datetime.now(datetime.timezone.utc)
+            - datetime.timedelta(days=days - 1)
+        ).strftime("%Y-%m-%d")
+
+        with self._lock:
+            return self._connection.execute(
+                "SELECT day, category, requests, exhausted FROM usage WHERE day >= ? ORDER BY day DESC, category",
+                (first_day,),
+            ).fetchall()
@@ -0,0 +1,468 @@
+import os
+import json
+import time
+import sqlite3
+import collections
+import threading
+import http.server
+
+import requests
+
+from .util import validateparam
+from .exceptions import DeadlineExceeded
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float = None):
+        """Thread safe token bucket rate limiter
+
+        Tokens are added at 'rate' per second up to 'capacity'.  acquire() blocks until enough tokens are available.
+
+        Example:
+            requests_per_second = TokenBucket(10)            # 10 requests per second
+            bytes_per_second = TokenBucket(5 * 1024 * 1024)  # 5MB/s of bandwidth
+            bytes_per_second.acquire(len(chunk))
+
+        Args:
+            rate (float): tokens added per second
+            capacity (float, optional): maximum tokens held, i.e. the allowed burst. Defaults to 'rate' (one second of burst).
+        """
+        if rate <= 0:
+            raise ValueError("'rate' must be greater than 0")
+
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+
+    def try_acquire(self, tokens: float = 1, reserve: float = 0) -> float:
+        """Take tokens if available without blocking
+
+        Args:
+            tokens (float, optional): tokens to take. Defaults to 1.
+            reserve (float, optional): tokens that must be left in the bucket afterwards, kept for higher priority requests. Defaults to 0.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds to wait before they will be available
+        """
+        with self._lock:
+            self._refill()
+
+            # requests larger than the bucket (e.g. a big chunk of bytes) are allowed once the bucket is full
+            tokens = min(tokens, self.capacity)
+            needed = min(tokens + reserve, self.capacity)
+
+            if self._tokens >= needed:
+                self._tokens -= tokens
+                return 0
+
+            return (needed - self._tokens) / self.rate
+
+    def acquire(self, tokens: float = 1):
+        """Block until 'tokens' are available and take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Take all tokens so that none are available for 'seconds', e.g. after a 429 with a Retry-After header"""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+
+class SQLiteBucketStore:
+    def __init__(self, path: str):
+        """Token bucket state in a SQLite file, shared by every process on the host that opens the same file
+
+        Each take runs in an immediate transaction, so the SQLite file lock serializes processes.  Bucket times are
+        wall clock (time.time()), the only clock processes share.
+
+        Args:
+            path (str): path to SQLite database file, created if it does not exist.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+
+        # autocommit mode, transactions are started explicitly with BEGIN IMMEDIATE
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+        )
+
+    def take(
+        self,
+        name: str,
+        tokens: float,
+        rate: float,
+        capacity: float,
+        pause: float = 0,
+        reserve: float = 0,
+    ) -> float:
+        """Take tokens from a bucket if available
+
+        Args:
+            name (str): bucket name
+            tokens (float): tokens to take
+            rate (float): tokens added per second
+            capacity (float): maximum tokens held
+            pause (float, optional): instead of taking tokens, empty the bucket for this many seconds. Defaults to 0.
+            reserve (float, optional): tokens that must be left in the bucket afterwards, kept for higher priority requests. Defaults to 0.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds to wait before they will be available
+        """
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT tokens, updated FROM buckets WHERE name = ?", (name,)
+                ).fetchone()
+
+                now = time.time()
+                if row is None:
+                    available = capacity
+                else:
+                    # a clock stepping backwards adds no tokens
+                    available = min(capacity, row[0] + max(0.0, now - row[1]) * rate)
+
+                tokens = min(tokens, capacity)
+                needed = min(tokens + reserve, capacity)
+
+                wait = 0
+                if pause:
+                    available = min(available, -pause * rate)
+                elif available >= needed:
+                    available -= tokens
+                else:
+                    wait = (needed - available) / rate
+
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                    (name, available, now),
+                )
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+
+        return wait
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class HTTPBucketStore:
+    def __init__(self, url: str, timeout: float = 5):
+        """Token bucket state held by a BucketServer, for processes on several hosts sharing one Zoom account
+
+        Args:
+            url (str): url of the BucketServer, e.g. 'http://ratelimit.internal:8750'
+            timeout (float, optional): request timeout in seconds. Defaults to 5.
+        """
+        self._url = url.rstrip("/") + "/take"
+        self._timeout = timeout
+        self._session = requests.Session()
+
+    def take(
+        self,
+        name: str,
+        tokens: float,
+        rate: float,
+        capacity: float,
+        pause: float = 0,
+        reserve: float = 0,
+    ) -> float:
+        """Take tokens from a bucket on the server, see SQLiteBucketStore.take"""
+        response = self._session.post(
+            self._url,
+            json={
+                "name": name,
+                "tokens": tokens,
+                "rate": rate,
+                "capacity": capacity,
+                "pause": pause,
+                "reserve": reserve,
+            },
+            timeout=self._timeout,
+        )
+        response.raise_for_status()
+        return response.json()["wait"]
+
+    def close(self):
+        self._session.close()
+
+
+class BucketServer(http.server.ThreadingHTTPServer):
+    def __init__(self, store, host: str = "127.0.0.1", port: int = 8750):
+        """Serve a bucket store over HTTP for HTTPBucketStore clients
+
+        Example:
+            server = BucketServer(SQLiteBucketStore("ratelimit.sqlite"), host="0.0.0.0")
+            server.serve_forever()
+
+        Args:
+            store: bucket store holding the state, e.g. SQLiteBucketStore
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): port to listen on, 0 for any free port. Defaults to 8750.
+        """
+        self.store = store
+        super().__init__((host, port), _BucketRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+
+class _BucketRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/take":
+            self.send_error(404)
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            wait = self.server.store.take(
+                str(request["name"]),
+                float(request["tokens"]),
+                float(request["rate"]),
+                float(request["capacity"]),
+                float(request.get("pause", 0)),
+                float(request.get("reserve", 0)),
+            )
+        except (KeyError, TypeError, ValueError):
+            self.send_error(400)
+            return
+
+        body = json.dumps({"wait": wait}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def open_bucket_store(location: str):
+    """Return an HTTPBucketStore for an http(s) url, otherwise a SQLiteBucketStore for a file path"""
+    if location.startswith(("http://", "https://")):
+        return HTTPBucketStore(location)
+    return SQLiteBucketStore(location)
+
+
+class SharedTokenBucket:
+    def __init__(self, store, rate: float, capacity: float = None, name: str = "zoom"):
+        """Token bucket rate limiter shared by processes, with the same interface as TokenBucket
+
+        Separate scripts running against the same Zoom account (call log export, recording export, provisioning) each
+        get a share of one request budget instead of each assuming it owns the full account rate limit.  Set 'rate'
+        a little below the account limit.
+
+        Example:
+            limiter = SharedTokenBucket(SQLiteBucketStore("/var/tmp/zoom-ratelimit.sqlite"), rate=9)
+            zoomapi = ZoomAPIClient(API_KEY, API_SECRET, rate_limiter=limiter)
+
+        Args:
+            store: SQLiteBucketStore for processes on one host, or HTTPBucketStore for a BucketServer
+            rate (float): requests per second shared by all processes
+            capacity (float, optional): maximum burst. Defaults to 'rate' (one second of burst).
+            name (str, optional): bucket name, processes sharing a budget use the same name. Defaults to "zoom".
+        """
+        if rate <= 0:
+            raise ValueError("'rate' must be greater than 0")
+
+        self.store = store
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.name = name
+
+    def try_acquire(self, tokens: float = 1, reserve: float = 0) -> float:
+        """Take tokens if available without blocking
+
+        Args:
+            tokens (float, optional): tokens to take. Defaults to 1.
+            reserve (float, optional): tokens that must be left in the bucket afterwards, kept for higher priority requests of any process. Defaults to 0.
+
+        Returns:
+            float: 0 if the tokens were taken, otherwise the number of seconds to wait before they will be available
+        """
+        return self.store.take(
+            self.name, tokens, self.rate, self.capacity, reserve=reserve
+        )
+
+    def acquire(self, tokens: float = 1):
+        """Block until 'tokens' are available and take them"""
+        while True:
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds: float):
+        """Stop all processes sharing the bucket for 'seconds', e.g. after a 429 with a Retry-After header"""
+        self.store.take(self.name, 0, self.rate, self.capacity, pause=seconds)
+
+
+# relative share of the rate budget of each priority while requests of several priorities are waiting
+PRIORITY_WEIGHTS = {"interactive": 100, "normal": 10, "bulk": 1}
+
+# tokens lower priorities leave in the budget, so a higher priority request from any process sharing it finds a token
+PRIORITY_RESERVES = {"interactive": 0, "normal": 0, "bulk": 1}
+
+
+class PriorityScheduler:
+    def __init__(self, rate_limiter, weights: dict = None, reserves: dict = None):
+        """Hands out the tokens of a rate budget to waiting requests by priority, with weighted fairness
+
+        Requests wait in one FIFO queue per priority.  Whenever a token is available it goes to the head of the
+        queue with the lowest virtual finish time (stride scheduling): each priority advances by 1 / weight per token,
+        so with the default weights an interactive request is served before any waiting normal or bulk request, while
+        bulk requests still progress when normal requests keep the budget busy.  A newly arriving request waits at
+        most for the token the current head is already receiving.
+
+        Bulk requests also leave 'reserves' tokens in the bucket, which gives interactive requests of other processes
+        sharing a SharedTokenBucket a token within one slot even during a full export.
+
+        Example:
+            scheduler = PriorityScheduler(SharedTokenBucket(SQLiteBucketStore(path), rate=9))
+            scheduler.acquire("interactive")
+
+        Args:
+            rate_limiter: TokenBucket or SharedTokenBucket holding the rate budget
+            weights (dict, optional): priority -> relative share of the budget. Defaults to PRIORITY_WEIGHTS.
+            reserves (dict, optional): priority -> tokens left in the bucket for higher priorities. Defaults to PRIORITY_RESERVES.
+        """
+        self.rate_limiter = rate_limiter
+        self.weights = dict(PRIORITY_WEIGHTS if weights is None else weights)
+        self.reserves = dict(PRIORITY_RESERVES if reserves is None else reserves)
+
+        self._condition = threading.Condition()
+        self._queues = {priority: collections.deque() for priority in self.weights}
+        self._finish = {priority: 0.0 for priority in self.weights}
+        self._virtual_time = 0.0
+
+    def _next(self):
+        # the waiting request that receives the next token
+        waiting = [priority for priority, queue in self._queues.items() if queue]
+        if not waiting:
+            return None
+        priority = min(
+            waiting,
+            key=lambda priority: (self._finish[priority], -self.weights[priority]),
+        )
+        return self._queues[priority][0]
+
+    def acquire(self, priority: str = "normal", deadline=None):
+        """Block until this request is scheduled and has taken a token from the budget
+
+        Args:
+            priority (str, optional): one of the scheduler's priorities, e.g. 'interactive', 'normal' or 'bulk'. Defaults to "normal".
+            deadline (Deadline, optional): give up once the deadline has passed. Defaults to None.
+
+        Raises:
+            ValueError: If the priority is unknown
+            DeadlineExceeded: If the deadline passed while waiting
+        """
+        validateparam(
+            priority,
+            self.weights,
+            f"'priority' must be one of {', '.join(map(repr, self.weights))}",
+        )
+
+        ticket = object()
+        queue = self._queues[priority]
+        reserve = self.reserves.get(priority, 0)
+
+        with self._condition:
+            if not queue:
+                # an idle priority starts at the current virtual time, it does not get credit for the time it was idle
+                self._finish[priority] = max(self._finish[priority], self._virtual_time)
+            queue.append(ticket)
+            self._condition.notify_all()
+
+            try:
+                while True:
+                    if self._next() is ticket:
+                        wait = self.rate_limiter.try_acquire(reserve=reserve)
+                        if wait == 0:
+                            break
+                    else:
+                        wait = None
+
+                    if deadline is not None:
+                        remaining = deadline.remaining()
+                        if remaining == 0 or (wait is not None and wait > remaining):
+                            raise DeadlineExceeded(
+                                "Deadline exceeded waiting for rate limit budget"
+                            )
+                        wait = remaining if wait is None else wait
+
+                    # woken early when a request arrives or the head is served
+                    self._condition.wait(wait)
+            finally:
+                queue.remove(ticket)
+                self._condition.notify_all()
+
+            self._virtual_time = self._finish[priority]
+            self._finish[priority] += 1 / self.weights[priority]
+
+    def try_acquire(self, priority: str = "normal") -> bool:
+        """Take a token for an optional request (e.g. a hedge) without waiting
+
+        The token is only taken if no request is waiting for one, and the priority's reserve is left in the bucket.
+
+        Args:
+            priority (str, optional): one of the scheduler's priorities. Defaults to "normal".
+
+        Returns:
+            bool: True if a token was taken
+        """
+        validateparam(
+            priority,
+            self.weights,
+            f"'priority' must be one of {', '.join(map(repr, self.weights))}",
+        )
+
+        with self._condition:
+            if any(self._queues.values()):
+                return False
+            if self.rate_limiter.try_acquire(reserve=self.reserves.get(priority, 0)):
+                return False
+
+            self._finish[priority] = max(self._finish[priority], self._virtual_time)
+            self._virtual_time = self._finish[priority]
+            self._finish[priority] += 1 / self.weights[priority]
+            return True
+
+
+def shared_rate_limiter(location: str, requests_per_second: float = 10):
+    """Return a SharedTokenBucket on a SQLite file or BucketServer url, or None if 'location' is empty
+
+    Args:
+        location (str): path of a SQLite file shared by processes on this host, or the url of a BucketServer
+        requests_per_second (float, optional): requests per second shared by every process using 'location'. Defaults to 10.
+    """
+    if not location:
+        return None
+    return SharedTokenBucket(open_bucket_store(location), rate=requests_per_second)
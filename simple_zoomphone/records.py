@@ -0,0 +1,171 @@
+"""Compact record types for Zoom Phone API records.
+
+By default every record returned by Phone is a plain dict.  For large crawls (millions of call logs) the per
+dict overhead and the repeated key strings dominate memory use.  The classes in this module store one record
+per object with __slots__ (no per object __dict__), values are converted to the column types in schema.py
+and repeated values such as direction, result, number types, users and sites are interned so that all records share
+a single string object per distinct value.
+
+Pass a record class with the 'record_type' option of the Phone list methods:
+
+    call_logs = zoomapi.phone.get_account_call_logs(from_date, to_date, record_type=CallLog)
+    call_logs[0].direction  # 'inbound'
+
+Records keep dict style read access (record["id"], record.get("site_name")) and can be converted back with to_dict().
+Records compare equal when all their values are equal and are hashed by their 'id'.
+Nested objects are flattened as in the export sinks (e.g. site.name -> site_name), lists in the API response are not kept.
+"""
+
+import sys
+import datetime
+
+from .schema import (
+    CALL_LOG_FIELDS,
+    RECORDING_FIELDS,
+    VOICEMAIL_FIELDS,
+    PHONE_USER_FIELDS,
+    PHONE_NUMBER_FIELDS,
+    lookup,
+    convert,
+)
+
+# Columns whose values repeat across records (enum like values, users, sites and the numbers they call), interned so
+# that records share one string object per distinct value.  Interned strings are freed once no record references them.
+INTERNED_FIELDS = {
+    "caller_number_type",
+    "callee_number_type",
+    "direction",
+    "result",
+    "path",
+    "status",
+    "source",
+    "number_type",
+    "owner_type",
+    "assignee_type",
+    "site_id",
+    "site_name",
+    "user_id",
+    "owner_id",
+    "owner_name",
+    "callee_user_id",
+    "caller_number",
+    "caller_name",
+    "callee_number",
+    "callee_name",
+}
+
+
+def _parse_timestamp(value):
+    # datetime.fromisoformat is considerably faster than strptime, it does not accept the trailing 'Z' on python < 3.11
+    if value.endswith("Z"):
+        return datetime.datetime.fromisoformat(value[:-1]).replace(
+            tzinfo=datetime.timezone.utc
+        )
+    return convert(value, "timestamp")
+
+
+class Record:
+    """Base class of the compact record types, subclasses only define FIELDS (see schema.py)"""
+
+    __slots__ = ()
+    FIELDS = []
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # precompute how each field is read and converted, so from_json does no per record lookups of the field definitions
+        cls._columns = tuple(name for name, column_type, source_path in cls.FIELDS)
+        cls._plan = tuple(
+            (
+                name,
+                source_path[0] if len(source_path) == 1 else None,
+                source_path,
+                column_type,
+                name in INTERNED_FIELDS,
+            )
+            for name, column_type, source_path in cls.FIELDS
+        )
+
+    @classmethod
+    def from_json(cls, record: dict):
+        """Create a record from one JSON record as returned by the Zoom API"""
+        self = cls.__new__(cls)
+
+        for name, key, source_path, column_type, interned in cls._plan:
+            if key is not None:
+                value = record.get(key)
+            else:
+                value = lookup(record, source_path)
+
+            if value is None or value == "":
+                value = None
+            elif column_type == "string":
+                value = sys.intern(str(value)) if interned else str(value)
+            elif column_type == "timestamp":
+                value = _parse_timestamp(value)
+            else:
+                value = convert(value, column_type)
+
+            object.__setattr__(self, name, value)
+
+        return self
+
+    @classmethod
+    def from_page(cls, page: list) -> list:
+        """Create records from one page of JSON records"""
+        from_json = cls.from_json
+        return [from_json(record) for record in page]
+
+    def __getitem__(self, name: str):
+        try:
+            return getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+
+    def get(self, name: str, default=None):
+        return getattr(self, name, default)
+
+    def keys(self) -> tuple:
+        return self._columns
+
+    def to_dict(self) -> dict:
+        """Return the record as a flat dict of column name -> value"""
+        return {name: getattr(self, name) for name in self._columns}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(
+            getattr(self, name) == getattr(other, name) for name in self._columns
+        )
+
+    def __hash__(self):
+        # equal records have the same id, so records can be put in sets and used as dict keys (e.g. to deduplicate)
+        return hash((type(self), getattr(self, "id", None)))
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={getattr(self, 'id', None)!r})"
+
+
+class CallLog(Record):
+    FIELDS = CALL_LOG_FIELDS
+    __slots__ = tuple(name for name, column_type, source_path in FIELDS)
+
+
+class Recording(Record):
+    FIELDS = RECORDING_FIELDS
+    __slots__ = tuple(name for name, column_type, source_path in FIELDS)
+
+
+class Voicemail(Record):
+    FIELDS = VOICEMAIL_FIELDS
+    __slots__ = tuple(name for name, column_type, source_path in FIELDS)
+
+
+class PhoneUser(Record):
+    FIELDS = PHONE_USER_FIELDS
+    __slots__ = tuple(name for name, column_type, source_path in FIELDS)
+
+
+class PhoneNumber(Record):
+    FIELDS = PHONE_NUMBER_FIELDS
+    __slots__ = tuple(name for name, column_type, source_path in FIELDS)
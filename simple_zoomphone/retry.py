@@ -0,0 +1,181 @@
+import time
+import random
+import threading
+import email.utils
+
+import requests
+
+from .exceptions import CircuitOpenError
+
+# methods that can be sent again without side effects.  Zoom PATCH requests set values, so repeating one is safe
+IDEMPOTENT_METHODS = ("GET", "HEAD", "OPTIONS", "PUT", "DELETE", "PATCH")
+
+
+class RetryPolicy:
+    def __init__(
+        self,
+        max_attempts: int = 7,
+        base_delay: float = 1,
+        max_delay: float = 30,
+        deadline: float = None,
+        retry_statuses: tuple = (429, 500, 502, 503, 504),
+        retry_exceptions: tuple = (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+        ),
+        idempotent_methods: tuple = IDEMPOTENT_METHODS,
+        max_retry_after: float = 60,
+    ):
+        """Decides whether a failed request is retried and how long to wait before the next attempt
+
+        Waits use exponential backoff with decorrelated jitter: each wait is random between 'base_delay' and three
+        times the previous wait, capped at 'max_delay'.  Clients retrying at the same time spread out instead of
+        hitting the API in lock step.  A Retry-After header is honoured when it is not longer than 'max_retry_after'.
+
+        Non-idempotent requests (POST) are only retried when the API certainly did not act on them: a 429 response, or
+        a connection that could not be established.  Other failures of a POST are returned to the caller.
+
+        Example:
+            zoomapi = ZoomAPIClient(API_KEY, API_SECRET, retry_policy=RetryPolicy(max_attempts=10, deadline=300))
+
+        Args:
+            max_attempts (int, optional): maximum attempts per request, including the first. Defaults to 7.
+            base_delay (float, optional): minimum wait between attempts in seconds. Defaults to 1.
+            max_delay (float, optional): maximum wait between attempts in seconds. Defaults to 30.
+            deadline (float, optional): maximum seconds spent on one request including all retries and waits. Defaults to None (no limit).
+            retry_statuses (tuple, optional): HTTP status codes that are retried. Defaults to (429, 500, 502, 503, 504).
+            retry_exceptions (tuple, optional): exception types that are retried. Defaults to requests ConnectionError and Timeout.
+            idempotent_methods (tuple, optional): HTTP methods retried on any retryable failure. Defaults to IDEMPOTENT_METHODS.
+            max_retry_after (float, optional): longest Retry-After in seconds that is waited for, longer waits (e.g. the daily limit) fail the request. Defaults to 60.
+        """
+        if max_attempts < 1:
+            raise ValueError("'max_attempts' must be at least 1")
+
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_statuses = tuple(retry_statuses)
+        self.retry_exceptions = tuple(retry_exceptions)
+        self.idempotent_methods = tuple(method.upper() for method in idempotent_methods)
+        self.max_retry_after = max_retry_after
+
+    def is_idempotent(self, method: str) -> bool:
+        return method.upper() in self.idempotent_methods
+
+    def retry_status(self, status_code: int, idempotent: bool) -> bool:
+        """Return True if a response with this status code should be retried"""
+        if status_code not in self.retry_statuses:
+            return False
+        # a rate limited request was not processed, so it is safe to send again whatever the method
+        return idempotent or status_code == 429
+
+    def retry_exception(self, exception: Exception, idempotent: bool) -> bool:
+        """Return True if a request that raised this exception should be retried"""
+        if not isinstance(exception, self.retry_exceptions):
+            return False
+        # the request never reached the API if the connection could not be established
+        return idempotent or isinstance(exception, requests.exceptions.ConnectTimeout)
+
+    def backoff(self, previous_delay: float) -> float:
+        """Return the next wait in seconds (decorrelated jitter)"""
+        return min(
+            self.max_delay,
+            random.uniform(self.base_delay, max(self.base_delay, previous_delay * 3)),
+        )
+
+    def retry_after(self, response) -> float:
+        """Return the wait requested by a Retry-After header in seconds, or None"""
+        value = response.headers.get("Retry-After") if response.headers else None
+        if not value:
+            return None
+
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+
+        try:
+            retry_at = email.utils.parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        return max(0.0, retry_at.timestamp() - time.time())
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30):
+        """Stops sending requests while the Zoom API is failing
+
+        After 'failure_threshold' consecutive failures (5xx responses or connection errors) the circuit opens and
+        requests fail immediately with CircuitOpenError for 'recovery_timeout' seconds.  Then a single trial request is
+        let through: if it succeeds the circuit closes, otherwise it opens again.
+
+        Args:
+            failure_threshold (int, optional): consecutive failures that open the circuit. Defaults to 5.
+            recovery_timeout (float, optional): seconds the circuit stays open before a trial request. Defaults to 30.
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_progress = False
+
+    @property
+    def state(self) -> str:
+        """'closed', 'open' or 'half-open'"""
+        with self._lock:
+            return self._state()
+
+    def _state(self) -> str:
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.recovery_timeout:
+            return "open"
+        return "half-open"
+
+    def before_request(self, url: str = "", claim_trial: bool = True) -> bool:
+        """Raise CircuitOpenError if a request may not be sent now
+
+        In the half-open state the caller becomes the trial request.  It must then report the outcome with
+        record_success() or record_failure(), or call release_trial() if the request was not sent.
+
+        Args:
+            url (str, optional): url of the request, used in the error message. Defaults to "".
+            claim_trial (bool, optional): take the trial in the half-open state, pass False to only check the state before work that precedes sending. Defaults to True.
+
+        Returns:
+            bool: True if this call took the trial
+        """
+        with self._lock:
+            state = self._state()
+
+            if state == "open" or (state == "half-open" and self._trial_in_progress):
+                raise CircuitOpenError(
+                    f"Circuit breaker is open after {self._failures} consecutive failures, not sending request {url}"
+                )
+
+            if state == "half-open" and claim_trial:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def release_trial(self):
+        """Give back a trial taken by before_request() for a request that was not sent, without recording an outcome"""
+        with self._lock:
+            self._trial_in_progress = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_progress = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_in_progress or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+            self._trial_in_progress = False
@@ -0,0 +1,145 @@
+"""Field definitions for Zoom Phone records written by the export sinks.
+
+Each field is a tuple of (column name, column type, source path).  The source path is the
+sequence of keys used to read the value out of the JSON record returned by the Zoom API, which
+lets nested objects such as 'site' or 'owner' be flattened into plain columns.
+
+Column types are one of 'string', 'int32', 'bool' or 'timestamp'.
+"""
+
+from .util import parse_zoom_datetime
+
+CALL_LOG_FIELDS = [
+    ("id", "string", ("id",)),
+    ("call_id", "string", ("call_id",)),
+    ("user_id", "string", ("user_id",)),
+    ("caller_number", "string", ("caller_number",)),
+    ("caller_number_type", "string", ("caller_number_type",)),
+    ("caller_name", "string", ("caller_name",)),
+    ("callee_number", "string", ("callee_number",)),
+    ("callee_number_type", "string", ("callee_number_type",)),
+    ("callee_name", "string", ("callee_name",)),
+    ("direction", "string", ("direction",)),
+    ("duration", "int32", ("duration",)),
+    ("result", "string", ("result",)),
+    ("date_time", "timestamp", ("date_time",)),
+    ("path", "string", ("path",)),
+    ("has_recording", "bool", ("has_recording",)),
+    ("has_voicemail", "bool", ("has_voicemail",)),
+    ("site_id", "string", ("site", "id")),
+    ("site_name", "string", ("site", "name")),
+]
+
+RECORDING_FIELDS = [
+    ("id", "string", ("id",)),
+    ("call_log_id", "string", ("call_log_id",)),
+    ("caller_number", "string", ("caller_number",)),
+    ("caller_number_type", "string", ("caller_number_type",)),
+    ("caller_name", "string", ("caller_name",)),
+    ("callee_number", "string", ("callee_number",)),
+    ("callee_number_type", "string", ("callee_number_type",)),
+    ("callee_name", "string", ("callee_name",)),
+    ("direction", "string", ("direction",)),
+    ("duration", "int32", ("duration",)),
+    ("date_time", "timestamp", ("date_time",)),
+    ("download_url", "string", ("download_url",)),
+    ("owner_id", "string", ("owner", "id")),
+    ("owner_name", "string", ("owner", "name")),
+    ("owner_type", "string", ("owner", "type")),
+    ("site_id", "string", ("site", "id")),
+    ("site_name", "string", ("site", "name")),
+]
+
+VOICEMAIL_FIELDS = [
+    ("id", "string", ("id",)),
+    ("call_log_id", "string", ("call_log_id",)),
+    ("caller_number", "string", ("caller_number",)),
+    ("caller_number_type", "string", ("caller_number_type",)),
+    ("caller_name", "string", ("caller_name",)),
+    ("callee_number", "string", ("callee_number",)),
+    ("callee_number_type", "string", ("callee_number_type",)),
+    ("callee_name", "string", ("callee_name",)),
+    ("callee_user_id", "string", ("callee_user_id",)),
+    ("status", "string", ("status",)),
+    ("duration", "int32", ("duration",)),
+    ("date_time", "timestamp", ("date_time",)),
+    ("download_url", "string", ("download_url",)),
+]
+
+PHONE_USER_FIELDS = [
+    ("id", "string", ("id",)),
+    ("email", "string", ("email",)),
+    ("name", "string", ("name",)),
+    ("extension_number", "string", ("extension_number",)),
+    ("status", "string", ("status",)),
+    ("site_id", "string", ("site", "id")),
+    ("site_name", "string", ("site", "name")),
+]
+
+PHONE_NUMBER_FIELDS = [
+    ("id", "string", ("id",)),
+    ("number", "string", ("number",)),
+    ("display_name", "string", ("display_name",)),
+    ("source", "string", ("source",)),
+    ("status", "string", ("status",)),
+    ("number_type", "string", ("number_type",)),
+    ("assignee_id", "string", ("assignee", "id")),
+    ("assignee_name", "string", ("assignee", "name")),
+    ("assignee_type", "string", ("assignee", "type")),
+    ("assignee_extension_number", "string", ("assignee", "extension_number")),
+    ("site_id", "string", ("site", "id")),
+    ("site_name", "string", ("site", "name")),
+]
+
+# Call log 'result' values for inbound calls that were not answered
+MISSED_CALL_RESULTS = ["Missed", "No Answer", "Call Cancel", "Voicemail"]
+
+# Columns added to each call log by the call_logs.py exporter
+CALL_LOG_ENRICHMENT_FIELDS = [
+    ("email", "string", ("email",)),
+    ("dept", "string", ("dept",)),
+    ("job_title", "string", ("job_title",)),
+]
+
+
+def lookup(record: dict, source_path: tuple):
+    """Read a (possibly nested) value from a Zoom API record, returning None if any key is missing."""
+    value = record
+    for key in source_path:
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value
+
+
+def convert(value, column_type: str):
+    """Convert a raw JSON value to the python type used for a column type."""
+    if value is None or value == "":
+        return None
+
+    if column_type == "string":
+        return str(value)
+    elif column_type == "int32":
+        return int(value)
+    elif column_type == "bool":
+        return bool(value)
+    elif column_type == "timestamp":
+        return parse_zoom_datetime(value)
+    else:
+        raise ValueError(f"Unknown column type '{column_type}'")
+
+
+def flatten_record(record: dict, fields: list) -> dict:
+    """Flatten a Zoom API record into a dict of typed column values.
+
+    Args:
+        record (dict): record as returned from the Zoom API
+        fields (list): field definitions, e.g. CALL_LOG_FIELDS
+
+    Returns:
+        dict: column name -> converted value
+    """
+    return {
+        name: convert(lookup(record, source_path), column_type)
+        for name, column_type, source_path in fields
+    }
@@ -0,0 +1,203 @@
+"""Split an export across processes.
+
+Large exports are CPU bound on JSON decoding, enrichment and CSV formatting once requests run concurrently.  The
+helpers in this module split the work into shards, by a stable hash of the user or by time window, run one shard
+per process and merge the part files each process writes into one ordered file.
+
+Example:
+    shards = shard_by_hash(users, 16, key=lambda user: user["email"])
+    results = run_shards(export_shard, [(index, users, f"part-{index:05d}.csv") for index, users in enumerate(shards)])
+    merge_csv_parts(part_paths, "call-logs.csv", sort_key=lambda row: (row["date_time"], row["email"]))
+"""
+
+import os
+import csv
+import zlib
+import heapq
+import datetime
+import contextlib
+import multiprocessing
+import concurrent.futures
+
+
+def shard_of(key: str, shards: int) -> int:
+    """Return the shard (0 - shards-1) of a key, stable across processes and runs (unlike hash())"""
+    return zlib.crc32(key.lower().encode("utf-8")) % shards
+
+
+def shard_by_hash(items: list, shards: int, key) -> list:
+    """Split items into 'shards' lists by a stable hash of key(item)
+
+    Args:
+        items (list): e.g. users
+        shards (int): number of shards
+        key (callable): function(item) returning the string to hash, e.g. the user's email
+    """
+    result = [[] for _ in range(shards)]
+    for item in items:
+        result[shard_of(key(item), shards)].append(item)
+    return result
+
+
+def time_windows(
+    from_date: datetime.datetime, to_date: datetime.datetime, shards: int
+) -> list:
+    """Split [from_date, to_date) into 'shards' consecutive windows of whole days where possible
+
+    Returns:
+        list: (from_date, to_date) tuples, fewer than 'shards' if the range has fewer days
+    """
+    days = max(1, (to_date - from_date).days)
+    shards = min(shards, days)
+
+    windows = []
+    start = from_date
+    for index in range(shards):
+        # spread the remainder days over the first windows
+        length = days // shards + (1 if index < days % shards else 0)
+        end = (
+            to_date if index == shards - 1 else start + datetime.timedelta(days=length)
+        )
+        windows.append((start, end))
+        start = end
+
+    return windows
+
+
+def run_shards(worker, shard_arguments: list, processes: int = None) -> list:
+    """Run worker(*arguments) for every shard in a pool of processes
+
+    Processes are started with 'spawn', so each shard starts without the parent's sessions and threads and creates
+    its own API client.  'worker' must be a module level function.
+
+    Args:
+        worker (callable): module level function run once per shard
+        shard_arguments (list): tuple of arguments of each shard
+        processes (int, optional): number of processes. Defaults to None (os.cpu_count()).
+
+    Raises:
+        Exception: the first exception raised by a shard, after all shards have finished
+
+    Returns:
+        list: return value of each shard, in shard order
+    """
+    processes = min(processes or os.cpu_count() or 1, len(shard_arguments)) or 1
+
+    with concurrent.futures.ProcessPoolExecutor(
+        max_workers=processes, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futures = [executor.submit(worker, *arguments) for arguments in shard_arguments]
+        concurrent.futures.wait(futures)
+
+    return [future.result() for future in futures]
+
+
+def merge_csv_parts(
+    part_paths: list, output_path: str, sort_key=None, remove_parts: bool = True
+) -> int:
+    """Merge CSV part files with the same header into one file
+
+    With a sort key the parts must each be sorted by it, they are merged in a single streaming pass (k-way merge)
+    into one sorted file.  Without a sort key the parts are concatenated in order.
+
+    Args:
+        part_paths (list): CSV files written by the shards
+        output_path (str): merged CSV file
+        sort_key (callable, optional): function(row dict) returning the sort key the parts are sorted by. Defaults to None.
+        remove_parts (bool, optional): delete the part files after merging. Defaults to True.
+
+    Returns:
+        int: rows written
+    """
+    rows = 0
+
+    with contextlib.ExitStack() as stack:
+        readers = [
+            csv.DictReader(stack.enter_context(open(path, newline="")))
+            for path in part_paths
+        ]
+        fieldnames = next(
+            (reader.fieldnames for reader in readers if reader.fieldnames), []
+        )
+
+        output = stack.enter_context(open(output_path, "w", newline=""))
+        writer = csv.DictWriter(output, fieldnames=fieldnames)
+        writer.writeheader()
+
+        if sort_key is not None:
+            merged = heapq.merge(*readers, key=sort_key)
+        else:
+            merged = (row for reader in readers for row in reader)
+
+        for row in merged:
+            writer.writerow(row)
+            rows += 1
+
+    if remove_parts:
+        for path in part_paths:
+            os.remove(path)
+
+    return rows
+
+
+class SortedCSVWriter:
+    def __init__(self, path: str, fieldnames: list, sort_key, run_size: int = 100000):
+        """Write rows in any order to a CSV file sorted by sort_key, holding at most 'run_size' rows in memory
+
+        Rows are buffered, sorted and written to run files next to 'path' every 'run_size' rows.  close() merges the
+        runs into 'path' with merge_csv_parts (an external merge sort), so a shard's part file can be larger than memory.
+        Extra keys in the rows are ignored.
+
+        Args:
+            path (str): sorted CSV file written on close()
+            fieldnames (list): CSV header
+            sort_key (callable): function(row dict) returning the sort key, must give the same order for the CSV (string) values of a row
+            run_size (int, optional): rows sorted in memory at a time. Defaults to 100000.
+        """
+        self.path = path
+        self.fieldnames = fieldnames
+        self.sort_key = sort_key
+        self.run_size = run_size
+        self._rows = []
+        self._run_paths = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            for path in self._run_paths:
+                os.remove(path)
+            self._run_paths = []
+
+    def writerows(self, rows):
+        for row in rows:
+            self._rows.append(row)
+            if len(self._rows) >= self.run_size:
+                self._write_run()
+
+    def _write_run(self):
+        self._rows.sort(key=self.sort_key)
+
+        path = f"{self.path}.run-{len(self._run_paths):05d}"
+        with open(path, "w", newline="") as run_file:
+            writer = csv.DictWriter(
+                run_file, extrasaction="ignore", fieldnames=self.fieldnames
+            )
+            writer.writeheader()
+            writer.writerows(self._rows)
+
+        self._run_paths.append(path)
+        self._rows = []
+
+    def close(self) -> int:
+        """Merge the runs into the sorted file, return the rows written"""
+        if self._rows or not self._run_paths:
+            # an empty export still gets a file with a header
+            self._write_run()
+
+        rows = merge_csv_parts(self._run_paths, self.path, sort_key=self.sort_key)
+        self._run_paths = []
+        return rows
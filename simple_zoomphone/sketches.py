@@ -0,0 +1,407 @@
+"""Fixed memory, mergeable streaming sketches for call center metrics.
+
+These sketches summarise an unbounded stream of call logs in a constant amount of memory:
+
+    DDSketch        - duration percentiles (e.g. p95 handle time) with a bounded relative error
+    HyperLogLog     - approximate count of distinct callers
+    CountMinSketch  - approximate call counts per number, with a bounded top-k of the busiest numbers
+
+Every sketch can be merged with a sketch of the same configuration, so partial results built by parallel
+workers (threads or processes, sketches are picklable) can be combined into a single result.
+
+Example:
+    metrics = CallMetricsAggregator(group_by="site")
+    for page in zoomapi.phone.get_account_call_logs(from_date, to_date, paged=True):
+        metrics.add_page(page)
+    metrics.duration_quantile(0.95)
+    metrics.distinct_callers("Los Angeles")
+"""
+
+import math
+import array
+import hashlib
+
+from .schema import MISSED_CALL_RESULTS, lookup
+
+
+def _hash64(item) -> int:
+    """Stable 64 bit hash of an item (python's hash() is salted per process, so can't be used for mergeable sketches)"""
+    return int.from_bytes(
+        hashlib.blake2b(str(item).encode("utf-8"), digest_size=8).digest(), "big"
+    )
+
+
+class DDSketch:
+    def __init__(self, relative_accuracy: float = 0.01, max_bins: int = 2048):
+        """Quantile sketch with relative error guarantees (DDSketch, Masson et al. 2019)
+
+        Values are counted in logarithmically sized bins, so any quantile is returned within 'relative_accuracy' of the true value.
+        When more than 'max_bins' bins are in use the lowest bins are collapsed together, keeping high quantiles (p95, p99) accurate.
+
+        Args:
+            relative_accuracy (float, optional): relative accuracy of returned quantiles. Defaults to 0.01 (1%).
+            max_bins (int, optional): maximum number of bins kept in memory. Defaults to 2048.
+        """
+        if not 0 < relative_accuracy < 1:
+            raise ValueError("'relative_accuracy' must be between 0 and 1")
+
+        self.relative_accuracy = relative_accuracy
+        self.max_bins = max_bins
+
+        self._gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self._gamma)
+
+        self._bins = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float, count: int = 1):
+        """Add a non negative value (e.g. call duration in seconds)"""
+        if value < 0:
+            raise ValueError("DDSketch only accepts non negative values")
+
+        self.count += count
+        self.sum += value * count
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+        if value == 0:
+            self.zero_count += count
+            return
+
+        index = math.ceil(math.log(value) / self._log_gamma)
+        self._bins[index] = self._bins.get(index, 0) + count
+
+        if len(self._bins) > self.max_bins:
+            self._collapse()
+
+    def _collapse(self):
+        indexes = sorted(self._bins)
+        collapse_count = len(indexes) - self.max_bins + 1
+        target = indexes[collapse_count - 1]
+
+        for index in indexes[: collapse_count - 1]:
+            self._bins[target] += self._bins.pop(index)
+
+    def merge(self, other: "DDSketch"):
+        """Merge another DDSketch with the same relative accuracy into this sketch"""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError(
+                "Can only merge DDSketches with the same relative accuracy"
+            )
+
+        for index, count in other._bins.items():
+            self._bins[index] = self._bins.get(index, 0) + count
+
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+        while len(self._bins) > self.max_bins:
+            self._collapse()
+
+        return self
+
+    def quantile(self, q: float) -> float:
+        """Return the approximate value at quantile q (0 <= q <= 1), or None if the sketch is empty"""
+        if not 0 <= q <= 1:
+            raise ValueError("'q' must be between 0 and 1")
+
+        if self.count == 0:
+            return None
+
+        rank = q * (self.count - 1)
+
+        if rank < self.zero_count:
+            return 0.0
+
+        running_count = self.zero_count
+        for index in sorted(self._bins):
+            running_count += self._bins[index]
+            if running_count > rank:
+                value = 2 * self._gamma**index / (self._gamma + 1)
+                # the bin midpoint may fall outside the observed range for the extreme bins
+                return min(max(value, self.min), self.max)
+
+        return self.max
+
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else None
+
+
+class HyperLogLog:
+    def __init__(self, precision: int = 14):
+        """Distinct count estimator (HyperLogLog, Flajolet et al. 2007)
+
+        Uses 2^precision one byte registers, 16KB for the default precision of 14, with a standard error of about 1.04 / sqrt(2^precision) (~0.8%).
+
+        Args:
+            precision (int, optional): number of index bits, between 4 and 16. Defaults to 14.
+        """
+        if not 4 <= precision <= 16:
+            raise ValueError("'precision' must be between 4 and 16")
+
+        self.precision = precision
+        self._register_count = 1 << precision
+        self._registers = bytearray(self._register_count)
+
+        if self._register_count >= 128:
+            self._alpha = 0.7213 / (1 + 1.079 / self._register_count)
+        else:
+            self._alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self._register_count]
+
+    def add(self, item):
+        hashed = _hash64(item)
+
+        register = hashed >> (64 - self.precision)
+        remaining_bits = 64 - self.precision
+        remaining = hashed & ((1 << remaining_bits) - 1)
+        # position of the leftmost 1 bit in the remaining bits
+        rank = remaining_bits - remaining.bit_length() + 1
+
+        if rank > self._registers[register]:
+            self._registers[register] = rank
+
+    def merge(self, other: "HyperLogLog"):
+        """Merge another HyperLogLog with the same precision into this sketch"""
+        if other.precision != self.precision:
+            raise ValueError("Can only merge HyperLogLogs with the same precision")
+
+        self._registers = bytearray(
+            max(a, b) for a, b in zip(self._registers, other._registers)
+        )
+        return self
+
+    def count(self) -> int:
+        """Return the estimated number of distinct items added"""
+        m = self._register_count
+        estimate = self._alpha * m * m / sum(2.0**-r for r in self._registers)
+
+        zero_registers = self._registers.count(0)
+        if estimate <= 2.5 * m and zero_registers:
+            # small range correction (linear counting)
+            estimate = m * math.log(m / zero_registers)
+
+        return int(round(estimate))
+
+
+class CountMinSketch:
+    def __init__(self, width: int = 2048, depth: int = 4, top_k: int = 50):
+        """Approximate frequency counts (Count-Min sketch, Cormode & Muthukrishnan 2005) with a bounded top-k of heavy hitters
+
+        Counts are over-estimated by at most 2 x total / width with probability 1 - 0.5^depth.
+
+        Args:
+            width (int, optional): counters per row. Defaults to 2048.
+            depth (int, optional): number of rows (hash functions). Defaults to 4.
+            top_k (int, optional): number of most frequent items tracked for top(). Defaults to 50.
+        """
+        self.width = width
+        self.depth = depth
+        self.top_k = top_k
+        self.total = 0
+
+        self._rows = [array.array("q", [0]) * width for _ in range(depth)]
+        # item -> estimated count, for the current heavy hitter candidates
+        self._heavy_hitters = {}
+
+    def _columns(self, item):
+        # Kirsch-Mitzenmacher double hashing derives 'depth' hash functions from one 64 bit hash
+        hashed = _hash64(item)
+        hash1 = hashed & 0xFFFFFFFF
+        hash2 = hashed >> 32
+        return [(hash1 + row * hash2) % self.width for row in range(self.depth)]
+
+    def add(self, item, count: int = 1):
+        self.total += count
+
+        estimate = None
+        for row, column in zip(self._rows, self._columns(item)):
+            row[column] += count
+            estimate = row[column] if estimate is None else min(estimate, row[column])
+
+        self._track(item, estimate)
+
+    def _track(self, item, estimate: int):
+        if item in self._heavy_hitters or len(self._heavy_hitters) < self.top_k:
+            self._heavy_hitters[item] = estimate
+            return
+
+        smallest = min(self._heavy_hitters, key=self._heavy_hitters.get)
+        if estimate > self._heavy_hitters[smallest]:
+            del self._heavy_hitters[smallest]
+            self._heavy_hitters[item] = estimate
+
+    def estimate(self, item) -> int:
+        """Return the estimated count of an item (never less than the true count)"""
+        return min(row[column] for row, column in zip(self._rows, self._columns(item)))
+
+    def merge(self, other: "CountMinSketch"):
+        """Merge another CountMinSketch with the same width and depth into this sketch"""
+        if other.width != self.width or other.depth != self.depth:
+            raise ValueError(
+                "Can only merge CountMinSketches with the same width and depth"
+            )
+
+        for row, other_row in zip(self._rows, other._rows):
+            for column in range(self.width):
+                row[column] += other_row[column]
+
+        self.total += other.total
+
+        candidates = set(self._heavy_hitters) | set(other._heavy_hitters)
+        estimates = {item: self.estimate(item) for item in candidates}
+        self._heavy_hitters = dict(
+            sorted(estimates.items(), key=lambda item: item[1], reverse=True)[
+                : self.top_k
+            ]
+        )
+        return self
+
+    def top(self, limit: int = 10) -> list:
+        """Return up to 'limit' (item, estimated count) tuples, most frequent first"""
+        return sorted(
+            self._heavy_hitters.items(), key=lambda item: item[1], reverse=True
+        )[:limit]
+
+
+class CallMetricsAggregator:
+    def __init__(
+        self,
+        group_by: str = "site",
+        relative_accuracy: float = 0.01,
+        hll_precision: int = 14,
+        top_k: int = 50,
+    ):
+        """Streaming call center metrics over call logs in fixed memory
+
+        Keeps a call count, a DDSketch of handled call durations and a distinct caller HyperLogLog per group (site or
+        owner, e.g. a call queue) plus account wide, and a Count-Min sketch of caller and callee numbers.  Handled calls
+        are those CallLogArrays counts as handled: not a missed inbound call and longer than 0 seconds.  Memory depends only on the sketch settings
+        and the number of groups, not on the number of call logs.
+
+        Args:
+            group_by (str, optional): 'site' to group by site name or 'owner' to group by call log owner (user or call queue name). Defaults to "site".
+            relative_accuracy (float, optional): DDSketch relative accuracy. Defaults to 0.01.
+            hll_precision (int, optional): HyperLogLog precision. Defaults to 14.
+            top_k (int, optional): number of busiest numbers tracked. Defaults to 50.
+        """
+        if group_by not in ["site", "owner"]:
+            raise ValueError("'group_by' must be either 'site' or 'owner'")
+
+        self.group_by = group_by
+        self._relative_accuracy = relative_accuracy
+        self._hll_precision = hll_precision
+
+        self._group_path = ("site", "name") if group_by == "site" else ("owner", "name")
+
+        # group name -> sketch, the account wide sketch is stored under None
+        self._calls = {None: 0}
+        self._durations = {None: DDSketch(relative_accuracy)}
+        self._callers = {None: HyperLogLog(hll_precision)}
+        self.numbers = CountMinSketch(top_k=top_k)
+
+    def _group_sketches(self, group):
+        if group not in self._durations:
+            self._calls[group] = 0
+            self._durations[group] = DDSketch(self._relative_accuracy)
+            self._callers[group] = HyperLogLog(self._hll_precision)
+        return self._durations[group], self._callers[group]
+
+    def add(self, call_log: dict):
+        """Add a single call log record"""
+        group = lookup(call_log, self._group_path)
+        duration = call_log.get("duration") or 0
+        caller_number = call_log.get("caller_number")
+        callee_number = call_log.get("callee_number")
+
+        missed = (
+            call_log.get("direction") == "inbound"
+            and call_log.get("result") in MISSED_CALL_RESULTS
+        )
+        # only handled calls count towards handle time
+        handled = not missed and duration > 0
+
+        for group_key in [None, group] if group is not None else [None]:
+            duration_sketch, caller_sketch = self._group_sketches(group_key)
+            self._calls[group_key] += 1
+            if handled:
+                duration_sketch.add(duration)
+            if caller_number:
+                caller_sketch.add(caller_number)
+
+        if caller_number:
+            self.numbers.add(caller_number)
+        if callee_number:
+            self.numbers.add(callee_number)
+
+    def add_page(self, call_logs: list):
+        """Add one page of call log records"""
+        for call_log in call_logs:
+            self.add(call_log)
+
+    def add_pages(self, pages):
+        """Add every page yielded by a paged Phone method (e.g. get_account_call_logs(paged=True))"""
+        for page in pages:
+            self.add_page(page)
+
+    def merge(self, other: "CallMetricsAggregator"):
+        """Merge a partial aggregator (e.g. from another worker) into this one"""
+        if other.group_by != self.group_by:
+            raise ValueError("Can only merge aggregators with the same 'group_by'")
+
+        for group in other._durations:
+            duration_sketch, caller_sketch = self._group_sketches(group)
+            self._calls[group] += other._calls[group]
+            duration_sketch.merge(other._durations[group])
+            caller_sketch.merge(other._callers[group])
+
+        self.numbers.merge(other.numbers)
+        return self
+
+    @property
+    def groups(self) -> list:
+        return [group for group in self._durations if group is not None]
+
+    def call_count(self, group: str = None) -> int:
+        return self._calls.get(group, 0)
+
+    def duration_quantile(self, q: float, group: str = None) -> float:
+        """Return the approximate duration of handled calls at quantile q, account wide or for a single group, None without handled calls
+
+        Example:
+            metrics.duration_quantile(0.95, group="Los Angeles")   # p95 handle time
+        """
+        if group not in self._durations:
+            return None
+        return self._durations[group].quantile(q)
+
+    def distinct_callers(self, group: str = None) -> int:
+        """Return the approximate number of distinct caller numbers, account wide or for a single group"""
+        if group not in self._callers:
+            return 0
+        return self._callers[group].count()
+
+    def top_numbers(self, limit: int = 10) -> list:
+        """Return the busiest caller/callee numbers as (number, approximate call count) tuples"""
+        return self.numbers.top(limit)
+
+    def summary(self) -> dict:
+        """Return call count, p50/p95/p99 duration and distinct callers for the account (key None) and each group"""
+        return {
+            group: {
+                "calls": self.call_count(group),
+                "duration_p50": self.duration_quantile(0.5, group),
+                "duration_p95": self.duration_quantile(0.95, group),
+                "duration_p99": self.duration_quantile(0.99, group),
+                "distinct_callers": self.distinct_callers(group),
+            }
+            for group in self._durations
+        }
@@ -0,0 +1,279 @@
+import sqlite3
+import datetime
+
+from .schema import (
+    CALL_LOG_FIELDS,
+    CALL_LOG_ENRICHMENT_FIELDS,
+    MISSED_CALL_RESULTS,
+    lookup,
+)
+
+
+def _sqlite_type(column_type: str) -> str:
+    if column_type in ["int32", "bool"]:
+        return "INTEGER"
+    else:
+        # timestamps are stored as the ISO 8601 strings returned by Zoom, these sort correctly as text
+        return "TEXT"
+
+
+def _sqlite_value(value, column_type: str):
+    if value is None or value == "":
+        return None
+    elif column_type == "int32":
+        return int(value)
+    elif column_type == "bool":
+        return 1 if value else 0
+    else:
+        return str(value)
+
+
+def _to_timestamp(value) -> str:
+    """Convert a datetime/date used in a query helper to the ISO format stored in the database"""
+    if value is None or isinstance(value, str):
+        return value
+
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(datetime.timezone.utc)
+        return value.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+    return value.strftime("%Y-%m-%dT00:00:00Z")
+
+
+class CallLogStore:
+
+    # columns that are indexed to support the query helpers below
+    INDEXED_COLUMNS = [
+        "date_time",
+        "caller_number",
+        "callee_number",
+        "user_id",
+        "email",
+        "direction",
+    ]
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = 5000,
+        fields: list = CALL_LOG_FIELDS + CALL_LOG_ENRICHMENT_FIELDS,
+    ):
+        """Local SQLite store for Zoom Phone call logs
+
+        Call logs are upserted keyed on the call log 'id', so re-running an export over an overlapping date range does not create duplicates.
+        Inserts are grouped into transactions of 'batch_size' records and the database uses WAL mode so analysts can query while an export is running.
+
+        Example:
+            with CallLogStore("call-logs.sqlite") as store:
+                store.insert_pages(zoomapi.phone.get_account_call_logs(from_date, to_date, paged=True))
+                store.calls_for_number("+16505551212", from_date=last_week)
+
+        Args:
+            path (str): path to SQLite database file, created if it does not exist.
+            batch_size (int, optional): number of records per insert transaction. Defaults to 5000.
+            fields (list, optional): field definitions from simple_zoomphone.schema, must include 'id'. Defaults to CALL_LOG_FIELDS + CALL_LOG_ENRICHMENT_FIELDS.
+        """
+        self._batch_size = batch_size
+        self._fields = fields
+        self._columns = [name for name, column_type, source_path in fields]
+
+        if "id" not in self._columns:
+            raise ValueError("'fields' must include the 'id' field")
+
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+        self._create_schema()
+
+        # records waiting to be written in the next transaction
+        self._pending = []
+        self.records_written = 0
+
+        column_list = ", ".join(self._columns)
+        placeholders = ", ".join(["?"] * len(self._columns))
+        update_list = ", ".join(
+            [
+                f"{column} = excluded.{column}"
+                for column in self._columns
+                if column != "id"
+            ]
+        )
+        self._upsert_sql = (
+            f"INSERT INTO call_logs ({column_list}) VALUES ({placeholders}) "
+            f"ON CONFLICT(id) DO UPDATE SET {update_list}"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _create_schema(self):
+        column_definitions = ", ".join(
+            [
+                f"{name} {_sqlite_type(column_type)}"
+                + (" PRIMARY KEY" if name == "id" else "")
+                for name, column_type, source_path in self._fields
+            ]
+        )
+
+        with self._connection:
+            self._connection.execute(
+                f"CREATE TABLE IF NOT EXISTS call_logs ({column_definitions})"
+            )
+
+            for column in self.INDEXED_COLUMNS:
+                if column in self._columns:
+                    self._connection.execute(
+                        f"CREATE INDEX IF NOT EXISTS idx_call_logs_{column} ON call_logs ({column})"
+                    )
+
+    def insert_record(self, record: dict):
+        """Queue a single call log record for upsert"""
+        if not record.get("id"):
+            # call logs without an id cannot be upserted
+            return
+
+        self._pending.append(
+            tuple(
+                _sqlite_value(lookup(record, source_path), column_type)
+                for name, column_type, source_path in self._fields
+            )
+        )
+
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+
+    def insert_records(self, records: list):
+        """Queue a list of call log records (e.g. one API page) for upsert"""
+        for record in records:
+            self.insert_record(record)
+
+    def insert_pages(self, pages):
+        """Upsert every page yielded by a paged Phone method (e.g. get_account_call_logs(paged=True))"""
+        for page in pages:
+            self.insert_records(page)
+        self.flush()
+
+    def flush(self):
+        """Write all queued records in a single transaction"""
+        if not self._pending:
+            return
+
+        with self._connection:
+            self._connection.executemany(self._upsert_sql, self._pending)
+
+        self.records_written += len(self._pending)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        self._connection.close()
+
+    def query(self, sql: str, parameters: tuple = ()) -> list:
+        """Run an arbitrary SQL query against the store and return a list of dicts"""
+        self.flush()
+        return [dict(row) for row in self._connection.execute(sql, parameters)]
+
+    def _date_filter(self, from_date, to_date):
+        clauses = []
+        parameters = []
+
+        if from_date is not None:
+            clauses.append("date_time >= ?")
+            parameters.append(_to_timestamp(from_date))
+
+        if to_date is not None:
+            clauses.append("date_time < ?")
+            parameters.append(_to_timestamp(to_date))
+
+        return clauses, parameters
+
+    def calls_for_number(self, number: str, from_date=None, to_date=None) -> list:
+        """Return all calls to or from a phone number, newest first
+
+        Args:
+            number (str): phone number or extension as it appears in caller_number / callee_number
+            from_date (datetime.datetime, optional): only include calls on or after this time. Defaults to None.
+            to_date (datetime.datetime, optional): only include calls before this time. Defaults to None.
+        """
+        clauses, parameters = self._date_filter(from_date, to_date)
+
+        # use a UNION so that both the caller_number and callee_number indexes are used
+        date_clause = "".join([f" AND {clause}" for clause in clauses])
+        sql = (
+            f"SELECT * FROM call_logs WHERE caller_number = ?{date_clause} "
+            f"UNION SELECT * FROM call_logs WHERE callee_number = ?{date_clause} "
+            "ORDER BY date_time DESC"
+        )
+
+        return self.query(sql, tuple([number] + parameters + [number] + parameters))
+
+    def calls_for_user(self, user: str, from_date=None, to_date=None) -> list:
+        """Return all calls for a user, newest first
+
+        Args:
+            user (str): user_id or email address
+            from_date (datetime.datetime, optional): only include calls on or after this time. Defaults to None.
+            to_date (datetime.datetime, optional): only include calls before this time. Defaults to None.
+        """
+        user_column = "email" if "@" in user and "email" in self._columns else "user_id"
+
+        clauses, parameters = self._date_filter(from_date, to_date)
+        clauses.insert(0, f"{user_column} = ?")
+
+        sql = f"SELECT * FROM call_logs WHERE {' AND '.join(clauses)} ORDER BY date_time DESC"
+
+        return self.query(sql, tuple([user] + parameters))
+
+    def missed_calls(self, from_date=None, to_date=None) -> list:
+        """Return inbound calls that were not answered, newest first"""
+        clauses, parameters = self._date_filter(from_date, to_date)
+        result_placeholders = ", ".join(["?"] * len(MISSED_CALL_RESULTS))
+        clauses = [
+            "direction = 'inbound'",
+            f"result IN ({result_placeholders})",
+        ] + clauses
+
+        sql = f"SELECT * FROM call_logs WHERE {' AND '.join(clauses)} ORDER BY date_time DESC"
+
+        return self.query(sql, tuple(MISSED_CALL_RESULTS + parameters))
+
+    def daily_call_volume(self, from_date=None, to_date=None) -> list:
+        """Return call count and total duration per day and direction"""
+        clauses, parameters = self._date_filter(from_date, to_date)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+
+        sql = (
+            "SELECT substr(date_time, 1, 10) AS date, direction, COUNT(*) AS calls, SUM(duration) AS total_duration "
+            f"FROM call_logs {where}GROUP BY date, direction ORDER BY date, direction"
+        )
+
+        return self.query(sql, tuple(parameters))
+
+    def top_numbers(
+        self,
+        column: str = "caller_number",
+        limit: int = 10,
+        from_date=None,
+        to_date=None,
+    ) -> list:
+        """Return the most frequent numbers in 'caller_number' or 'callee_number'"""
+        if column not in ["caller_number", "callee_number"]:
+            raise ValueError(
+                "'column' must be either 'caller_number' or 'callee_number'"
+            )
+
+        clauses, parameters = self._date_filter(from_date, to_date)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+
+        sql = (
+            f"SELECT {column} AS number, COUNT(*) AS calls FROM call_logs {where}"
+            f"GROUP BY {column} ORDER BY calls DESC LIMIT ?"
+        )
+
+        return self.query(sql, tuple(parameters + [limit]))
@@ -0,0 +1,473 @@
+"""Storage backends for downloaded Zoom Phone media.
+
+    DirectoryStorage          - one file per recording in <directory>/<year>/<month>/<user>/ (the original layout)
+    ShardedStorage            - append-only tar shards, one per user per day, with an offset index for random access
+    ContentAddressedStorage   - files named by their SHA-256 checksum, identical media is only stored once
+
+Every backend implements the same methods:
+
+    exists(user, recording) -> bool
+    store(downloader, user, recording) -> (bytes received, location, size, sha256)
+    open(location) -> readable binary file object
+    checksum(location) -> (size, sha256), or None if the media is missing
+
+'location' is a string identifying the stored media in the backend, it is what RecordingManifest stores as 'path'.
+Media is always streamed from the network to disk, it is never held in memory.
+"""
+
+import io
+import os
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import tarfile
+import datetime
+import threading
+
+from .media import file_checksum
+
+
+def recording_path(directory: str, user: str, recording: dict) -> str:
+    """Return the path a recording is stored at: <directory>/<year>/<month>/<user>/yyyymmdd-hhmm-ani-dnis.mp3"""
+    recording_date = datetime.datetime.strptime(
+        recording["date_time"], "%Y-%m-%dT%H:%M:%SZ"
+    )
+
+    filename = (
+        recording_date.strftime("%Y%m%d-%H%M")
+        + "-"
+        + recording["caller_number"]
+        + "-"
+        + recording["callee_number"]
+        + ".mp3"
+    )
+
+    return os.path.join(
+        directory,
+        str(recording_date.year),
+        str(recording_date.month),
+        user,
+        filename,
+    )
+
+
+def unique_recording_path(directory: str, user: str, recording: dict) -> str:
+    """Same layout as recording_path, with the recording id added to the filename so calls in the same minute between the same numbers do not collide"""
+    path = recording_path(directory, user, recording)
+    return path[: -len(".mp3")] + "-" + recording["id"] + ".mp3"
+
+
+class _RangeReader(io.RawIOBase):
+    """Read-only file object over 'size' bytes of a file starting at 'offset'"""
+
+    def __init__(self, path: str, offset: int, size: int):
+        self._file = open(path, "rb")
+        self._file.seek(offset)
+        self._remaining = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        if self._remaining <= 0:
+            return 0
+        data = self._file.read(min(len(buffer), self._remaining))
+        buffer[: len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+    def close(self):
+        self._file.close()
+        super().close()
+
+
+class _MediaIndex:
+    """Thread safe SQLite index of media id -> (location details, size, sha256) used by the shard and content addressed backends"""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS media_index ("
+                "id TEXT PRIMARY KEY, location TEXT NOT NULL, size INTEGER, sha256 TEXT)"
+            )
+
+        self._ids = set(
+            row[0] for row in self._connection.execute("SELECT id FROM media_index")
+        )
+
+    def contains(self, media_id: str) -> bool:
+        return media_id in self._ids
+
+    def add(self, media_id: str, location: str, size: int, sha256: str):
+        with self._lock:
+            with self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO media_index (id, location, size, sha256) VALUES (?, ?, ?, ?)",
+                    (media_id, location, size, sha256),
+                )
+            self._ids.add(media_id)
+
+    def lookup(self, media_id: str) -> tuple:
+        with self._lock:
+            return self._connection.execute(
+                "SELECT location, size, sha256 FROM media_index WHERE id = ?",
+                (media_id,),
+            ).fetchone()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class DirectoryStorage:
+    def __init__(self, directory: str = "recordings", path_for_recording=None):
+        """Store one file per recording, by default in <directory>/<year>/<month>/<user>/
+
+        Interrupted downloads are resumed with HTTP Range requests (see MediaDownloader).
+
+        Args:
+            directory (str, optional): top level directory. Defaults to "recordings".
+            path_for_recording (callable, optional): function(directory, user, recording) returning the path of a recording. Defaults to recording_path.
+        """
+        self._directory = directory
+        self._path_for_recording = path_for_recording or recording_path
+
+    def exists(self, user: str, recording: dict) -> bool:
+        if os.path.exists(self._path_for_recording(self._directory, user, recording)):
+            return True
+
+        if self._path_for_recording is unique_recording_path:
+            # archives downloaded before the recording id was added to the filename are not downloaded again
+            return os.path.exists(recording_path(self._directory, user, recording))
+        return False
+
+    def store(self, downloader, user: str, recording: dict) -> tuple:
+        path = self._path_for_recording(self._directory, user, recording)
+        bytes_received, size, sha256 = downloader.download_with_checksum(
+            recording["download_url"], path
+        )
+        return bytes_received, path, size, sha256
+
+    def open(self, location: str):
+        return open(location, "rb")
+
+    def checksum(self, location: str) -> tuple:
+        if not os.path.exists(location):
+            return None
+        return os.path.getsize(location), file_checksum(location)
+
+    def close(self):
+        pass
+
+
+class ShardedStorage:
+    def __init__(self, directory: str = "recordings", extension: str = ".mp3"):
+        """Append recordings to tar shards, one shard per user per day: <directory>/<yyyy-mm-dd>/<user>.tar
+
+        This keeps the number of files on disk at users x days instead of one per call.  Each shard is a valid tar
+        archive (readable with 'tar -tf'), and an index (<directory>/shards.sqlite) stores the offset of every
+        recording so it can be read back without scanning the shard.
+
+        Shards are append-only.  A recording is streamed into a staging file and then appended to its shard, header
+        and body together, appends to the same shard are serialized while different shards are written concurrently.
+        If an append fails the shard is truncated back to where the recording started.  The first time a shard is
+        used by a process, a torn member left by a crash is truncated and complete members missing from the index
+        (a crash between the append and the index update) are indexed, so they are not appended a second time.
+
+        Args:
+            directory (str, optional): top level directory. Defaults to "recordings".
+            extension (str, optional): file extension of members in the tar shards. Defaults to ".mp3".
+        """
+        self._directory = directory
+        self._extension = extension
+
+        os.makedirs(directory, exist_ok=True)
+        self._index = _MediaIndex(os.path.join(directory, "shards.sqlite"))
+
+        self._shard_locks = {}
+        self._shard_locks_lock = threading.Lock()
+        # shards checked for a torn member left by a crash, see _recover
+        self._recovered = set()
+
+    def _shard_lock(self, shard_path: str):
+        with self._shard_locks_lock:
+            return self._shard_locks.setdefault(shard_path, threading.Lock())
+
+    def _recover(self, shard_path: str) -> int:
+        """Repair a shard after a crash, returns the size of the shard
+
+        Called with the shard lock held.  The shard is scanned header by header once per process, everything after
+        the last complete member (a partial member, or a zero block where a header was never written) is removed so
+        that members appended later are readable by tar.  Complete members whose recording id (the member name) is
+        not in the index are added to it.
+        """
+        if shard_path in self._recovered:
+            return os.path.getsize(shard_path) if os.path.exists(shard_path) else 0
+
+        end = 0
+        if os.path.exists(shard_path):
+            shard_size = os.path.getsize(shard_path)
+
+            with open(shard_path, "r+b") as f:
+                while end + tarfile.BLOCKSIZE <= shard_size:
+                    f.seek(end)
+                    try:
+                        member = tarfile.TarInfo.frombuf(
+                            f.read(tarfile.BLOCKSIZE),
+                            tarfile.ENCODING,
+                            "surrogateescape",
+                        )
+                    except tarfile.HeaderError:
+                        # zero block or garbage, not the header of a complete member
+                        break
+
+                    member_end = (
+                        end
+                        + tarfile.BLOCKSIZE
+                        + member.size
+                        + (-member.size % tarfile.BLOCKSIZE)
+                    )
+                    if member_end > shard_size:
+                        break
+
+                    if member.name.endswith(self._extension):
+                        media_id = member.name[
+                            : len(member.name) - len(self._extension)
+                        ]
+                        if not self._index.contains(media_id):
+                            self._index_member(
+                                f, shard_path, media_id, end, member.size
+                            )
+                    end = member_end
+
+                if end < shard_size:
+                    f.truncate(end)
+
+        self._recovered.add(shard_path)
+        return end
+
+    def _index_member(self, f, shard_path: str, media_id: str, start: int, size: int):
+        # index a complete member found by _recover, hashing its body like store() does
+        offset = start + tarfile.BLOCKSIZE
+        hasher = hashlib.sha256()
+        f.seek(offset)
+        remaining = size
+        while remaining:
+            block = f.read(min(remaining, 1024 * 1024))
+            hasher.update(block)
+            remaining -= len(block)
+
+        self._index.add(
+            media_id, f"{shard_path}#{offset}+{size}", size, hasher.hexdigest()
+        )
+
+    def shard_path(self, user: str, recording: dict) -> str:
+        return os.path.join(self._directory, recording["date_time"][:10], user + ".tar")
+
+    def exists(self, user: str, recording: dict) -> bool:
+        if self._index.contains(recording["id"]):
+            return True
+
+        shard_path = self.shard_path(user, recording)
+        with self._shard_lock(shard_path):
+            self._recover(shard_path)
+        return self._index.contains(recording["id"])
+
+    def store(self, downloader, user: str, recording: dict) -> tuple:
+        shard_path = self.shard_path(user, recording)
+        os.makedirs(os.path.dirname(shard_path), exist_ok=True)
+
+        member = tarfile.TarInfo(name=recording["id"] + self._extension)
+        member.mtime = int(
+            datetime.datetime.strptime(recording["date_time"], "%Y-%m-%dT%H:%M:%SZ")
+            .replace(tzinfo=datetime.timezone.utc)
+            .timestamp()
+        )
+
+        # download into a staging file next to the shard, outside the shard lock, so a shard only ever receives a
+        # complete member (header and body written together)
+        staging_path = f"{shard_path}.{uuid.uuid4().hex}.part"
+        hasher = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(staging_path, "wb") as staging:
+                for chunk in downloader.stream(recording["download_url"]):
+                    staging.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+
+            member.size = size
+            header = member.tobuf(format=tarfile.USTAR_FORMAT)
+
+            with self._shard_lock(shard_path):
+                start = self._recover(shard_path)
+
+                entry = self._index.lookup(recording["id"])
+                if entry is not None:
+                    # appended before a crash and indexed by _recover, not appended again
+                    location, size, sha256 = entry
+                    return size, location, size, sha256
+
+                with open(shard_path, "ab") as f:
+                    try:
+                        f.write(header)
+                        with open(staging_path, "rb") as staging:
+                            shutil.copyfileobj(staging, f, 1024 * 1024)
+
+                        # tar members are padded to a multiple of the block size
+                        f.write(b"\0" * (-size % tarfile.BLOCKSIZE))
+
+                        f.flush()
+                        os.fsync(f.fileno())
+
+                    except BaseException:
+                        # remove the partial member so the shard stays a valid tar archive
+                        f.truncate(start)
+                        raise
+        finally:
+            if os.path.exists(staging_path):
+                os.remove(staging_path)
+
+        offset = start + len(header)
+        location = f"{shard_path}#{offset}+{size}"
+        sha256 = hasher.hexdigest()
+
+        self._index.add(recording["id"], location, size, sha256)
+
+        return size, location, size, sha256
+
+    def _parse_location(self, location: str) -> tuple:
+        shard_path, _, span = location.rpartition("#")
+        offset, _, size = span.partition("+")
+        return shard_path, int(offset), int(size)
+
+    def location(self, recording_id: str) -> str:
+        """Return the location of a stored recording id, or None"""
+        entry = self._index.lookup(recording_id)
+        return entry[0] if entry else None
+
+    def open(self, location: str):
+        shard_path, offset, size = self._parse_location(location)
+        return io.BufferedReader(_RangeReader(shard_path, offset, size))
+
+    def checksum(self, location: str) -> tuple:
+        shard_path, offset, size = self._parse_location(location)
+
+        if (
+            not os.path.exists(shard_path)
+            or os.path.getsize(shard_path) < offset + size
+        ):
+            return None
+
+        hasher = hashlib.sha256()
+        with self.open(location) as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                hasher.update(block)
+
+        return size, hasher.hexdigest()
+
+    def close(self):
+        self._index.close()
+
+
+class ContentAddressedStorage:
+    def __init__(self, directory: str = "recordings", extension: str = ".mp3"):
+        """Store media by SHA-256 checksum: <directory>/objects/<first 2 hex chars>/<sha256>.mp3
+
+        Identical media (e.g. the same recording listed for several users, or re-uploaded media) is stored once.
+        Media is streamed to a temporary file while it is hashed, then renamed into place, or discarded if an object
+        with the same checksum already exists.  An index (<directory>/objects.sqlite) maps recording ids to objects.
+
+        Args:
+            directory (str, optional): top level directory. Defaults to "recordings".
+            extension (str, optional): file extension of stored objects. Defaults to ".mp3".
+        """
+        self._directory = directory
+        self._extension = extension
+        self._temporary_directory = os.path.join(directory, "tmp")
+
+        os.makedirs(self._temporary_directory, exist_ok=True)
+        self._index = _MediaIndex(os.path.join(directory, "objects.sqlite"))
+
+    def object_path(self, sha256: str) -> str:
+        return os.path.join(
+            self._directory, "objects", sha256[:2], sha256 + self._extension
+        )
+
+    def exists(self, user: str, recording: dict) -> bool:
+        return self._index.contains(recording["id"])
+
+    def store(self, downloader, user: str, recording: dict) -> tuple:
+        temporary_path = os.path.join(
+            self._temporary_directory, uuid.uuid4().hex + ".part"
+        )
+
+        hasher = hashlib.sha256()
+        size = 0
+
+        try:
+            with open(temporary_path, "wb") as f:
+                for chunk in downloader.stream(recording["download_url"]):
+                    f.write(chunk)
+                    hasher.update(chunk)
+                    size += len(chunk)
+
+                f.flush()
+                os.fsync(f.fileno())
+
+            sha256 = hasher.hexdigest()
+            path = self.object_path(sha256)
+
+            if os.path.exists(path):
+                # duplicate media, keep the existing object
+                os.remove(temporary_path)
+            else:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                os.replace(temporary_path, path)
+
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+        self._index.add(recording["id"], path, size, sha256)
+
+        return size, path, size, sha256
+
+    def location(self, recording_id: str) -> str:
+        """Return the location of a stored recording id, or None"""
+        entry = self._index.lookup(recording_id)
+        return entry[0] if entry else None
+
+    def open(self, location: str):
+        return open(location, "rb")
+
+    def checksum(self, location: str) -> tuple:
+        if not os.path.exists(location):
+            return None
+        return os.path.getsize(location), file_checksum(location)
+
+    def close(self):
+        self._index.close()
+
+
+def open_storage(storage: str, directory: str):
+    """Return the storage backend named by the '-storage' option of the download scripts
+
+    Args:
+        storage (str): 'directory' for one file per recording, 'shards' for one tar file per user per day or 'cas' to store files by checksum.
+        directory (str): top level directory, e.g. "recordings" or "voicemails".
+    """
+    if storage == "shards":
+        return ShardedStorage(directory)
+    elif storage == "cas":
+        return ContentAddressedStorage(directory)
+    else:
+        # the recording id is part of the filename, calls in the same minute between the same numbers do not collide
+        return DirectoryStorage(directory, unique_recording_path)
@@ -0,0 +1,327 @@
+import time
+import threading
+import contextlib
+import concurrent.futures
+
+import requests
+
+from .retry import RetryPolicy, CircuitBreaker
+from .concurrency import AdaptiveConcurrency, rate_limit_category
+from .ratelimit import PriorityScheduler
+from .deadline import Deadline
+from .exceptions import DeadlineExceeded, QuotaExhausted
+
+# (connect, read) timeouts in seconds, the read timeout is the longest wait for the next bytes of a response
+DEFAULT_TIMEOUT = (10, 60)
+
+
+class Transport:
+    def __init__(
+        self,
+        session,
+        retry_policy: RetryPolicy = None,
+        circuit_breaker=None,
+        timeout=DEFAULT_TIMEOUT,
+        concurrency=None,
+        rate_limiter=None,
+        priority: str = "normal",
+        quota_ledger=None,
+        hedging=None,
+    ):
+        """Sends HTTP requests for Phone and Users, applying the retry policy, circuit breaker and concurrency limits
+
+        One Transport is shared by all API classes of a ZoomAPIClient, so they share the circuit breaker and the
+        concurrency limit of each rate limit category.
+
+        Args:
+            session (requests.Session): authenticated session
+            retry_policy (RetryPolicy, optional): retry rules. Defaults to RetryPolicy().
+            circuit_breaker (CircuitBreaker, optional): circuit breaker, pass False to disable. Defaults to CircuitBreaker().
+            timeout (float or tuple, optional): requests timeout of every request, seconds or (connect, read) seconds. Defaults to DEFAULT_TIMEOUT.
+            concurrency (AdaptiveConcurrency, optional): limits of requests in flight per rate limit category, pass False to disable. Defaults to AdaptiveConcurrency().
+            rate_limiter (optional): TokenBucket or SharedTokenBucket from simple_zoomphone.ratelimit that every attempt takes a token from, rate limited responses pause it.  Tokens are handed out by a PriorityScheduler, pass a PriorityScheduler to change its weights. Defaults to None.
+            priority (str, optional): priority of requests sent outside a priority() block, 'interactive', 'normal' or 'bulk'. Defaults to "normal".
+            quota_ledger (QuotaLedger, optional): ledger counting requests per rate limit category per day, requests in a category whose daily quota is used up fail with QuotaExhausted without being sent. Defaults to None.
+            hedging (HedgingPolicy, optional): send a second copy of slow GET requests and use the first response, see simple_zoomphone.hedging. Defaults to None (no hedging).
+        """
+        self._session = session
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.circuit_breaker = (
+            CircuitBreaker() if circuit_breaker is None else circuit_breaker
+        )
+        self.timeout = timeout
+        if isinstance(rate_limiter, PriorityScheduler):
+            self.scheduler = rate_limiter
+            rate_limiter = rate_limiter.rate_limiter
+        else:
+            self.scheduler = (
+                PriorityScheduler(rate_limiter) if rate_limiter is not None else None
+            )
+        self.rate_limiter = rate_limiter
+        self.default_priority = priority
+        self.quota_ledger = quota_ledger
+        self.hedging = hedging
+        self._hedge_executor = None
+        self._hedge_executor_lock = threading.Lock()
+        self._local = threading.local()
+        self.concurrency = AdaptiveConcurrency() if concurrency is None else concurrency
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        ok_statuses: tuple = (200,),
+        idempotent: bool = None,
+        deadline=None,
+        priority: str = None,
+        **kwargs,
+    ):
+        """Send a request, retrying failures allowed by the retry policy
+
+        Args:
+            method (str): HTTP method, e.g. 'GET'
+            url (str): request url
+            ok_statuses (tuple, optional): status codes that are a success. Defaults to (200,).
+            idempotent (bool, optional): whether the request may be repeated. Defaults to None (decided by the method).
+            deadline (Deadline, optional): deadline of the whole operation this request belongs to, request timeouts and retries are limited to the time remaining. Defaults to None.
+            priority (str, optional): scheduling priority for the rate budget. Defaults to None (the current priority() block or the transport's default priority).
+            **kwargs: passed to the session, e.g. params, data or stream
+
+        Raises:
+            CircuitOpenError: If the circuit breaker is open
+            QuotaExhausted: If the daily quota of the request's rate limit category is used up
+            DeadlineExceeded: If the deadline has passed before the request could be sent
+            requests.exceptions.RequestException: If the request failed with an exception that was not retried, or on the last attempt
+
+        Returns:
+            requests.Response: the first successful response, or the last response if it was not retried (non retryable status, attempts exhausted or deadline reached)
+        """
+        policy = self.retry_policy
+        if priority is None:
+            priority = getattr(self._local, "priority", None) or self.default_priority
+        if idempotent is None:
+            idempotent = policy.is_idempotent(method)
+
+        # the retry policy deadline applies to this request, 'deadline' to the whole operation, the earliest wins
+        deadlines = [
+            d
+            for d in (Deadline.coerce(deadline), Deadline.coerce(policy.deadline))
+            if d is not None
+        ]
+        deadline = min(deadlines, key=lambda d: d.expires_at) if deadlines else None
+
+        send = getattr(self._session, method.lower())
+        category = rate_limit_category(method, url)
+        limiter = self.concurrency.limiter(category) if self.concurrency else None
+        timeout = kwargs.pop("timeout", self.timeout)
+        # streamed responses are read by the caller after request() returns, so they cannot be raced
+        hedge = (
+            self.hedging is not None
+            and method.upper() == "GET"
+            and idempotent
+            and not kwargs.get("stream")
+        )
+        delay = policy.base_delay
+        attempt = 0
+
+        while True:
+            attempt += 1
+
+            if deadline is not None:
+                if deadline.expired:
+                    raise DeadlineExceeded(f"Deadline exceeded before request {url}")
+                kwargs["timeout"] = deadline.cap_timeout(timeout)
+            elif timeout is not None:
+                kwargs["timeout"] = timeout
+
+            if self.circuit_breaker:
+                # fail fast before spending quota and budget, the half-open trial is only taken right before sending
+                self.circuit_breaker.before_request(url, claim_trial=False)
+
+            if self.quota_ledger is not None:
+                # counted before sending, Zoom counts attempts that fail too
+                self.quota_ledger.take(category)
+
+            self._take_budget(priority, deadline)
+            started = self._acquire(limiter, deadline)
+            trial = False
+            try:
+                if self.circuit_breaker:
+                    trial = self.circuit_breaker.before_request(url)
+                response = self._send(send, url, kwargs, category, priority, hedge)
+            except policy.retry_exceptions as e:
+                self._release(
+                    limiter,
+                    started,
+                    throttled=isinstance(e, requests.exceptions.Timeout),
+                    failed=True,
+                )
+                self._record(failure=True)
+                if attempt >= policy.max_attempts or not policy.retry_exception(
+                    e, idempotent
+                ):
+                    raise
+                response = None
+                error = e
+                retry_after = None
+            except BaseException:
+                self._release(limiter, started, failed=True)
+                if trial:
+                    # no outcome is recorded on this path, give the trial back so the next request can take it
+                    self.circuit_breaker.release_trial()
+                raise
+            else:
+                self._release(
+                    limiter,
+                    started,
+                    throttled=response.status_code == 429,
+                    failed=response.status_code >= 500,
+                )
+                self._record(failure=response.status_code >= 500)
+                if (
+                    response.status_code in ok_statuses
+                    or attempt >= policy.max_attempts
+                    or not policy.retry_status(response.status_code, idempotent)
+                ):
+                    return response
+
+                retry_after = policy.retry_after(response)
+                if retry_after is not None and retry_after > policy.max_retry_after:
+                    # e.g. the daily rate limit, waiting is not worthwhile
+                    if response.status_code == 429 and self.quota_ledger is not None:
+                        self.quota_ledger.mark_exhausted(category)
+                    return response
+
+            delay = policy.backoff(delay)
+            wait = max(delay, retry_after or 0)
+
+            if deadline is not None and wait > deadline.remaining():
+                if response is None:
+                    raise error
+                return response
+
+            if response is not None:
+                if response.status_code == 429 and self.rate_limiter is not None:
+                    # other threads and processes sharing the budget wait too instead of each hitting the limit
+                    self.rate_limiter.pause(wait)
+                response.close()
+
+            time.sleep(wait)
+
+    def _send(self, send, url, kwargs, category, priority, hedge):
+        if not hedge:
+            return send(url, **kwargs)
+
+        hedging = self.hedging
+        hedging.request_started()
+        delay = hedging.delay(category)
+
+        if delay is None:
+            # not enough latency samples in this category yet
+            return self._timed_send(send, url, kwargs, category)
+
+        executor = self._executor()
+        primary = executor.submit(self._timed_send, send, url, kwargs, category)
+
+        done, pending = concurrent.futures.wait([primary], timeout=delay)
+        if done or not self._take_hedge_budget(category, priority):
+            return primary.result()
+
+        secondary = executor.submit(self._timed_send, send, url, kwargs, category)
+        pending = {primary, secondary}
+
+        while pending:
+            done, pending = concurrent.futures.wait(
+                pending, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for future in done:
+                if future.exception() is None:
+                    # the slower copy is closed when it completes
+                    for other in pending | (done - {future}):
+                        other.add_done_callback(_close_response)
+                    if future is secondary:
+                        hedging.hedge_won()
+                    return future.result()
+
+        # both copies failed, report the error of the original request
+        return primary.result()
+
+    def _timed_send(self, send, url, kwargs, category):
+        started = time.monotonic()
+        response = send(url, **kwargs)
+        self.hedging.record(category, time.monotonic() - started)
+        return response
+
+    def _take_hedge_budget(self, category, priority) -> bool:
+        # a hedge is only sent if it fits the hedge fraction, the daily quota allows it and the scheduler has a token
+        # free right now without touching the reserves of higher priorities, the hedge credit is given back otherwise
+        if not self.hedging.try_spend():
+            return False
+
+        if self.quota_ledger is not None and self.quota_ledger.remaining(category) == 0:
+            self.hedging.refund()
+            return False
+
+        if self.scheduler is not None and not self.scheduler.try_acquire(priority):
+            self.hedging.refund()
+            return False
+
+        if self.quota_ledger is not None:
+            try:
+                self.quota_ledger.take(category)
+            except QuotaExhausted:
+                # used up by another process since the check above, the rate token is lost
+                self.hedging.refund()
+                return False
+        return True
+
+    def _executor(self):
+        with self._hedge_executor_lock:
+            if self._hedge_executor is None:
+                self._hedge_executor = concurrent.futures.ThreadPoolExecutor(
+                    max_workers=self.hedging.max_workers,
+                    thread_name_prefix="zoom-hedge",
+                )
+            return self._hedge_executor
+
+    @contextlib.contextmanager
+    def priority(self, priority: str):
+        """Send the requests made by this thread inside the block with this priority
+
+        Example:
+            with zoomapi._transport.priority("interactive"):
+                zoomapi.phone.assign_number_to_user(userId, phone_number_id)
+        """
+        previous = getattr(self._local, "priority", None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def _take_budget(self, priority, deadline):
+        if self.scheduler is not None:
+            self.scheduler.acquire(priority, deadline)
+
+    def _acquire(self, limiter, deadline):
+        if limiter is None:
+            return None
+        return limiter.acquire(None if deadline is None else deadline.remaining())
+
+    def _release(self, limiter, started, throttled=False, failed=False):
+        if limiter is not None:
+            limiter.release(
+                started, throttled=throttled, failed=failed and not throttled
+            )
+
+    def _record(self, failure: bool):
+        if self.circuit_breaker:
+            if failure:
+                self.circuit_breaker.record_failure()
+            else:
+                self.circuit_breaker.record_success()
+
+
+def _close_response(future):
+    if future.exception() is None:
+        future.result().close()
@@ -2,11 +2,13 @@ import json
 
 from .util import validateparam
 from .exceptions import ZoomAPIError
+from .transport import Transport
 
 
 class Users:
-    def __init__(self, session, server):
+    def __init__(self, session, server, transport: Transport = None):
         self._session = session
+        self._transport = transport or Transport(session)
         self._server = server
 
     def _users_get(
@@ -39,28 +41,16 @@ class Users:
 
         url = "https://" + self._server + endpoint_url
 
-        # use while loop to handle Zoom Phone API rate limits
-        rate_limit_counter = 0
-        while True:
-            response = self._session.get(url, params=params)
+        # failed requests and rate limits are retried by the transport according to its retry policy
+        response = self._transport.request("GET", url, params=params)
 
-            if response.status_code == 200:
-                break
+        if response.status_code == 429:
+            raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
 
-            elif response.status_code == 429:
-                # API returned that we are rate limited, wait one second and try again
-
-                if rate_limit_counter > 5:
-                    # we shouldn't get rate limited more than 5 times on a single query, but if we do error with exception
-                    raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
-                else:
-                    rate_limit_counter += 1  # increase rate limit counter
-                    time.sleep(1)  # sleep for a second, then try again
-                   
-            else:
-                raise ZoomAPIError(
-                    f"Received status code {response.status_code} on request {url}"
-                )
+        elif response.status_code != 200:
+            raise ZoomAPIError(
+                f"Received status code {response.status_code} on request {url}"
+            )
 
         raw_json = response.json()
 
@@ -110,32 +100,25 @@ class Users:
 
         url = "https://" + self._server + endpoint_url
 
-        # use while loop to handle Zoom Phone API rate limits
-        rate_limit_counter = 0
-        while True:
-            response = self._session.patch(url, params=params, data=json.dumps(data))
-
-            if response.status_code in [200, 204]:
-                # pass requests response to calling method for further request validation
-                return response
+        # failed requests and rate limits are retried by the transport
+        response = self._transport.request(
+            "PATCH", url, ok_statuses=(200, 204), params=params, data=json.dumps(data)
+        )
 
-            elif response.status_code == 429:
-                # API returned that we are rate limited, wait one second and try again
+        if response.status_code in [200, 204]:
+            # pass requests response to calling method for further request validation
+            return response
 
-                if rate_limit_counter > 5:
-                    # we shouldn't get rate limited more than 5 times on a single query, but if we do error with exception
-                    raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
-                else:
-                    rate_limit_counter += 1  # increase rate limit counter
-                    time.sleep(1)  # sleep for a second, then try again
+        elif response.status_code == 429:
+            raise ZoomAPIError(f"Exceeded rate limit requests on request {url}")
 
+        else:
+            if "message" in response.json():
+                raise ZoomAPIError(response.json()["message"])
             else:
-                if "message" in response.json():
-                    raise ZoomAPIError(response.json()["message"])
-                else:
-                    raise ZoomAPIError(
-                        f"Received status code {response.status_code} on request {url}"
-                    )
+                raise ZoomAPIError(
+                    f"Received status code {response.status_code} on request {url}"
+                )
 
     def list_users(
         self,
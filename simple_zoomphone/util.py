@@ -1,6 +1,8 @@
 import requests
 import jwt
+import queue
 import datetime
+import threading
 
 
 def validateparam(parameter, valid_values, error_to_raise):
@@ -9,6 +11,82 @@ def validateparam(parameter, valid_values, error_to_raise):
             raise ValueError(error_to_raise)
 
 
+def parse_zoom_datetime(value: str) -> datetime.datetime:
+    """Parse a Zoom API timestamp (e.g. '2020-08-21T22:17:05Z') into a timezone aware UTC datetime.
+
+    Args:
+        value (str): timestamp string as returned by the Zoom API
+
+    Returns:
+        datetime.datetime: UTC datetime, or None if value is empty
+    """
+    if not value:
+        return None
+
+    return datetime.datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ").replace(
+        tzinfo=datetime.timezone.utc
+    )
+
+
+# marks the end of a prefetched iterator
+_PREFETCH_DONE = object()
+
+
+def prefetch(iterable, depth: int = 1):
+    """Iterate 'iterable' in a background thread, keeping up to 'depth' items ready ahead of the consumer
+
+    Used to fetch the next page of an API response while the caller processes the current one.  At most 'depth'
+    items are buffered, the background thread blocks until the consumer catches up.  Exceptions raised by the
+    iterable are re-raised in the consumer.  If the consumer stops early (or the generator is closed) the background
+    thread stops after its current item.
+
+    Args:
+        iterable (iterable): e.g. a generator of pages returned by a paged Phone method
+        depth (int, optional): number of items fetched ahead. Defaults to 1.
+
+    Yields:
+        items of 'iterable' in order
+    """
+    if depth < 1:
+        raise ValueError("'depth' must be at least 1")
+
+    items = queue.Queue(maxsize=depth)
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # block while the buffer is full, unless the consumer has gone away
+        while not stopped.is_set():
+            try:
+                items.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put((item, None)):
+                    return
+            put((_PREFETCH_DONE, None))
+        except BaseException as e:
+            put((_PREFETCH_DONE, e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+
+    try:
+        while True:
+            item, error = items.get()
+            if item is _PREFETCH_DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stopped.set()
+
+
 class JWT_AUTH(requests.auth.AuthBase):
     def __init__(
         self,
@@ -18,31 +96,36 @@ class JWT_AUTH(requests.auth.AuthBase):
 
         self._API_KEY = API_KEY
         self._API_SECRET = API_SECRET
+        self._lock = threading.Lock()
         self._jwt = self.generate_new_jwt()
 
     def generate_new_jwt(self):
 
-        return jwt.encode(
+        # the token is cached until shortly before it expires, instead of being decoded and verified on every request
+        self._expires_at = datetime.datetime.utcnow() + datetime.timedelta(minutes=60)
+        self._refresh_at = self._expires_at - datetime.timedelta(minutes=5)
+
+        token = jwt.encode(
             {
                 "iss": self._API_KEY,
-                "exp": datetime.datetime.utcnow() + datetime.timedelta(minutes=60),
+                "exp": self._expires_at,
             },
             self._API_SECRET,
             algorithm="HS256",
             headers={"alg": "HS256", "typ": "JWT"},
         )
 
+        # PyJWT < 2 returns bytes
+        return token.decode("utf-8") if isinstance(token, bytes) else token
+
     def __call__(self, r):
         # This is called by requests auth
 
-        try:
-            jwt.decode(self._jwt, self._API_SECRET, algorithms=["HS256"])
-
-        except jwt.ExpiredSignatureError:
-            # JWT has expired, generate new token
-            self._jwt = self.generate_new_jwt()
+        if datetime.datetime.utcnow() >= self._refresh_at:
+            with self._lock:
+                if datetime.datetime.utcnow() >= self._refresh_at:
+                    # JWT is about to expire, generate new token
+                    self._jwt = self.generate_new_jwt()
 
-        finally:
-            jwt_auth_header = self._jwt.decode("utf-8")
-            r.headers["Authorization"] = f"Bearer {jwt_auth_header}"
-            return r
+        r.headers["Authorization"] = f"Bearer {self._jwt}"
+        return r
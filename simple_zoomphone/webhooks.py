@@ -0,0 +1,815 @@
+"""Receive Zoom Phone webhook events instead of polling.
+
+Polling call logs and recordings is the largest consumer of the rate budget.  With an event subscription in the
+Zoom app, Zoom pushes call logs and recordings as they complete:
+
+    Zoom -> WebhookServer -> EventQueue (SQLite) -> EventProcessor -> CallLogStore / recording storage
+
+WebhookServer verifies the signature of every request, answers Zoom's URL validation handshake and only writes the
+event to the durable queue before answering, so Zoom's delivery timeout is never hit and no event is lost if the
+process stops.  EventProcessor claims events in batches, upserts call logs into the same CallLogStore as the
+polling export and downloads recordings and voicemails with the same MediaDownloader, storage backends and manifest
+as RecordingPipeline.  Events that fail are retried with a backoff.
+
+Example:
+    queue = EventQueue("webhook-events.sqlite")
+    server = WebhookServer(SECRET_TOKEN, queue, host="0.0.0.0", port=8752)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    processor = EventProcessor(zoomapi, queue, call_log_store=CallLogStore("call-logs.sqlite"), manifest=manifest)
+    processor.run()
+
+EventGenerator posts signed sample events to a server for local testing.
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import uuid
+import signal
+import sqlite3
+import hashlib
+import logging
+import argparse
+import datetime
+import threading
+import http.server
+import concurrent.futures
+
+import requests
+
+from .base import ZoomAPIClient
+from .media import MediaDownloader
+from .manifest import RecordingManifest
+from .sqlite_store import CallLogStore
+from .storage import DirectoryStorage, unique_recording_path
+
+logger = logging.getLogger("zp")
+
+# event type -> (kind, key of the records in payload.object)
+EVENT_TYPES = {
+    "phone.caller_call_log_completed": ("call_logs", "call_logs"),
+    "phone.callee_call_log_completed": ("call_logs", "call_logs"),
+    "phone.recording_completed": ("recordings", "recordings"),
+    "phone.voicemail_received": ("voicemails", "voice_mails"),
+}
+
+URL_VALIDATION_EVENT = "endpoint.url_validation"
+
+# largest request body read, Zoom events are a few kilobytes
+MAX_BODY_SIZE = 1024 * 1024
+
+
+def sign(secret_token: str, timestamp: str, body: bytes) -> str:
+    """Return the x-zm-signature header value of a request body"""
+    message = b"v0:" + str(timestamp).encode() + b":" + body
+    digest = hmac.new(secret_token.encode(), message, hashlib.sha256).hexdigest()
+    return f"v0={digest}"
+
+
+def verify_signature(
+    secret_token: str,
+    timestamp: str,
+    body: bytes,
+    signature: str,
+    tolerance: float = 300,
+) -> bool:
+    """Check the x-zm-signature header of a webhook request
+
+    Args:
+        secret_token (str): secret token of the Zoom app's event subscription
+        timestamp (str): x-zm-request-timestamp header, seconds since the epoch
+        body (bytes): raw request body
+        signature (str): x-zm-signature header
+        tolerance (float, optional): maximum age of the request in seconds, older requests are rejected as replays. Defaults to 300.
+    """
+    if not timestamp or not signature:
+        return False
+
+    try:
+        age = abs(time.time() - float(timestamp))
+    except ValueError:
+        return False
+
+    if age > tolerance:
+        return False
+
+    return hmac.compare_digest(sign(secret_token, timestamp, body), signature)
+
+
+def url_validation_response(secret_token: str, plain_token: str) -> dict:
+    """Return the response body of Zoom's endpoint.url_validation request"""
+    encrypted_token = hmac.new(
+        secret_token.encode(), plain_token.encode(), hashlib.sha256
+    ).hexdigest()
+    return {"plainToken": plain_token, "encryptedToken": encrypted_token}
+
+
+class EventQueue:
+    def __init__(
+        self,
+        path: str = "webhook-events.sqlite",
+        lease: float = 300,
+        max_attempts: int = 5,
+        retry_delay: float = 30,
+    ):
+        """Durable SQLite queue of webhook events
+
+        Events are deduplicated on a hash of the request body, as Zoom delivers an event again if a response is slow.
+        A claimed event is leased: if it is not acknowledged within 'lease' seconds (e.g. the processor crashed) it is
+        claimed again, up to 'max_attempts' claims.
+
+        Args:
+            path (str, optional): path to SQLite database file, created if it does not exist. Defaults to "webhook-events.sqlite".
+            lease (float, optional): seconds a claimed event is hidden from other claims. Defaults to 300.
+            max_attempts (int, optional): attempts after which a failing event is set aside with status 'failed'. Defaults to 5.
+            retry_delay (float, optional): seconds before the first retry of a failed event, doubled on each further attempt. Defaults to 30.
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+        # autocommit mode, transactions are started explicitly with BEGIN IMMEDIATE
+        self._connection = sqlite3.connect(
+            path, timeout=30, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, body_hash TEXT UNIQUE NOT NULL, event TEXT NOT NULL, "
+            "payload TEXT NOT NULL, received REAL NOT NULL, status TEXT NOT NULL DEFAULT 'pending', "
+            "attempts INTEGER NOT NULL DEFAULT 0, available_at REAL NOT NULL, error TEXT)"
+        )
+        self._connection.execute(
+            "CREATE INDEX IF NOT EXISTS events_available ON events (status, available_at)"
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self):
+        """Events waiting to be processed"""
+        with self._lock:
+            return self._connection.execute(
+                "SELECT COUNT(*) FROM events WHERE status = 'pending'"
+            ).fetchone()[0]
+
+    def put(self, event: str, payload: dict, body: bytes = None) -> bool:
+        """Add an event, returns False if the same event was already queued
+
+        Args:
+            event (str): event type, e.g. 'phone.recording_completed'
+            payload (dict): event payload
+            body (bytes, optional): raw request body, used to detect redeliveries. Defaults to the JSON of event and payload.
+        """
+        if body is None:
+            body = json.dumps(
+                {"event": event, "payload": payload}, sort_keys=True
+            ).encode()
+        now = time.time()
+
+        with self._lock:
+            cursor = self._connection.execute(
+                "INSERT OR IGNORE INTO events (body_hash, event, payload, received, available_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (
+                    hashlib.sha256(body).hexdigest(),
+                    event,
+                    json.dumps(payload),
+                    now,
+                    now,
+                ),
+            )
+            if cursor.rowcount:
+                self._available.notify_all()
+            return bool(cursor.rowcount)
+
+    def claim(self, limit: int = 100, timeout: float = None) -> list:
+        """Lease up to 'limit' events, oldest first
+
+        Args:
+            limit (int, optional): maximum events returned. Defaults to 100.
+            timeout (float, optional): seconds to wait for an event if none is available. Defaults to None (do not wait).
+
+        Returns:
+            list: (id, event, payload) tuples, pass the ids to ack() or fail()
+        """
+        expires = None if timeout is None else time.monotonic() + timeout
+
+        with self._lock:
+            while True:
+                now = time.time()
+                self._connection.execute("BEGIN IMMEDIATE")
+                try:
+                    # events whose last lease expired without ack() or fail() are set aside like failing events
+                    self._connection.execute(
+                        "UPDATE events SET status = 'failed', error = COALESCE(error, 'lease expired') "
+                        "WHERE status = 'pending' AND available_at <= ? AND attempts >= ?",
+                        (now, self.max_attempts),
+                    )
+                    rows = self._connection.execute(
+                        "SELECT id, event, payload FROM events WHERE status = 'pending' AND available_at <= ? "
+                        "ORDER BY id LIMIT ?",
+                        (now, limit),
+                    ).fetchall()
+                    self._connection.executemany(
+                        "UPDATE events SET available_at = ?, attempts = attempts + 1 WHERE id = ?",
+                        [(now + self.lease, row[0]) for row in rows],
+                    )
+                    self._connection.execute("COMMIT")
+                except BaseException:
+                    self._connection.execute("ROLLBACK")
+                    raise
+
+                if rows or expires is None:
+                    return [(row[0], row[1], json.loads(row[2])) for row in rows]
+
+                remaining = expires - time.monotonic()
+                if remaining <= 0:
+                    return []
+                # woken by put(), leased events of other processes are picked up within a second
+                self._available.wait(min(remaining, 1))
+
+    def ack(self, ids: list):
+        """Mark events as processed"""
+        with self._lock:
+            self._connection.executemany(
+                "UPDATE events SET status = 'done', error = NULL WHERE id = ?",
+                [(event_id,) for event_id in ids],
+            )
+
+    def fail(self, event_id: int, error: Exception):
+        """Schedule a retry of an event with exponential backoff, or set it aside after 'max_attempts'"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT attempts FROM events WHERE id = ?", (event_id,)
+            ).fetchone()
+            if row is None:
+                return
+
+            attempts = row[0]
+            status = "failed" if attempts >= self.max_attempts else "pending"
+            available_at = time.time() + self.retry_delay * 2 ** (attempts - 1)
+
+            self._connection.execute(
+                "UPDATE events SET status = ?, available_at = ?, error = ? WHERE id = ?",
+                (status, available_at, str(error), event_id),
+            )
+
+    def purge(self, older_than: float = 7 * 86400) -> int:
+        """Delete processed events received more than 'older_than' seconds ago, returns the number deleted
+
+        Redeliveries are only detected while the original event is kept.
+        """
+        with self._lock:
+            return self._connection.execute(
+                "DELETE FROM events WHERE status = 'done' AND received < ?",
+                (time.time() - older_than,),
+            ).rowcount
+
+    def counts(self) -> dict:
+        """Number of events per status"""
+        with self._lock:
+            return dict(
+                self._connection.execute(
+                    "SELECT status, COUNT(*) FROM events GROUP BY status"
+                ).fetchall()
+            )
+
+
+class WebhookServer(http.server.ThreadingHTTPServer):
+    def __init__(
+        self,
+        secret_token: str,
+        queue: EventQueue,
+        host: str = "127.0.0.1",
+        port: int = 8752,
+        path: str = "/",
+        max_body_size: int = MAX_BODY_SIZE,
+    ):
+        """Receive Zoom webhook requests, verify them and add them to an EventQueue
+
+        Run it behind a TLS terminating reverse proxy, Zoom only delivers events to https urls.
+
+        Example:
+            server = WebhookServer(SECRET_TOKEN, EventQueue("webhook-events.sqlite"), host="0.0.0.0")
+            server.serve_forever()
+
+        Args:
+            secret_token (str): secret token of the Zoom app's event subscription
+            queue (EventQueue): queue the events are added to
+            host (str, optional): address to listen on. Defaults to "127.0.0.1".
+            port (int, optional): port to listen on, 0 for any free port. Defaults to 8752.
+            path (str, optional): url path of the event notification endpoint. Defaults to "/".
+            max_body_size (int, optional): requests with a larger body are answered 413 without reading it, the body is read before the signature can be checked. Defaults to 1 MB.
+        """
+        self.secret_token = secret_token
+        self.queue = queue
+        self.endpoint_path = path
+        self.max_body_size = max_body_size
+        self.received = 0
+        self.rejected = 0
+        super().__init__((host, port), _WebhookRequestHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}{self.endpoint_path}"
+
+
+class _WebhookRequestHandler(http.server.BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server
+
+        if self.path != server.endpoint_path:
+            self.send_error(404)
+            return
+
+        try:
+            length = int(self.headers["Content-Length"])
+        except (TypeError, ValueError):
+            self.send_error(400)
+            return
+
+        if length < 0:
+            self.send_error(400)
+            return
+
+        if length > server.max_body_size:
+            # the body is not read, so the connection cannot be reused
+            self.close_connection = True
+            self.send_error(413)
+            return
+
+        body = self.rfile.read(length)
+
+        if not verify_signature(
+            server.secret_token,
+            self.headers.get("x-zm-request-timestamp"),
+            body,
+            self.headers.get("x-zm-signature"),
+        ):
+            server.rejected += 1
+            self.send_error(401)
+            return
+
+        try:
+            message = json.loads(body)
+            event = message["event"]
+            payload = message.get("payload", {})
+        except (ValueError, KeyError, TypeError):
+            self.send_error(400)
+            return
+
+        if event == URL_VALIDATION_EVENT:
+            if not isinstance(payload, dict) or not isinstance(
+                payload.get("plainToken"), str
+            ):
+                self.send_error(400)
+                return
+
+            self._send_json(
+                url_validation_response(server.secret_token, payload["plainToken"])
+            )
+            return
+
+        server.queue.put(event, payload, body)
+        server.received += 1
+        self._send_json({})
+
+    def _send_json(self, body: dict):
+        body = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class EventProcessor:
+    def __init__(
+        self,
+        zoomapi: ZoomAPIClient,
+        queue: EventQueue,
+        call_log_store: CallLogStore = None,
+        storage=None,
+        manifest: RecordingManifest = None,
+        voicemail_storage=None,
+        voicemail_manifest: RecordingManifest = None,
+        batch_size: int = 100,
+        batch_wait: float = 2,
+        download_workers: int = 4,
+        directory_ttl: float = 3600,
+    ):
+        """Process queued webhook events in batches with the sinks of the polling exports
+
+        Call logs of a batch get the dept and job_title of their owner like call_logs.py and are upserted in one
+        transaction.  Recordings and voicemails of a batch are downloaded concurrently and skipped if their id is
+        already in the manifest, so an event that duplicates a polled recording costs nothing.  Media is stored under
+        the owner's email like the polling export, the ids in events are resolved with one list of phone users cached
+        for 'directory_ttl' seconds.
+
+        Args:
+            zoomapi (ZoomAPIClient): API client, used to download media and list phone users
+            queue (EventQueue): queue filled by WebhookServer
+            call_log_store (CallLogStore, optional): store for call log events. Defaults to None (call log events are acknowledged and dropped).
+            storage (optional): storage backend for recordings, see simple_zoomphone.storage. Defaults to DirectoryStorage("recordings", unique_recording_path).
+            manifest (RecordingManifest, optional): manifest of downloaded recordings. Defaults to None.
+            voicemail_storage (optional): storage backend for voicemails. Defaults to DirectoryStorage("voicemails", unique_recording_path).
+            voicemail_manifest (RecordingManifest, optional): manifest of downloaded voicemails. Defaults to None.
+            batch_size (int, optional): maximum events processed together. Defaults to 100.
+            batch_wait (float, optional): seconds to wait for a batch to fill once the first event has arrived. Defaults to 2.
+            download_workers (int, optional): concurrent media downloads. Defaults to 4.
+            directory_ttl (float, optional): seconds the list of phone users is cached. Defaults to 3600.
+        """
+        self._zoomapi = zoomapi
+        self._queue = queue
+        self._call_log_store = call_log_store
+        self._media = {
+            "recordings": (
+                storage or DirectoryStorage("recordings", unique_recording_path),
+                manifest,
+            ),
+            "voicemails": (
+                voicemail_storage
+                or DirectoryStorage("voicemails", unique_recording_path),
+                voicemail_manifest,
+            ),
+        }
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.download_workers = download_workers
+        self.directory_ttl = directory_ttl
+
+        self._downloader = MediaDownloader(
+            zoomapi._session, transport=getattr(zoomapi, "_transport", None)
+        )
+        self._emails = {}
+        self._departments = {}
+        self._job_titles = {}
+        self._emails_expires = 0
+        self._emails_lock = threading.Lock()
+        self._stop = threading.Event()
+
+        self.events_processed = 0
+        self.events_failed = 0
+        self.call_logs_written = 0
+        self.media_downloaded = 0
+        self.media_skipped = 0
+
+    def _email(self, user_id: str) -> str:
+        # phone user id (or email) -> email, the list of users is only fetched again for an unknown id after the TTL
+        with self._emails_lock:
+            if user_id not in self._emails and time.monotonic() >= self._emails_expires:
+                self._emails = {}
+                for user in self._zoomapi.phone.list_users():
+                    self._emails[user["id"]] = user["email"]
+                    self._emails[user["email"]] = user["email"]
+                self._departments = {}
+                self._job_titles = {}
+                self._emails_expires = time.monotonic() + self.directory_ttl
+            return self._emails.get(user_id, user_id)
+
+    def _enrich(self, record: dict) -> dict:
+        # add dept and job_title like call_logs.py, the upsert would otherwise overwrite them with NULL
+        email = record.get("email")
+        if not email:
+            return record
+
+        with self._emails_lock:
+            if not self._departments:
+                for user in self._zoomapi.users.list_users():
+                    self._departments[user["email"].lower()] = user.get("dept", "")
+            dept = self._departments.get(email.lower())
+
+            if email.lower() not in self._job_titles:
+                # job title is not provided in the list users API call, so each user is queried once per TTL
+                user = self._zoomapi.users.get_user(userId=email)
+                self._job_titles[email.lower()] = user.get("job_title", "")
+            job_title = self._job_titles[email.lower()]
+
+        return dict(record, dept=dept, job_title=job_title)
+
+    def _records(self, kind: str, key: str, payload: dict) -> list:
+        # records of an event with the email of their owner, in the form returned by the polling API
+        event_object = payload.get("object", {})
+        records = event_object.get(key)
+        if records is None:
+            # events carrying a single record
+            records = [event_object]
+
+        owner_id = event_object.get("user_id") or event_object.get("email")
+        result = []
+        for record in records:
+            record_owner = record.get("owner") or {}
+            user = owner_id or record.get("user_id") or record_owner.get("id")
+            email = self._email(user) if user else None
+            result.append((email, dict(record, email=email) if email else record))
+        return result
+
+    def _download(self, kind: str, user: str, record: dict) -> bool:
+        storage, manifest = self._media[kind]
+        if manifest is not None and manifest.contains(record["id"]):
+            return False
+
+        bytes_received, location, size, sha256 = storage.store(
+            self._downloader, user or "unknown", record
+        )
+        if manifest is not None:
+            manifest.add(record["id"], location, size, sha256)
+        return True
+
+    def process_batch(self, events: list):
+        """Process claimed (id, event, payload) tuples, acknowledging the events that succeeded"""
+        call_logs = []
+        call_log_events = []
+        downloads = []
+        done = []
+
+        for event_id, event, payload in events:
+            kind, key = EVENT_TYPES.get(event, (None, None))
+            if kind is None:
+                # not an event this processor handles
+                done.append(event_id)
+                continue
+
+            try:
+                records = self._records(kind, key, payload)
+                if kind == "call_logs":
+                    records = [
+                        (email, self._enrich(record)) for email, record in records
+                    ]
+            except Exception as e:
+                self._fail(event_id, e)
+                continue
+
+            if kind == "call_logs":
+                call_log_events.append(event_id)
+                call_logs.extend(record for email, record in records)
+            else:
+                downloads.append((event_id, kind, records))
+
+        if call_log_events:
+            try:
+                if self._call_log_store is not None:
+                    self._call_log_store.insert_records(call_logs)
+                    self._call_log_store.flush()
+                    self.call_logs_written += len(call_logs)
+                done.extend(call_log_events)
+            except Exception as e:
+                for event_id in call_log_events:
+                    self._fail(event_id, e)
+
+        if downloads:
+            with concurrent.futures.ThreadPoolExecutor(
+                max_workers=self.download_workers
+            ) as executor:
+                # a redelivered event in the same batch shares the download of the first, not a second copy
+                submitted = {}
+                futures = {}
+                for event_id, kind, records in downloads:
+                    futures[event_id] = []
+                    for user, record in records:
+                        key = (kind, record["id"])
+                        if key in submitted:
+                            futures[event_id].append(submitted[key])
+                            continue
+                        submitted[key] = executor.submit(
+                            self._download, kind, user, record
+                        )
+                        futures[event_id].append(submitted[key])
+
+            for future in submitted.values():
+                if future.exception() is None:
+                    if future.result():
+                        self.media_downloaded += 1
+                    else:
+                        self.media_skipped += 1
+
+            for event_id, event_futures in futures.items():
+                try:
+                    for future in event_futures:
+                        future.result()
+                    done.append(event_id)
+                except Exception as e:
+                    self._fail(event_id, e)
+
+        self._queue.ack(done)
+        self.events_processed += len(done)
+
+    def _fail(self, event_id: int, error: Exception):
+        logger.info(f"Webhook event {event_id} failed: {error}")
+        self.events_failed += 1
+        self._queue.fail(event_id, error)
+
+    def run_once(self, timeout: float = None) -> int:
+        """Claim and process one batch, waiting up to 'timeout' seconds for the first event, returns the events claimed"""
+        events = self._queue.claim(self.batch_size, timeout=timeout)
+        if not events:
+            return 0
+
+        if len(events) < self.batch_size and self.batch_wait:
+            # let the batch fill, call logs of one batch are written in a single transaction
+            time.sleep(self.batch_wait)
+            events += self._queue.claim(self.batch_size - len(events))
+
+        self.process_batch(events)
+        return len(events)
+
+    def run(self):
+        """Process events until stop() is called"""
+        while not self._stop.is_set():
+            self.run_once(timeout=1)
+
+    def stop(self):
+        self._stop.set()
+
+    def as_dict(self) -> dict:
+        return {
+            "events_processed": self.events_processed,
+            "events_failed": self.events_failed,
+            "call_logs_written": self.call_logs_written,
+            "media_downloaded": self.media_downloaded,
+            "media_skipped": self.media_skipped,
+            "queue": self._queue.counts(),
+        }
+
+
+class EventGenerator:
+    def __init__(self, url: str, secret_token: str, session: requests.Session = None):
+        """Post signed sample Zoom Phone events to a webhook endpoint, for local testing
+
+        Example:
+            generator = EventGenerator(server.url, SECRET_TOKEN)
+            generator.url_validation()
+            generator.call_log_completed("user@domain.com")
+            generator.recording_completed("user@domain.com", download_url="http://127.0.0.1:8000/recording.mp3")
+
+        Args:
+            url (str): url of the WebhookServer
+            secret_token (str): secret token the server verifies signatures with
+            session (requests.Session, optional): session to post with. Defaults to a new session.
+        """
+        self.url = url
+        self.secret_token = secret_token
+        self._session = session or requests.Session()
+
+    def send(self, event: str, payload: dict) -> requests.Response:
+        body = json.dumps(
+            {"event": event, "event_ts": int(time.time() * 1000), "payload": payload}
+        ).encode()
+        timestamp = str(int(time.time()))
+        return self._session.post(
+            self.url,
+            data=body,
+            headers={
+                "Content-Type": "application/json",
+                "x-zm-request-timestamp": timestamp,
+                "x-zm-signature": sign(self.secret_token, timestamp, body),
+            },
+            timeout=10,
+        )
+
+    def url_validation(self) -> dict:
+        """Send the URL validation handshake and return the server's response"""
+        return self.send(URL_VALIDATION_EVENT, {"plainToken": uuid.uuid4().hex}).json()
+
+    def call_log_completed(self, user: str, direction: str = "outbound", **fields):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        call_log = {
+            "id": uuid.uuid4().hex,
+            "caller_number": "+16505551212",
+            "callee_number": "+14155550100",
+            "direction": direction,
+            "duration": 60,
+            "result": "Call connected",
+            "date_time": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            **fields,
+        }
+        event = (
+            "phone.caller_call_log_completed"
+            if direction == "outbound"
+            else "phone.callee_call_log_completed"
+        )
+        return self.send(event, {"object": {"user_id": user, "call_logs": [call_log]}})
+
+    def recording_completed(self, user: str, download_url: str, **fields):
+        now = datetime.datetime.now(datetime.timezone.utc)
+        recording = {
+            "id": uuid.uuid4().hex,
+            "caller_number": "+16505551212",
+            "callee_number": "+14155550100",
+            "date_time": now.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "duration": 60,
+            "download_url": download_url,
+            **fields,
+        }
+        return self.send(
+            "phone.recording_completed",
+            {"object": {"user_id": user, "recordings": [recording]}},
+        )
+
+
+def main(argv: list = None):
+    """Entry point of the 'zoomphone-webhooks' command"""
+    parser = argparse.ArgumentParser(
+        prog="zoomphone-webhooks",
+        description="Receive Zoom Phone call log, recording and voicemail events and export them like the polling scripts.",
+    )
+    parser.add_argument(
+        "-API_KEY", type=str, help="API key for Zoom account.", required=True
+    )
+    parser.add_argument(
+        "-API_SECRET", type=str, help="API secret for Zoom account.", required=True
+    )
+    parser.add_argument(
+        "-secret_token",
+        type=str,
+        default=os.environ.get("ZOOM_WEBHOOK_SECRET_TOKEN"),
+        help="Secret token of the app's event subscription. Defaults to the ZOOM_WEBHOOK_SECRET_TOKEN environment variable.",
+    )
+    parser.add_argument(
+        "-host", type=str, default="127.0.0.1", help="Address to listen on."
+    )
+    parser.add_argument("-port", type=int, default=8752, help="Port to listen on.")
+    parser.add_argument(
+        "-queue",
+        type=str,
+        default="webhook-events.sqlite",
+        help="SQLite file queueing received events.",
+    )
+    parser.add_argument(
+        "-call_log_store",
+        type=str,
+        default="call-logs.sqlite",
+        help="SQLite file call logs are upserted into, as with call_logs.py -output_format sqlite.",
+    )
+    args = parser.parse_args(argv)
+
+    if not args.secret_token:
+        parser.error("-secret_token or ZOOM_WEBHOOK_SECRET_TOKEN is required")
+
+    logger.setLevel(logging.INFO)
+    if not logger.handlers:
+        ch = logging.StreamHandler()
+        ch.setLevel(logging.INFO)
+        logger.addHandler(ch)
+
+    zoomapi = ZoomAPIClient(args.API_KEY, args.API_SECRET, priority="bulk")
+    queue = EventQueue(args.queue)
+
+    with RecordingManifest(
+        os.path.join("recordings", "manifest.sqlite")
+    ) as manifest, RecordingManifest(
+        os.path.join("voicemails", "manifest.sqlite")
+    ) as voicemail_manifest, CallLogStore(
+        args.call_log_store
+    ) as call_log_store:
+        processor = EventProcessor(
+            zoomapi,
+            queue,
+            call_log_store=call_log_store,
+            manifest=manifest,
+            voicemail_manifest=voicemail_manifest,
+        )
+
+        server = WebhookServer(args.secret_token, queue, args.host, args.port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        logger.info(f"Receiving webhook events on {server.url}")
+
+        # finish the running batch and exit on SIGTERM or Ctrl-C, queued events are processed on the next start
+        signal.signal(signal.SIGTERM, lambda signum, frame: processor.stop())
+        signal.signal(signal.SIGINT, lambda signum, frame: processor.stop())
+
+        try:
+            processor.run()
+        finally:
+            server.shutdown()
+            server.server_close()
+            queue.close()
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -8,6 +8,7 @@ import time
 from simple_zoomphone.exceptions import ZoomAPIError
 
 from simple_zoomphone import ZoomAPIClient
+from simple_zoomphone.ratelimit import shared_rate_limiter
 
 logger = logging.getLogger("zp")
 logger.setLevel(logging.INFO)
@@ -255,10 +256,29 @@ if __name__ == "__main__":
         default=None,
         help="Specify the Zoom Phone DID/DDI to assign to this user.  Set to 'auto' to automatically assign an available DID/DDI at the Zoom Phone site.",
     )
+    parser.add_argument(
+        "-rate_limit_store",
+        type=str,
+        default="",
+        help="SQLite file (or http:// url of a BucketServer) holding a request budget shared with other scripts running against the same Zoom account.",
+    )
+    parser.add_argument(
+        "-requests_per_second",
+        type=float,
+        default=10,
+        help="Requests per second shared by all scripts using the same -rate_limit_store.",
+    )
 
     args = parser.parse_args()
 
-    zoomapi = ZoomAPIClient(API_KEY=args.API_KEY, API_SECRET=args.API_SECRET)
+    zoomapi = ZoomAPIClient(
+        API_KEY=args.API_KEY,
+        API_SECRET=args.API_SECRET,
+        rate_limiter=shared_rate_limiter(
+            args.rate_limit_store, args.requests_per_second
+        ),
+        priority="interactive",
+    )
 
     enable_zoom_phone(
         zoomapi=zoomapi,
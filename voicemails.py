@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+
+import sys
+import logging
+import argparse
+import os
+import datetime
+
+from simple_zoomphone import ZoomAPIClient
+from simple_zoomphone.ratelimit import shared_rate_limiter
+from simple_zoomphone.pipeline import VoicemailPipeline
+from simple_zoomphone.manifest import RecordingManifest, verify_manifest
+from simple_zoomphone.storage import open_storage
+
+logger = logging.getLogger("zp")
+logger.setLevel(logging.INFO)
+
+# top level directory to save voicemails
+VOICEMAIL_DIRECTORY = "voicemails"
+
+# manifest of downloaded voicemails, used unless -no_manifest is given and by -verify
+MANIFEST_PATH = os.path.join(VOICEMAIL_DIRECTORY, "manifest.sqlite")
+
+
+def verify_voicemails(storage: str = "directory", workers: int = 8):
+    """Re-hash all voicemail files in the manifest and report missing or corrupt files
+
+    Corrupt files are removed from the manifest so they are downloaded again on the next run.
+
+    Args:
+        storage (str, optional): storage backend the voicemails were downloaded with, 'directory', 'shards' or 'cas'. Defaults to "directory".
+        workers (int, optional): number of files hashed concurrently. Defaults to 8.
+    """
+    storage_backend = open_storage(storage, VOICEMAIL_DIRECTORY)
+
+    logger.info(f"Verifying voicemails in {MANIFEST_PATH}")
+
+    problems = verify_manifest(MANIFEST_PATH, storage_backend, workers)
+
+    for voicemail_id, path, problem in problems:
+        logger.info(f" - {path}: {problem}")
+
+    storage_backend.close()
+
+    logger.info(f"{len(problems)} voicemail(s) failed verification.")
+
+
+def get_voicemails(
+    API_KEY: str,
+    API_SECRET: str,
+    USER_ID: str = "",
+    status: str = "all",
+    from_date: datetime.datetime = None,
+    to_date: datetime.datetime = None,
+    crawler_workers: int = 4,
+    download_workers: int = 8,
+    use_manifest: bool = True,
+    storage: str = "directory",
+    rate_limit_store: str = "",
+    requests_per_second: float = 10,
+):
+    """Access voicemail metadata from Zoom API and download voicemail audio to the 'voicemails' directory
+
+    Files are stored like call recordings: voicemails/<year>/<month>/<user>/yyyymmdd-hhmm-ani-dnis-<voicemail id>.mp3
+
+    Args:
+        API_KEY (str): API key from marketplace.zoom.us
+        API_SECRET (str): API secret from marketplace.zoom.us
+        USER_ID (str, optional): userid or email address to download voicemails for a single user.  Omit this parameter to access voicemails from all users. Defaults to "".
+        status (str, optional): 'all', 'read' or 'unread'. Defaults to "all".
+        from_date (datetime.datetime, optional): only download voicemails on or after this date. Defaults to None.
+        to_date (datetime.datetime, optional): only download voicemails up to this date. Defaults to None.
+        crawler_workers (int, optional): number of users whose voicemails are listed concurrently. Defaults to 4.
+        download_workers (int, optional): number of files downloaded concurrently. Defaults to 8.
+        use_manifest (bool, optional): track downloads in voicemails/manifest.sqlite keyed by voicemail id, needed for -verify. Defaults to True.
+        storage (str, optional): 'directory' for one file per voicemail, 'shards' for one tar file per user per day or 'cas' to store files by checksum. Defaults to "directory".
+        rate_limit_store (str, optional): SQLite file or BucketServer url holding a request budget shared with other processes. Defaults to "" (not shared).
+        requests_per_second (float, optional): requests per second shared by all processes using 'rate_limit_store'. Defaults to 10.
+    """
+
+    zoomapi = ZoomAPIClient(
+        API_KEY,
+        API_SECRET,
+        rate_limiter=shared_rate_limiter(rate_limit_store, requests_per_second),
+        priority="bulk",
+    )
+
+    # Determine whether we are getting voicemails for one user or all users
+    if USER_ID == "":
+        # Get all ZP Users
+        phone_user_list = zoomapi.phone.list_users()
+    else:
+        phone_user_list = [{"email": USER_ID}]
+
+    def log_progress(stats: dict):
+        logger.info(
+            f"{stats['users_listed']} users listed, {stats['recordings_listed']} voicemails listed, "
+            f"{stats['recordings_downloaded']} downloaded, {stats['recordings_skipped']} skipped, "
+            f"{stats['bytes_per_second'] / 1024 / 1024:.1f} MB/s"
+        )
+
+    manifest = RecordingManifest(MANIFEST_PATH) if use_manifest else None
+    storage_backend = open_storage(storage, VOICEMAIL_DIRECTORY)
+
+    # List voicemails and download audio concurrently, downloads start as soon as the first voicemails are listed
+    pipeline = VoicemailPipeline(
+        zoomapi,
+        directory=VOICEMAIL_DIRECTORY,
+        status=status,
+        from_date=from_date,
+        to_date=to_date,
+        crawler_workers=crawler_workers,
+        download_workers=download_workers,
+        storage=storage_backend,
+        manifest=manifest,
+        progress_callback=log_progress,
+    )
+    stats = pipeline.run([this_user["email"] for this_user in phone_user_list])
+
+    if manifest:
+        manifest.close()
+
+    storage_backend.close()
+
+    for item, error in stats.errors:
+        logger.info(f" - Warning: {item}: {error}")
+
+
+# Run this script using argparse
+
+if __name__ == "__main__":
+    ch = logging.StreamHandler()
+    ch.setLevel(logging.INFO)
+    logger.addHandler(ch)
+
+    # Run script with ArgParser
+
+    parser = argparse.ArgumentParser(
+        prog="Zoom Phone Voicemail Exporter",
+        description="Script to download Zoom Phone voicemails via marketplace.zoom.us API.",
+    )
+    parser.add_argument(
+        "-API_KEY",
+        type=str,
+        help="API key for Zoom account.",
+        required=True,
+    )
+    parser.add_argument(
+        "-API_SECRET",
+        type=str,
+        help="API secret for Zoom account.",
+        required=True,
+    )
+    parser.add_argument(
+        "-email",
+        type=str,
+        default="",
+        help="Specify the email address to download voicemails for a single user, otherwise will download all user voicemails",
+    )
+    parser.add_argument(
+        "-status",
+        type=str,
+        default="all",
+        choices=["all", "read", "unread"],
+        help="Only download voicemails with this status.",
+    )
+    parser.add_argument(
+        "-from_date",
+        type=lambda s: datetime.datetime.strptime(s, "%Y-%m-%d"),
+        default=None,
+        help="Only download voicemails on or after this date, format: yyyy-mm-dd.",
+    )
+    parser.add_argument(
+        "-to_date",
+        type=lambda s: datetime.datetime.strptime(s, "%Y-%m-%d"),
+        default=None,
+        help="Only download voicemails up to this date, format: yyyy-mm-dd.",
+    )
+    parser.add_argument(
+        "-crawler_workers",
+        type=int,
+        default=4,
+        help="Number of users whose voicemails are listed concurrently.",
+    )
+    parser.add_argument(
+        "-download_workers",
+        type=int,
+        default=8,
+        help="Number of voicemail files downloaded concurrently.",
+    )
+    parser.add_argument(
+        "-storage",
+        type=str,
+        default="directory",
+        choices=["directory", "shards", "cas"],
+        help="Specify 'directory' for one file per voicemail, 'shards' for one tar file per user per day, or 'cas' to store files by checksum.",
+    )
+    parser.add_argument(
+        "-no_manifest",
+        action="store_true",
+        help="Check for files on disk instead of tracking downloads in voicemails/manifest.sqlite by voicemail id.",
+    )
+    parser.add_argument(
+        "-verify",
+        action="store_true",
+        help="Re-hash all files in voicemails/manifest.sqlite and report missing or corrupt files, no voicemails are downloaded.",
+    )
+    parser.add_argument(
+        "-rate_limit_store",
+        type=str,
+        default="",
+        help="SQLite file (or http:// url of a BucketServer) holding a request budget shared with other scripts running against the same Zoom account.",
+    )
+    parser.add_argument(
+        "-requests_per_second",
+        type=float,
+        default=10,
+        help="Requests per second shared by all scripts using the same -rate_limit_store.",
+    )
+
+    args = parser.parse_args()
+
+    if args.verify:
+        verify_voicemails(storage=args.storage)
+        sys.exit(0)
+
+    get_voicemails(
+        API_KEY=args.API_KEY,
+        API_SECRET=args.API_SECRET,
+        USER_ID=args.email,
+        status=args.status,
+        from_date=args.from_date,
+        to_date=args.to_date,
+        crawler_workers=args.crawler_workers,
+        download_workers=args.download_workers,
+        use_manifest=not args.no_manifest,
+        storage=args.storage,
+        rate_limit_store=args.rate_limit_store,
+        requests_per_second=args.requests_per_second,
+    )